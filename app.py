@@ -1,23 +1,25 @@
+import time
+# Start of worker startup, reported once the app is ready (python check_import_time.py breaks it down)
+_loading_started = time.perf_counter()
 import os
 import sys
-import sqlite3
-import json
-import io
-from datetime import date, datetime
-from io import BytesIO
-from flask import Flask, request, jsonify, send_file, send_from_directory
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+import gzip
+from datetime import date
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, stream_with_context
+from db import DatabaseError, get_db_connection, init_app
+import migrations
+import rollups
+import archive
+import batch
+import ledger
+import imports
+import members
+import jobs
+import posting
+import search
+import streaming
+from money import district_sql, split, to_cedis, to_pesewas
+from listing import Listing, page_args, equals, at_least, at_most, flag, income_type, member
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -29,6 +31,7 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 app = Flask(__name__)
+init_app(app)
 
 # Serve static files (images, CSS, JS)
 @app.route('/<path:filename>')
@@ -46,119 +49,17 @@ def serve_static(filename):
                 return str(e), 404
     return "Not Found", 404
 
-# Database setup
-def get_db_connection():
-    # Use PostgreSQL in production, SQLite in development
-    if os.getenv('DATABASE_URL'):
-        import psycopg2
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'), sslmode='require')
-    else:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
-    return conn
-
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if we're using PostgreSQL
-    is_postgres = os.getenv('DATABASE_URL') is not None
-    
-    # Create tables if they don't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS income (
-            id SERIAL PRIMARY KEY,
-            category TEXT NOT NULL,
-            description TEXT NOT NULL,
-            amount REAL NOT NULL,
-            date TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''' if is_postgres else '''
-        CREATE TABLE IF NOT EXISTS income (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category TEXT NOT NULL,
-            description TEXT NOT NULL,
-            amount REAL NOT NULL,
-            date TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create tithes table with proper schema
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tithes (
-            id SERIAL PRIMARY KEY,
-            member_name TEXT NOT NULL,
-            member_id TEXT,
-            member_phone TEXT,
-            month INTEGER NOT NULL,
-            week1 REAL,
-            week2 REAL,
-            week3 REAL,
-            week4 REAL,
-            week5 REAL,
-            offeringWeek1 REAL,
-            offeringWeek2 REAL,
-            offeringWeek3 REAL,
-            offeringWeek4 REAL,
-            offeringWeek5 REAL,
-            total REAL DEFAULT 0,
-            date TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''' if is_postgres else '''
-        CREATE TABLE IF NOT EXISTS tithes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            member_name TEXT NOT NULL,
-            member_id TEXT,
-            member_phone TEXT,
-            month INTEGER NOT NULL,
-            week1 REAL,
-            week2 REAL,
-            week3 REAL,
-            week4 REAL,
-            week5 REAL,
-            offeringWeek1 REAL,
-            offeringWeek2 REAL,
-            offeringWeek3 REAL,
-            offeringWeek4 REAL,
-            offeringWeek5 REAL,
-            total REAL DEFAULT 0,
-            date TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create other tables with similar pattern...
-    # (Offerings, expenses, district_expenses, inventory, accounting_entries)
-    
-    # For PostgreSQL, we need to handle adding columns differently
-    if is_postgres:
-        try:
-            cursor.execute('''
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='tithes' AND column_name='member_id'
-            ''')
-            if not cursor.fetchone():
-                cursor.execute('ALTER TABLE tithes ADD COLUMN member_id TEXT')
-        except Exception as e:
-            print(f"Error checking/adding member_id column: {e}")
-    else:
-        # SQLite specific column additions
-        try:
-            cursor.execute("PRAGMA table_info(tithes)")
-            columns = [column[1] for column in cursor.fetchall()]
-            if 'member_id' not in columns:
-                cursor.execute('ALTER TABLE tithes ADD COLUMN member_id TEXT')
-        except Exception as e:
-            print(f"Error checking/adding member_id column: {e}")
-    
-    conn.commit()
-    conn.close()
+def check_schema():
+    """Warn when the database is behind the code; workers never migrate."""
+    current, latest = migrations.schema_status()
+    if current < latest:
+        print(f"Database schema is at version {current}, expected {latest}. "
+              "Run `python migrations.py` before starting the server.")
+    return current, latest
 
-# Initialize database on startup
-init_db()
+# A single version lookup per worker; `python migrations.py` applies changes
+check_schema()
+print(f'Loaded the app in {(time.perf_counter() - _loading_started) * 1000:.0f} ms (process {os.getpid()})')
 
 @app.route('/')
 def index():
@@ -172,16 +73,390 @@ def styles():
 def script():
     return send_from_directory('.', 'script.js')
 
+def delete_income_allocations(cursor, income_filter, params):
+    """Delete the ledger rows derived from the income rows matching income_filter.
+
+    Follows the income_id / reference_id keys, so each lookup is an index seek.
+    Allocations already settled with the district are kept but unlinked.
+    """
+    linked = f'IN (SELECT id FROM income WHERE {income_filter})'
+    rollups.remove_expenses(cursor, f'income_id {linked}', params)
+    cursor.execute(f'''
+        DELETE FROM accounting_entries
+        WHERE reference_type IN ('income', 'tithe') AND reference_id {linked}
+    ''', params)
+    cursor.execute(f"DELETE FROM district_expenses WHERE status = 'Pending' AND income_id {linked}", params)
+    cursor.execute(f'UPDATE district_expenses SET income_id = NULL WHERE income_id {linked}', params)
+    cursor.execute(f'DELETE FROM expenses WHERE income_id {linked}', params)
+
+def expense_type_filter(value):
+    if value == 'all':
+        return '1=1', []
+    return 'expense_type = ?', [value]
+
+# Filters and SQL totals for each list endpoint (see listing.py)
+INCOME_LISTING = Listing('income', 'date', {
+    'start_date': at_least('date'),
+    'end_date': at_most('date'),
+    'category': equals('category'),
+    'type': income_type,
+    'is_tithe': flag('is_tithe'),
+    'is_offering': flag('is_offering'),
+    'member_ref': equals('member_ref', int),
+    'member': lambda value: ('tithe_id IN (SELECT id FROM tithes WHERE member_id = ? OR member_name = ?)',
+                             [value, value]),
+}, {
+    'total_amount': 'SUM(amount)',
+    'total_local': 'SUM(local_amount)',
+    'total_district': 'SUM(district_amount)',
+}, money=True)
+TITHES_LISTING = Listing('tithes', ('year', 'month'), {
+    'year': equals('year', int),
+    'month': equals('month', int),
+    'member': member,
+    'member_id': member,
+    'member_ref': equals('member_ref', int),
+}, {
+    'total_tithes': 'SUM(total)',
+    'total_district': f'SUM({district_sql("total")})',
+    'total_local': f'SUM(total - {district_sql("total")})',
+}, money=True, columns='''*,
+    COALESCE(week1, 0) as week1_amount,
+    COALESCE(week2, 0) as week2_amount,
+    COALESCE(week3, 0) as week3_amount,
+    COALESCE(week4, 0) as week4_amount,
+    COALESCE(week5, 0) as week5_amount,
+    total as total_amount''')
+OFFERINGS_LISTING = Listing('offerings', ('year', 'month'), {
+    'year': equals('year', int),
+    'month': equals('month', int),
+    'member': member,
+}, {'total': 'SUM(total)'}, money=True)
+EXPENSES_LISTING = Listing('expenses', 'date', {
+    'start_date': at_least('date'),
+    'end_date': at_most('date'),
+    'category': equals('category'),
+    'type': expense_type_filter,
+}, {'total_amount': 'SUM(amount)'}, money=True)
+DISTRICT_EXPENSES_LISTING = Listing('district_expenses', 'date', {
+    'start_date': at_least('date'),
+    'end_date': at_most('date'),
+    'category': equals('source'),
+    'source': equals('source'),
+    'status': equals('status'),
+}, {
+    'total_original': 'SUM(original_amount)',
+    'total_district': 'SUM(district_amount)',
+}, money=True)
+INVENTORY_LISTING = Listing('inventory', 'date_added', {
+    'start_date': at_least('date_added'),
+    'end_date': at_most('date_added'),
+    'category': equals('category'),
+    'condition': equals('condition'),
+}, {'total_quantity': 'SUM(quantity)'})
+ACCOUNTING_ENTRIES_LISTING = Listing('accounting_entries', 'date', {
+    'start_date': at_least('date'),
+    'end_date': at_most('date'),
+    'account': equals('account_name'),
+    'period': equals('period'),
+    'reference_type': equals('reference_type'),
+}, {
+    'total_debit': 'SUM(debit_amount)',
+    'total_credit': 'SUM(credit_amount)',
+}, money=True)
+
+def optional_cedis(value):
+    # Weeks with nothing recorded stay empty rather than 0
+    return to_cedis(value) if value is not None else None
+
+# Tithe columns holding amounts (lower case, as PostgreSQL reports them)
+TITHE_AMOUNTS = {'week1', 'week2', 'week3', 'week4', 'week5', 'offeringweek1', 'offeringweek2',
+                 'offeringweek3', 'offeringweek4', 'offeringweek5', 'total', 'week1_amount',
+                 'week2_amount', 'week3_amount', 'week4_amount', 'week5_amount', 'total_amount'}
+
+def serialize_income(income):
+    return {
+        'id': income['id'],
+        'category': income['category'],
+        'description': income['description'],
+        'amount': to_cedis(income['amount']),
+        'date': income['date'],
+        'is_tithe': bool(income['is_tithe']),
+        'is_offering': bool(income['is_offering']),
+        'local_amount': to_cedis(income['local_amount']),
+        'district_amount': to_cedis(income['district_amount']),
+        'member_ref': income['member_ref'],
+        'created_at': income['created_at']
+    }
+
+def serialize_tithe(tithe):
+    """Serialize a tithe row, labelled with the April-March financial year its month falls in."""
+    tithe_dict = dict(tithe)
+    district, local = split(int(tithe_dict['total_amount'] or 0))
+    for key, value in tithe_dict.items():
+        if key.lower() in TITHE_AMOUNTS:
+            tithe_dict[key] = optional_cedis(value)
+
+    # Calculate district and local amounts
+    tithe_dict['district_amount'] = to_cedis(district)
+    tithe_dict['local_amount'] = to_cedis(local)
+
+    year = tithe_dict['year'] if tithe_dict['month'] >= 4 else tithe_dict['year'] - 1
+    tithe_dict['financial_year_start'] = str(year)
+    tithe_dict['financial_year_end'] = str(year + 1)
+    return tithe_dict
+
+def serialize_offering(record):
+    return {
+        'id': record['id'],
+        'memberName': record['member_name'],
+        'memberId': record['member_id'],
+        'year': record['year'],
+        'month': record['month'],
+        'week1': optional_cedis(record['week1']),
+        'week2': optional_cedis(record['week2']),
+        'week3': optional_cedis(record['week3']),
+        'week4': optional_cedis(record['week4']),
+        'week5': optional_cedis(record['week5']),
+        'total': to_cedis(record['total']),
+        'date': record['date']
+    }
+
+def serialize_expense(record):
+    return {
+        'id': record['id'],
+        'category': record['category'],
+        'description': record['description'],
+        'amount': to_cedis(record['amount']),
+        'date': record['date'],
+        'expense_type': record['expense_type']
+    }
+
+def serialize_district_expense(record):
+    return {
+        'id': record['id'],
+        'source': record['source'],
+        'originalAmount': to_cedis(record['original_amount']),
+        'districtAmount': to_cedis(record['district_amount']),
+        'date': record['date'],
+        'status': record['status']
+    }
+
+def serialize_inventory(record):
+    return {
+        'id': record['id'],
+        'itemName': record['item_name'],
+        'category': record['category'],
+        'quantity': record['quantity'],
+        'condition': record['condition'],
+        'dateAdded': record['date_added']
+    }
+
+def serialize_accounting_entry(entry):
+    return {
+        'id': entry['id'],
+        'account_name': entry['account_name'],
+        'debit_amount': to_cedis(entry['debit_amount']),
+        'credit_amount': to_cedis(entry['credit_amount']),
+        'description': entry['description'],
+        'date': entry['date'],
+        'period': entry['period'],
+        'reference_id': entry['reference_id'],
+        'reference_type': entry['reference_type']
+    }
+
+# Parsers turn one POSTed object into what the matching writer inserts,
+# raising ValueError when it is invalid; writers return the new ids in order
+def required_text(data, key):
+    value = data.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'{key} is required')
+    return value.strip()
+
+def iso_date(value, key='date'):
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f'{key} must be a date (YYYY-MM-DD)')
+
+def positive_pesewas(value, key='amount'):
+    amount = to_pesewas(value)
+    if amount <= 0:
+        raise ValueError(f'{key} must be greater than zero')
+    return amount
+
+def number_between(data, key, low, high):
+    try:
+        value = int(data.get(key))
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} must be a whole number')
+    if value < low or value > high:
+        raise ValueError(f'{key} must be {low}-{high}')
+    return value
+
+def parse_grid_week(data):
+    """Return (month, week, pesewas, year) for one week of the tithes or offerings grid."""
+    # The grid year defaults to the latest such month (see posting.grid_year)
+    year = number_between(data, 'year', 1, 9999) if data.get('year') else None
+    return (number_between(data, 'month', 1, 12), number_between(data, 'week', 1, 5),
+            positive_pesewas(data.get('amount')), year)
+
+def parse_income(data):
+    amount = positive_pesewas(data.get('amount', 0))
+    is_tithe = bool(data.get('is_tithe', False))
+    is_offering = bool(data.get('is_offering', False))
+
+    # Ensure only one of is_tithe or is_offering is true
+    if is_tithe and is_offering:
+        raise ValueError('Income cannot be both tithe and offering')
+
+    # Get current date if not provided
+    transaction_date = iso_date(data['date']) if data.get('date') else date.today().isoformat()
+    kind = posting.TITHE if is_tithe else posting.OFFERING if is_offering else None
+    category = (data.get('category') or '').strip()
+    return posting.contribution(
+        category, (data.get('description') or '').strip(), amount, transaction_date, kind=kind,
+        label=f'{kind.capitalize()} - {category}' if kind else None
+    )
+
+def parse_expense(data):
+    return (required_text(data, 'category'), (data.get('description') or '').strip(),
+            positive_pesewas(data.get('amount')), iso_date(data.get('date')),
+            data.get('expense_type') or 'other')
+
+def write_expenses(cursor, expenses):
+    ids = cursor.insert_many('''
+        INSERT INTO expenses (category, description, amount, date, expense_type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', expenses)
+
+    # Create accounting entries: debit the expense, credit cash
+    entries, totals = [], []
+    for expense_id, (category, description, amount, date_str, expense_type) in zip(ids, expenses):
+        entries.append(('Other Expenses', amount, 0, description, expense_id, date_str, date_str[:7]))
+        entries.append((ledger.CASH_ACCOUNT, 0, amount, description, expense_id, date_str, date_str[:7]))
+        totals.append((date_str, rollups.expense_metric(expense_type), amount))
+    cursor.executemany('''
+        INSERT INTO accounting_entries
+        (account_name, debit_amount, credit_amount, description, reference_id, reference_type, date, period)
+        VALUES (?, ?, ?, ?, ?, 'expense', ?, ?)
+    ''', entries)
+    rollups.apply(cursor, totals)
+    return ids
+
+def parse_district_expense(data):
+    return (required_text(data, 'source'), positive_pesewas(data.get('originalAmount'), 'originalAmount'),
+            positive_pesewas(data.get('districtAmount'), 'districtAmount'), iso_date(data.get('date')),
+            data.get('status') or 'pending')
+
+def write_district_expenses(cursor, rows):
+    return cursor.insert_many('''
+        INSERT INTO district_expenses (source, original_amount, district_amount, date, status)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+
+def parse_inventory(data):
+    try:
+        quantity = int(data.get('quantity'))
+    except (TypeError, ValueError):
+        raise ValueError('quantity must be a whole number')
+    if quantity < 0:
+        raise ValueError('quantity cannot be negative')
+    return (required_text(data, 'itemName'), required_text(data, 'category'), quantity,
+            required_text(data, 'condition'), date.today().isoformat())
+
+def write_inventory(cursor, items):
+    return cursor.insert_many('''
+        INSERT INTO inventory (item_name, category, quantity, condition, date_added)
+        VALUES (?, ?, ?, ?, ?)
+    ''', items)
+
+def batch_response(conn, items, parse, write):
+    """Save a POSTed array of records; ``mode`` picks atomic or partial."""
+    try:
+        body, status = batch.run(conn, items, parse, write, request.args.get('mode', batch.ATOMIC))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseError as e:
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
+    print(f"Batch {request.path}: {body['message']}")
+    return jsonify(body), status
+
+def single_response(conn, data, parse, write, message):
+    """Save one POSTed record with the same parser and writer as a batch."""
+    try:
+        row = parse(data if isinstance(data, dict) else {})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    cursor = conn.cursor()
+    conn.begin()
+    try:
+        new_id, = write(cursor, [row])
+        conn.commit()
+    except DatabaseError as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
+    return jsonify({'success': True, 'message': message, 'id': new_id})
+
+def wants_stream():
+    return request.args.get('format', 'json') != 'json'
+
+def stream_response(listing, serialize, defaults=None):
+    """Stream every row matching the request's filters as NDJSON or CSV."""
+    fmt = request.args.get('format')
+    if fmt not in streaming.CONTENT_TYPES:
+        return jsonify({'success': False, 'message': 'format must be json, ndjson or csv'}), 400
+    try:
+        where, params = listing.where(request.args, defaults)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    sql, params = listing.select(where, params)
+    # Named so PostgreSQL keeps the result set server-side
+    cursor = get_db_connection().cursor(name=f'{listing.table}_stream')
+    cursor.execute(sql, params)
+    records = (serialize(row) for row in streaming.iter_rows(cursor))
+    response = Response(stream_with_context(streaming.encode(records, fmt)),
+                        content_type=streaming.CONTENT_TYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={listing.table}.{fmt}'
+    return response
+
+def list_response(cursor, listing, serialize, defaults=None):
+    """Serve a list endpoint's rows as a bare JSON list, or one page of them.
+
+    With ``limit``/``cursor`` the response is a page with SQL-computed totals
+    over every matching row; without them the full legacy list is returned.
+    ``format=ndjson`` or ``format=csv`` streams every matching row instead.
+    """
+    if wants_stream():
+        return stream_response(listing, serialize, defaults)
+    try:
+        paginated, limit, after = page_args(request.args, listing)
+        where, params = listing.where(request.args, defaults)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    rows, next_cursor = listing.fetch(cursor, where, params, limit, after)
+    data = [serialize(row) for row in rows]
+    if not paginated:
+        return jsonify(data)
+    count, totals = listing.totals(cursor, where, params)
+    return jsonify({
+        'success': True,
+        'data': data,
+        'totals': totals,
+        'count': count,
+        'next_cursor': next_cursor
+    })
+
 # API Routes
 @app.route('/api/income/<int:income_id>', methods=['DELETE'])
 def delete_income(income_id):
     conn = None
     try:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Start transaction
-        cursor.execute('BEGIN TRANSACTION')
+        # Take the write lock up front so the read below can't go stale
+        conn.begin()
         
         # Get income details before deleting (for proper accounting reversal)
         cursor.execute('''
@@ -196,25 +471,16 @@ def delete_income(income_id):
             
         # If this was a tithe or offering, we need to handle the district allocation
         if income['is_tithe'] or income['is_offering']:
-            # Delete related accounting entries
-            cursor.execute('''
-                DELETE FROM accounting_entries 
-                WHERE reference_id = ? AND reference_type = 'income'
-            ''', (income_id,))
-            
-            # Delete related district expense
-            cursor.execute('''
-                DELETE FROM district_expenses 
-                WHERE description LIKE ? AND status = 'Pending'
-            ''', (f'%{income_id}%',))
+            delete_income_allocations(cursor, 'id = ?', (income_id,))
         
         # Delete the income record
+        rollups.remove_income(cursor, 'id = ?', (income_id,))
         cursor.execute('DELETE FROM income WHERE id = ?', (income_id,))
         
         conn.commit()
         return jsonify({'success': True, 'message': 'Income record deleted successfully'})
         
-    except sqlite3.Error as e:
+    except DatabaseError as e:
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
@@ -222,45 +488,23 @@ def delete_income(income_id):
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/tithes/<int:tithe_id>', methods=['DELETE'])
 def delete_tithe(tithe_id):
     conn = None
     try:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
+        conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('BEGIN TRANSACTION')
+        conn.begin()
         
-        # Get tithe details before deleting
-        cursor.execute('''
-            SELECT t.*, i.id as income_id 
-            FROM tithes t
-            LEFT JOIN income i ON i.description LIKE '%' || t.member_name || '%' AND i.is_tithe = 1
-            WHERE t.id = ?
-        ''', (tithe_id,))
-        
-        tithe = cursor.fetchone()
-        if not tithe:
+        cursor.execute('SELECT id FROM tithes WHERE id = ?', (tithe_id,))
+        if not cursor.fetchone():
             return jsonify({'success': False, 'message': 'Tithe record not found'}), 404
         
-        # Delete related accounting entries
-        if tithe['income_id']:
-            cursor.execute('''
-                DELETE FROM accounting_entries 
-                WHERE reference_id = ? AND reference_type = 'tithe'
-            ''', (tithe['income_id'],))
-            
-            # Delete related income record
-            cursor.execute('DELETE FROM income WHERE id = ?', (tithe['income_id'],))
-            
-            # Delete related district expense
-            cursor.execute('''
-                DELETE FROM district_expenses 
-                WHERE description LIKE ? AND status = 'Pending'
-            ''', (f'%{tithe["member_name"]}%Tithe%',))
+        # Remove every weekly income row posted for this tithe, with its allocations
+        delete_income_allocations(cursor, 'tithe_id = ?', (tithe_id,))
+        rollups.remove_income(cursor, 'tithe_id = ?', (tithe_id,))
+        cursor.execute('DELETE FROM income WHERE tithe_id = ?', (tithe_id,))
         
         # Delete the tithe record
         cursor.execute('DELETE FROM tithes WHERE id = ?', (tithe_id,))
@@ -268,7 +512,7 @@ def delete_tithe(tithe_id):
         conn.commit()
         return jsonify({'success': True, 'message': 'Tithe record deleted successfully'})
         
-    except sqlite3.Error as e:
+    except DatabaseError as e:
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
@@ -276,17 +520,14 @@ def delete_tithe(tithe_id):
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/expenses/<int:expense_id>', methods=['DELETE'])
 def delete_expense(expense_id):
     conn = None
     try:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
+        conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('BEGIN TRANSACTION')
+        conn.begin()
         
         # Delete related accounting entries
         cursor.execute('''
@@ -295,12 +536,13 @@ def delete_expense(expense_id):
         ''', (expense_id,))
         
         # Delete the expense
+        rollups.remove_expenses(cursor, 'id = ?', (expense_id,))
         cursor.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
         
         conn.commit()
         return jsonify({'success': True, 'message': 'Expense deleted successfully'})
         
-    except sqlite3.Error as e:
+    except DatabaseError as e:
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
@@ -308,15 +550,12 @@ def delete_expense(expense_id):
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/inventory/<int:item_id>', methods=['DELETE'])
 def delete_inventory(item_id):
     conn = None
     try:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Check if item exists
@@ -330,171 +569,43 @@ def delete_inventory(item_id):
         
         return jsonify({'success': True, 'message': 'Inventory item deleted successfully'})
         
-    except sqlite3.Error as e:
+    except DatabaseError as e:
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/income', methods=['GET', 'POST'])
 def handle_income():
     conn = None
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable column access by name
         cursor = conn.cursor()
         
         if request.method == 'POST':
             data = request.json
-            
+            if isinstance(data, list):
+                return batch_response(conn, data, parse_income, posting.post)
+
             # Input validation
             try:
-                amount = float(data.get('amount', 0))
-                if amount <= 0:
-                    return jsonify({'success': False, 'message': 'Amount must be greater than zero'}), 400
-                    
-                is_tithe = bool(data.get('is_tithe', False))
-                is_offering = bool(data.get('is_offering', False))
-                
-                # Ensure only one of is_tithe or is_offering is true
-                if is_tithe and is_offering:
-                    return jsonify({'success': False, 'message': 'Income cannot be both tithe and offering'}), 400
-                
-                # Calculate local and district amounts for tithes and offerings
-                local_amount = amount
-                district_amount = 0.0
-                
-                if is_tithe or is_offering:
-                    district_amount = round(amount * 0.77, 2)  # 77% to district
-                    local_amount = round(amount - district_amount, 2)  # 23% local retention
-                    
-                    # Ensure the sum of local and district amounts equals the original amount
-                    if abs((local_amount + district_amount) - amount) > 0.01:  # Allow for floating point precision
-                        local_amount = amount - district_amount  # Recalculate to ensure exact match
-                
-                # Get current date if not provided
-                transaction_date = data.get('date') or date.today().isoformat()
-                
-                # Insert the income record with explicit column names
-                cursor.execute('''
-                    INSERT INTO income (
-                        category, description, amount, date, is_tithe, is_offering, 
-                        local_amount, district_amount, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (
-                    data.get('category', '').strip(),
-                    data.get('description', '').strip(),
-                    amount,
-                    transaction_date,
-                    is_tithe,
-                    is_offering,
-                    local_amount,
-                    district_amount
-                ))
-                
-                income_id = cursor.lastrowid
-                
-                # If this is a tithe or offering, create a district allocation entry
-                if is_tithe or is_offering:
-                    source_type = 'Tithe' if is_tithe else 'Offering'
-                    source_desc = f'{source_type} - {data.get("category", "")}'.strip()
-                    
-                    # Create district expense record
-                    cursor.execute('''
-                        INSERT INTO district_expenses (
-                            source, description, original_amount, district_amount, 
-                            date, status, created_at
-                        ) VALUES (?, ?, ?, ?, ?, 'Pending', CURRENT_TIMESTAMP)
-                    ''', (
-                        f'{source_type} Allocation',
-                        source_desc,
-                        amount,
-                        district_amount,
-                        transaction_date
-                    ))
-                    
-                    # Get the current financial period (YYYY-MM format)
-                    period = datetime.strptime(transaction_date, '%Y-%m-%d').strftime('%Y-%m')
-                    
-                    # Create accounting entries for double-entry
-                    # 1. Debit: District Allocation Expense (77%)
-                    cursor.execute('''
-                        INSERT INTO accounting_entries (
-                            account_name, debit_amount, credit_amount, 
-                            description, date, period, reference_id, reference_type
-                        ) VALUES (?, ?, 0, ?, ?, ?, ?, ?)
-                    ''', (
-                        'District Allocation Expense',
-                        district_amount,
-                        f'{source_type} Allocation: {source_desc}',
-                        transaction_date,
-                        period,
-                        income_id,
-                        'income'
-                    ))
-                    
-                    # 2. Credit: Income (77%)
-                    cursor.execute('''
-                        INSERT INTO accounting_entries (
-                            account_name, debit_amount, credit_amount, 
-                            description, date, period, reference_id, reference_type
-                        ) VALUES (?, 0, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        f'{source_type} Income',
-                        district_amount,
-                        f'District Allocation: {source_desc}',
-                        transaction_date,
-                        period,
-                        income_id,
-                        'income'
-                    ))
-                    
-                    # 3. Debit: Local Income (23%)
-                    cursor.execute('''
-                        INSERT INTO accounting_entries (
-                            account_name, debit_amount, credit_amount, 
-                            description, date, period, reference_id, reference_type
-                        ) VALUES (?, ?, 0, ?, ?, ?, ?, ?)
-                    ''', (
-                        f'Local {source_type} Income',
-                        local_amount,
-                        f'Local {source_type} Income: {source_desc}',
-                        transaction_date,
-                        period,
-                        income_id,
-                        'income'
-                    ))
-                    
-                    # 4. Credit: Income (23%)
-                    cursor.execute('''
-                        INSERT INTO accounting_entries (
-                            account_name, debit_amount, credit_amount, 
-                            description, date, period, reference_id, reference_type
-                        ) VALUES (?, 0, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        f'{source_type} Income',
-                        local_amount,
-                        f'Local {source_type} Income: {source_desc}',
-                        transaction_date,
-                        period,
-                        income_id,
-                        'income'
-                    ))
-                
+                item = parse_income(data if isinstance(data, dict) else {})
+
+                # Tithes and offerings are split 77% district / 23% local retention
+                conn.begin()
+                income_id, = posting.post(cursor, [item])
+                district_amount, local_amount = posting.shares(item)
                 conn.commit()
                 return jsonify({
                     'success': True, 
                     'id': income_id,
-                    'local_amount': local_amount,
-                    'district_amount': district_amount
+                    'local_amount': to_cedis(local_amount),
+                    'district_amount': to_cedis(district_amount)
                 })
                 
             except ValueError as ve:
                 conn.rollback()
-                return jsonify({'success': False, 'message': f'Invalid amount: {str(ve)}'}), 400
-            except sqlite3.Error as e:
+                return jsonify({'success': False, 'message': str(ve)}), 400
+            except DatabaseError as e:
                 conn.rollback()
                 return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
             except Exception as e:
@@ -503,70 +614,32 @@ def handle_income():
             
         else:  # GET request
             try:
-                # Get optional query parameters for filtering
-                start_date = request.args.get('start_date')
-                end_date = request.args.get('end_date')
-                is_tithe = request.args.get('is_tithe')
-                is_offering = request.args.get('is_offering')
+                if wants_stream():
+                    return stream_response(INCOME_LISTING, serialize_income)
+                try:
+                    paginated, limit, after = page_args(request.args, INCOME_LISTING)
+                    where, params = INCOME_LISTING.where(request.args)
+                except ValueError as ve:
+                    return jsonify({'success': False, 'message': str(ve)}), 400
                 
-                # Base query
-                query = 'SELECT * FROM income WHERE 1=1'
-                params = []
+                income_data, next_cursor = INCOME_LISTING.fetch(cursor, where, params, limit, after)
                 
-                # Add filters based on query parameters
-                if start_date:
-                    query += ' AND date >= ?'
-                    params.append(start_date)
-                if end_date:
-                    query += ' AND date <= ?'
-                    params.append(end_date)
-                if is_tithe is not None:
-                    query += ' AND is_tithe = ?'
-                    params.append(1 if is_tithe.lower() == 'true' else 0)
-                if is_offering is not None:
-                    query += ' AND is_offering = ?'
-                    params.append(1 if is_offering.lower() == 'true' else 0)
+                income_list = [serialize_income(income) for income in income_data]
                 
-                # Add sorting
-                query += ' ORDER BY date DESC, created_at DESC'
+                # Totals cover every matching row, not just this page
+                count, totals = INCOME_LISTING.totals(cursor, where, params)
                 
-                # Execute query
-                cursor.execute(query, params)
-                income_data = cursor.fetchall()
-                
-                # Convert to list of dictionaries
-                income_list = []
-                for income in income_data:
-                    income_list.append({
-                        'id': income['id'],
-                        'category': income['category'],
-                        'description': income['description'],
-                        'amount': float(income['amount']) if income['amount'] is not None else 0.0,
-                        'date': income['date'],
-                        'is_tithe': bool(income['is_tithe']),
-                        'is_offering': bool(income['is_offering']),
-                        'local_amount': float(income['local_amount']) if income['local_amount'] is not None else 0.0,
-                        'district_amount': float(income['district_amount']) if income['district_amount'] is not None else 0.0,
-                        'created_at': income['created_at']
-                    })
-                
-                # Calculate totals
-                total_amount = sum(item['amount'] for item in income_list)
-                total_local = sum(item['local_amount'] for item in income_list)
-                total_district = sum(item['district_amount'] for item in income_list)
-                
-                return jsonify({
+                response = {
                     'success': True,
                     'data': income_list,
-                    'totals': {
-                        'total_amount': total_amount,
-                        'total_local': total_local,
-                        'total_district': total_district
-                    },
-                    'count': len(income_list)
-                })
+                    'totals': {key: float(value) for key, value in totals.items()},
+                    'count': count
+                }
+                if paginated:
+                    response['next_cursor'] = next_cursor
+                return jsonify(response)
                 
-            except sqlite3.Error as e:
+            except DatabaseError as e:
                 return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
             except Exception as e:
                 return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
@@ -575,269 +648,89 @@ def handle_income():
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Connection error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/tithes', methods=['GET', 'POST'])
 def handle_tithes():
     conn = None
     try:
-        conn = sqlite3.connect('church_management.db', timeout=20.0)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         if request.method == 'POST':
             data = request.json
+            if not isinstance(data, dict):
+                data = {}
             
             # Input validation
             try:
-                member_name = data.get('memberName', '').strip()
-                member_id = data.get('memberId', '').strip()
-                month = int(data.get('month', 0))
-                week = int(data.get('week', 0))
-                tithe_amount = float(data.get('amount', 0))
+                member_name = str(data.get('memberName') or '').strip()
+                member_id = str(data.get('memberId') or '').strip()
+                # Picked from /api/members/search; otherwise found or added by number or name
+                member_ref = int(data['memberRef']) if data.get('memberRef') else None
                 
-                if not member_name:
+                if not member_name and not member_ref:
                     return jsonify({'success': False, 'message': 'Member name is required'}), 400
-                if month < 1 or month > 12:
-                    return jsonify({'success': False, 'message': 'Invalid month'}), 400
-                if week < 1 or week > 5:
-                    return jsonify({'success': False, 'message': 'Invalid week (must be 1-5)'}), 400
-                if tithe_amount <= 0:
-                    return jsonify({'success': False, 'message': 'Amount must be greater than zero'}), 400
-                
-                # Get current date for the transaction
-                transaction_date = date.today().isoformat()
-                
-                # Check if member already exists for this month
-                cursor.execute('''
-                    SELECT * FROM tithes WHERE member_id = ? AND month = ?
-                ''', (member_id or member_name, month))
-                
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Update existing record - set the specific week (replace, don't add)
-                    week_column = f'week{week}'
-                    cursor.execute(f'''
-                        UPDATE tithes 
-                        SET {week_column} = ?,
-                            total = (COALESCE(week1, 0) + COALESCE(week2, 0) + COALESCE(week3, 0) + 
-                                    COALESCE(week4, 0) + COALESCE(week5, 0)),
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE member_id = ? AND month = ?
-                    ''', (tithe_amount, member_id or member_name, month))
-                else:
-                    # Create new record with the specific week's data
-                    week_values = [None, None, None, None, None]  # Initialize all weeks to None
-                    week_values[week - 1] = tithe_amount  # Set the specific week (1-5 becomes 0-4)
-                    
-                    cursor.execute('''
-                        INSERT INTO tithes (
-                            member_name, member_id, month, 
-                            week1, week2, week3, week4, week5,
-                            total, created_at, updated_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                    ''', [member_name, member_id or member_name, month] + week_values + [tithe_amount])
-                
-                # Calculate 77% for district and 23% for local
-                district_share = round(tithe_amount * 0.77, 2)
-                local_share = round(tithe_amount - district_share, 2)
-                
-                # Add to income as tithe (100% initially, will be split in the income table)
-                cursor.execute('''
-                    INSERT INTO income (
-                        category, description, amount, date, 
-                        is_tithe, is_offering, 
-                        local_amount, district_amount,
-                        created_at
-                    ) VALUES (?, ?, ?, ?, 1, 0, ?, ?, CURRENT_TIMESTAMP)
-                ''', (
-                    f'Tithe - {member_name}',
-                    f'Tithe from {member_name} - {date(2000, month, 1).strftime("%B")} Week {week}',
-                    tithe_amount,
-                    transaction_date,
-                    local_share,
-                    district_share
-                ))
-                
-                income_id = cursor.lastrowid
-                
-                # Create district expense record
-                cursor.execute('''
-                    INSERT INTO district_expenses (
-                        source, description, original_amount, district_amount, 
-                        date, status, created_at
-                    ) VALUES (?, ?, ?, ?, ?, 'Pending', CURRENT_TIMESTAMP)
-                ''', (
-                    'Tithe Allocation',
-                    f'Tithe from {member_name} - {date(2000, month, 1).strftime("%B")} Week {week}',
-                    tithe_amount,
-                    district_share,
-                    transaction_date
-                ))
-                
-                # Get the current financial period (YYYY-MM format)
-                period = datetime.now().strftime('%Y-%m')
-                
-                # Create accounting entries for double-entry
-                # 1. Debit: District Allocation Expense (77%)
-                cursor.execute('''
-                    INSERT INTO accounting_entries (
-                        account_name, debit_amount, credit_amount, 
-                        description, date, period, reference_id, reference_type
-                    ) VALUES (?, ?, 0, ?, ?, ?, ?, ?)
-                ''', (
-                    'District Allocation Expense',
-                    district_share,
-                    f'Tithe Allocation: {member_name} - Week {week}',
-                    transaction_date,
-                    period,
-                    income_id,
-                    'tithe'
-                ))
-                
-                # 2. Credit: Tithe Income (77%)
-                cursor.execute('''
-                    INSERT INTO accounting_entries (
-                        account_name, debit_amount, credit_amount, 
-                        description, date, period, reference_id, reference_type
-                    ) VALUES (?, 0, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    'Tithe Income',
-                    district_share,
-                    f'District Allocation: {member_name} - Week {week}',
-                    transaction_date,
-                    period,
-                    income_id,
-                    'tithe'
-                ))
-                
-                # 3. Debit: Local Tithe Income (23%)
-                cursor.execute('''
-                    INSERT INTO accounting_entries (
-                        account_name, debit_amount, credit_amount, 
-                        description, date, period, reference_id, reference_type
-                    ) VALUES (?, ?, 0, ?, ?, ?, ?, ?)
-                ''', (
-                    'Local Tithe Income',
-                    local_share,
-                    f'Local Tithe Income: {member_name} - Week {week}',
-                    transaction_date,
-                    period,
-                    income_id,
-                    'tithe'
-                ))
-                
-                # 4. Credit: Tithe Income (23%)
-                cursor.execute('''
-                    INSERT INTO accounting_entries (
-                        account_name, debit_amount, credit_amount, 
-                        description, date, period, reference_id, reference_type
-                    ) VALUES (?, 0, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    'Tithe Income',
-                    local_share,
-                    f'Local Tithe Income: {member_name} - Week {week}',
-                    transaction_date,
-                    period,
-                    income_id,
-                    'tithe'
-                ))
-                
+                month, week, tithe_amount, year = parse_grid_week(data)
+            except ValueError as ve:
+                return jsonify({'success': False, 'message': f'Invalid input: {str(ve)}'}), 400
+            
+            # Get current date for the transaction
+            transaction_date = date.today().isoformat()
+            
+            # The grid week and every ledger leg are written together or not at all
+            conn.begin()
+            try:
+                # Set the week in the tithes grid and post it: 77% to the district, 23% retained locally
+                item = posting.tithe(cursor, member_name, member_id, month, week, tithe_amount, transaction_date,
+                                     year, member_ref)
+                posting.post(cursor, [item])
+                district_share, local_share = posting.shares(item)
                 conn.commit()
-                return jsonify({
-                    'success': True, 
-                    'message': 'Tithe recorded successfully',
-                    'local_amount': local_share,
-                    'district_amount': district_share
-                })
-                
             except ValueError as ve:
                 conn.rollback()
                 return jsonify({'success': False, 'message': f'Invalid input: {str(ve)}'}), 400
-            except sqlite3.Error as e:
+            except DatabaseError as e:
                 conn.rollback()
                 return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
             except Exception as e:
                 conn.rollback()
                 return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
+            
+            return jsonify({
+                'success': True, 
+                'message': 'Tithe recorded successfully',
+                'local_amount': to_cedis(local_share),
+                'district_amount': to_cedis(district_share)
+            })
                 
         else:  # GET request
             try:
-                # Get optional query parameters for filtering
-                month = request.args.get('month')
-                member_id = request.args.get('member_id')
-                year = request.args.get('year', date.today().year)
-                
-                # Base query
-                query = '''
-                    SELECT t.*, 
-                           COALESCE(week1, 0) as week1_amount,
-                           COALESCE(week2, 0) as week2_amount,
-                           COALESCE(week3, 0) as week3_amount,
-                           COALESCE(week4, 0) as week4_amount,
-                           COALESCE(week5, 0) as week5_amount,
-                           total as total_amount,
-                           strftime('%Y', date(?, '-3 months')) as financial_year_start,
-                           strftime('%Y', date(?, '+9 months')) as financial_year_end
-                    FROM tithes t
-                    WHERE 1=1
-                '''
-                
-                # Add date condition to filter by financial year (April to March)
-                params = [f"{year}-04-01", f"{year}-04-01"]
+                if wants_stream():
+                    return stream_response(TITHES_LISTING, serialize_tithe)
+                try:
+                    paginated, limit, after = page_args(request.args, TITHES_LISTING)
+                    where, params = TITHES_LISTING.where(request.args)
+                except ValueError as ve:
+                    return jsonify({'success': False, 'message': str(ve)}), 400
                 
-                # Add filters based on query parameters
-                if month:
-                    query += ' AND month = ?'
-                    params.append(int(month))
-                    
-                if member_id:
-                    query += ' AND (member_id = ? OR member_name = ?)'
-                    params.extend([member_id, member_id])
+                tithes_data, next_cursor = TITHES_LISTING.fetch(cursor, where, params, limit, after)
                 
-                # Add sorting
-                query += ' ORDER BY month DESC, member_name ASC'
+                tithes_list = [serialize_tithe(tithe) for tithe in tithes_data]
                 
-                # Execute query
-                cursor.execute(query, params)
-                tithes_data = cursor.fetchall()
+                # Totals cover every matching row, not just this page
+                count, totals = TITHES_LISTING.totals(cursor, where, params)
                 
-                # Convert to list of dictionaries
-                tithes_list = []
-                for tithe in tithes_data:
-                    tithe_dict = dict(tithe)
-                    # Convert decimal.Decimal to float for JSON serialization
-                    for key in ['week1_amount', 'week2_amount', 'week3_amount', 
-                               'week4_amount', 'week5_amount', 'total_amount']:
-                        if tithe_dict.get(key) is not None:
-                            tithe_dict[key] = float(tithe_dict[key])
-                    
-                    # Calculate district and local amounts
-                    tithe_dict['district_amount'] = round(tithe_dict['total_amount'] * 0.77, 2)
-                    tithe_dict['local_amount'] = round(tithe_dict['total_amount'] * 0.23, 2)
-                    
-                    tithes_list.append(tithe_dict)
-                
-                # Calculate totals
-                total_tithes = sum(t['total_amount'] for t in tithes_list)
-                total_district = sum(t['district_amount'] for t in tithes_list)
-                total_local = sum(t['local_amount'] for t in tithes_list)
-                
-                return jsonify({
+                response = {
                     'success': True,
                     'data': tithes_list,
-                    'totals': {
-                        'total_tithes': total_tithes,
-                        'total_district': total_district,
-                        'total_local': total_local
-                    },
-                    'count': len(tithes_list)
-                })
+                    'totals': {key: float(value) for key, value in totals.items()},
+                    'count': count
+                }
+                if paginated:
+                    response['next_cursor'] = next_cursor
+                return jsonify(response)
                 
-            except sqlite3.Error as e:
+            except DatabaseError as e:
                 return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
             except Exception as e:
                 return jsonify({'success': False, 'message': f'Unexpected error: {str(e)}'}), 500
@@ -846,307 +739,355 @@ def handle_tithes():
         if conn:
             conn.rollback()
         return jsonify({'success': False, 'message': f'Connection error: {str(e)}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/offerings', methods=['GET', 'POST'])
 def handle_offerings():
-    conn = sqlite3.connect('church_management.db', timeout=20.0)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.json
-        month = int(data['month'])
-        week = int(data['week'])
-        offering_amount = float(data.get('amount', 0))
-        
-        print(f"Received offering data: {data}")  # Debug log
-        
-        # Check if general offering record already exists for this month
-        cursor.execute('''
-            SELECT * FROM offerings WHERE month = ? AND member_name = 'General Offering'
-        ''', (month,))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            week_column = f'week{week}'
-            cursor.execute(f'''
-                UPDATE offerings 
-                SET {week_column} = ?,
-                    total = (COALESCE(week1, 0) + COALESCE(week2, 0) + COALESCE(week3, 0) + 
-                            COALESCE(week4, 0) + COALESCE(week5, 0))
-                WHERE month = ? AND member_name = 'General Offering'
-            ''', (offering_amount, month))
-        else:
-            # Create new record with the specific week's data
-            values = ['General Offering', None, month]
-            values.extend([None] * 5)  # 5 weeks
-            values.append(offering_amount)  # total
-            
-            # Set the specific week's value
-            week_index = week - 1
-            values[3 + week_index] = offering_amount
-            
-            cursor.execute('''
-                INSERT INTO offerings (
-                    member_name, member_id, month, 
-                    week1, week2, week3, week4, week5,
-                    total
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', values)
-        
-        # Calculate 77% for district and 23% for local
-        district_share = round(offering_amount * 0.77, 2)
-        local_share = round(offering_amount - district_share, 2)
-        
-        # Add to income as local share (23%)
-        cursor.execute('''
-            INSERT INTO income (category, description, amount, date, is_offering, district_amount, local_amount)
-            VALUES (?, ?, ?, date('now'), 1, ?, ?)
-        ''', ('Offering', f'Offering - Week {week}', 
-              offering_amount, district_share, local_share))
-        
-        # Add district contribution as expense (77%)
-        cursor.execute('''
-            INSERT INTO expenses (category, description, amount, date, expense_type)
-            VALUES (?, ?, ?, date('now'), 'district')
-        ''', ('District Offering Contribution', f'Offering contribution to district - Week {week}', 
-              district_share))
+        try:
+            month, week, offering_amount, year = parse_grid_week(data if isinstance(data, dict) else {})
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        conn.commit()
-        conn.close()
+        conn.begin()
+        try:
+            # Set the week in the offerings grid and post it
+            posting.post(cursor, [posting.offering(cursor, month, week, offering_amount, date.today().isoformat(),
+                                                   year)])
+            conn.commit()
+        except DatabaseError as e:
+            conn.rollback()
+            return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
         
         return jsonify({'success': True, 'message': 'Offering added successfully'})
     
     else:  # GET
-        month = request.args.get('month', type=int)
-        if month is not None:
-            cursor.execute('SELECT * FROM offerings WHERE month = ?', (month,))
-        else:
-            cursor.execute('SELECT * FROM offerings')
-        
-        offering_records = cursor.fetchall()
-        conn.close()
-        
-        offering_list = []
-        for record in offering_records:
-            offering_list.append({
-                'id': record[0],
-                'memberName': record[1],
-                'memberId': record[2] if len(record) > 2 else None,
-                'month': record[3],
-                'week1': record[4],
-                'week2': record[5],
-                'week3': record[6],
-                'week4': record[7],
-                'week5': record[8],
-                'total': record[9] if len(record) > 9 else 0,
-                'date': record[10] if len(record) > 10 else None
-            })
-        
-        return jsonify(offering_list)
+        return list_response(cursor, OFFERINGS_LISTING, serialize_offering)
+
+@app.route('/api/import/<kind>', methods=['POST'])
+def import_contributions(kind):
+    if kind not in imports.KINDS:
+        return jsonify({'success': False, 'message': f'Cannot import {kind}'}), 404
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'message': 'Upload an .xlsx or .csv file as "file"'}), 400
+    try:
+        summary = imports.import_file(get_db_connection(), kind, upload.stream, upload.filename)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    print(f"Imported {summary['imported']} {kind} from {upload.filename}; {summary['failed']} rows rejected")
+    if 'error' in summary:
+        return jsonify(dict(summary, success=False, message=summary['error'])), 500
+    message = f"Imported {summary['imported']} {kind} from {summary['rows']} rows"
+    if summary['failed']:
+        message += f"; {summary['failed']} rows had errors"
+    status = 400 if summary['failed'] and not summary['imported'] else 200
+    return jsonify(dict(summary, success=not summary['failed'], message=message)), status
+
+@app.route('/api/members/search')
+def search_members():
+    try:
+        limit = min(int(request.args.get('limit', members.SEARCH_LIMIT)), members.MAX_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit must be a whole number'}), 400
+    try:
+        data = members.search(get_db_connection().cursor(), request.args.get('q', ''), limit)
+    except DatabaseError as e:
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
+    return jsonify({'success': True, 'data': data})
+
+@app.route('/api/search')
+def search_ledgers():
+    """Ranked full-text search across income, expenses, district expenses and inventory."""
+    try:
+        limit = min(int(request.args.get('limit', search.DEFAULT_LIMIT)), search.MAX_LIMIT)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit and offset must be whole numbers'}), 400
+    try:
+        hits, more = search.search(get_db_connection().cursor(), request.args.get('q'),
+                                   request.args.get('start_date'), request.args.get('end_date'),
+                                   request.args.get('source'), limit, offset)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseError as e:
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
+    return jsonify({
+        'success': True,
+        'data': hits,
+        'next_offset': offset + len(hits) if more else None
+    })
 
 @app.route('/api/expenses', methods=['GET', 'POST'])
 def handle_expenses():
-    conn = sqlite3.connect('church_management.db', timeout=20.0)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.json
-        category = data['category']
-        description = data['description']
-        amount = float(data['amount'])
-        date_str = data['date']
-        expense_type = data.get('expense_type', 'other')
-        
-        cursor.execute('''
-            INSERT INTO expenses (category, description, amount, date, expense_type)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (category, description, amount, date_str, expense_type))
-        
-        expense_id = cursor.lastrowid
-        
-        # Create accounting entry
-        cursor.execute('''
-            INSERT INTO accounting_entries 
-            (account_name, debit_amount, description, reference_id, reference_type, date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ('Other Expenses', amount, description, expense_id, 'expense', date_str))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Expense added successfully'})
+        if isinstance(data, list):
+            return batch_response(conn, data, parse_expense, write_expenses)
+        return single_response(conn, data, parse_expense, write_expenses, 'Expense added successfully')
     
     else:  # GET
-        expense_type = request.args.get('type', 'other')
-        cursor.execute('SELECT * FROM expenses WHERE expense_type = ? ORDER BY date DESC', (expense_type,))
-        expense_records = cursor.fetchall()
-        conn.close()
-        
-        expense_list = []
-        for record in expense_records:
-            expense_list.append({
-                'id': record[0],
-                'category': record[1],
-                'description': record[2],
-                'amount': record[3],
-                'date': record[4],
-                'expense_type': record[5]
-            })
-        
-        return jsonify(expense_list)
+        return list_response(cursor, EXPENSES_LISTING, serialize_expense, defaults={'type': 'other'})
 
 @app.route('/api/district-expenses', methods=['GET', 'POST'])
 def handle_district_expenses():
-    conn = sqlite3.connect('church_management.db', timeout=20.0)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.json
-        source = data['source']
-        original_amount = float(data['originalAmount'])
-        district_amount = float(data['districtAmount'])
-        date_str = data['date']
-        status = data.get('status', 'pending')
-        
-        cursor.execute('''
-            INSERT INTO district_expenses (source, original_amount, district_amount, date, status)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (source, original_amount, district_amount, date_str, status))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'District expense added successfully'})
+        if isinstance(data, list):
+            return batch_response(conn, data, parse_district_expense, write_district_expenses)
+        return single_response(conn, data, parse_district_expense, write_district_expenses,
+                               'District expense added successfully')
     
     else:  # GET
-        cursor.execute('SELECT * FROM district_expenses ORDER BY date DESC')
-        records = cursor.fetchall()
-        conn.close()
-        
-        expense_list = []
-        for record in records:
-            expense_list.append({
-                'id': record[0],
-                'source': record[1],
-                'originalAmount': record[2],
-                'districtAmount': record[3],
-                'date': record[4],
-                'status': record[5]
-            })
-        
-        return jsonify(expense_list)
+        return list_response(cursor, DISTRICT_EXPENSES_LISTING, serialize_district_expense)
 
 @app.route('/api/inventory', methods=['GET', 'POST'])
 def handle_inventory():
-    conn = sqlite3.connect('church_management.db', timeout=20.0)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.json
-        item_name = data['itemName']
-        category = data['category']
-        quantity = int(data['quantity'])
-        condition = data['condition']
-        date_added = date.today().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO inventory (item_name, category, quantity, condition, date_added)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (item_name, category, quantity, condition, date_added))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Inventory item added successfully'})
+        if isinstance(data, list):
+            return batch_response(conn, data, parse_inventory, write_inventory)
+        return single_response(conn, data, parse_inventory, write_inventory, 'Inventory item added successfully')
     
     else:  # GET
-        cursor.execute('SELECT * FROM inventory ORDER BY date_added DESC')
-        inventory_records = cursor.fetchall()
-        conn.close()
-        
-        inventory_list = []
-        for record in inventory_records:
-            inventory_list.append({
-                'id': record[0],
-                'itemName': record[1],
-                'category': record[2],
-                'quantity': record[3],
-                'condition': record[4],
-                'dateAdded': record[5]
-            })
-        
-        return jsonify(inventory_list)
+        return list_response(cursor, INVENTORY_LISTING, serialize_inventory)
 
-@app.route('/api/district-expenses')
-def get_district_expenses():
-    conn = sqlite3.connect('church_management.db')
+@app.route('/api/accounting-entries')
+def get_accounting_entries():
+    conn = get_db_connection()
     cursor = conn.cursor()
+    return list_response(cursor, ACCOUNTING_ENTRIES_LISTING, serialize_accounting_entry)
+
+def date_range_args():
+    """Return (start_date, end_date) parsed from the query string; either may be None."""
+    bounds = []
+    for name in ('start_date', 'end_date'):
+        value = request.args.get(name)
+        try:
+            bounds.append(date.fromisoformat(value) if value else None)
+        except ValueError:
+            raise ValueError(f'{name} must be a YYYY-MM-DD date')
+    return tuple(bounds)
+
+def job_response(job):
+    """JSON status of an export job, with where to poll and download it."""
+    job = dict(job, success=job['status'] != 'failed',
+               status_url=f"/api/jobs/{job['job_id']}",
+               download_url=f"/api/jobs/{job['job_id']}/download")
+    return jsonify(job), 200 if job['status'] == 'done' else 202
+
+def submit_job(job_type, params, filename):
+    """Queue an export job and return its status response."""
+    try:
+        job = jobs.submit(get_db_connection().cursor(), job_type, params, filename)
+    except Exception as e:
+        print(f'Could not start {job_type} export: {e}')
+        return jsonify({'success': False, 'message': f'Could not start the export: {str(e)}'}), 500
+    return job_response(job)
+
+@app.route('/api/export')
+def export_excel():
+    try:
+        start_date, end_date = date_range_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    params = {
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None
+    }
+    return submit_job('excel', params, f'Church_Report_{date.today().isoformat()}.xlsx')
+
+@app.route('/api/export-pdf')
+def export_pdf():
+    try:
+        start_date, end_date = date_range_args()
+        start, end, label = ledger.period_bounds(request.args.get('period'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if start_date or end_date:
+        # Explicit dates narrow or replace the period bounds
+        start, end, label = start_date or start, end_date or end, 'Custom Period'
+    
+    params = {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'label': label}
+    return submit_job('pdf', params, f'Church_Report_{start.isoformat()}_{end.isoformat()}.pdf')
+
+@app.route('/api/export-statements')
+def export_statements():
+    try:
+        start, end, label = ledger.period_bounds(request.args.get('period'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    params = {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'label': label}
+    return submit_job('statements', params, f'Giving_Statements_{start.isoformat()}_{end.isoformat()}.zip')
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.status(job_id) if job_id.isalnum() else None
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return job_response(job)
+
+@app.route('/api/jobs/<job_id>/download')
+def job_download(job_id):
+    job = jobs.status(job_id) if job_id.isalnum() else None
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    if job['status'] != 'done':
+        return job_response(job)
+    path = jobs.result_path(job_id, job['type'])
+    jobs.touch(path)
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=job['filename'],
+                     mimetype=jobs.RESULT_TYPES[job['type']][1])
+
+@app.route('/api/year-reset', methods=['POST'])
+def year_reset():
+    data = request.get_json(silent=True) or {}
+    try:
+        year = int(data.get('year', archive.latest_closable_year()))
+        result = archive.close_year(year)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseError as e:
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
     
-    cursor.execute('SELECT * FROM district_expenses ORDER BY date DESC')
-    records = cursor.fetchall()
-    conn.close()
+    moved = sum(result['rows_moved'].values())
+    print(f'Closed fiscal year {year}: {moved} rows archived')
+    return jsonify({
+        'success': True,
+        'message': f'Fiscal year {year}/{year + 1} closed; {moved} records archived',
+        'closing': archive.in_cedis(result)
+    })
+
+@app.route('/api/historical-years')
+def historical_years():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM year_closings ORDER BY fiscal_year DESC')
+    closings = [archive.in_cedis(dict(row)) for row in cursor.fetchall()]
+    return jsonify({
+        'success': True,
+        'years': [closing['fiscal_year'] for closing in closings],
+        'closings': closings
+    })
+
+@app.route('/api/historical-data/<int:year>')
+def historical_data(year):
+    try:
+        digest, body = archive.load_snapshot(year)
+    except FileNotFoundError:
+        # Years closed before snapshots existed get theirs on first view
+        cursor = get_db_connection().cursor()
+        cursor.execute('SELECT * FROM year_closings WHERE fiscal_year = ?', (year,))
+        closing = cursor.fetchone()
+        if closing is None or not os.path.exists(archive.archive_path(year)):
+            return jsonify({'success': False, 'message': f'Fiscal year {year} has not been closed'}), 404
+        closing = dict(closing)
+        closing.pop('snapshot_hash', None)
+        snapshot_hash = archive.write_snapshot(year, closing)
+        cursor.execute('UPDATE year_closings SET snapshot_hash = ? WHERE fiscal_year = ?', (snapshot_hash, year))
+        get_db_connection().commit()
+        digest, body = archive.load_snapshot(year)
     
-    expense_list = []
-    for record in records:
-        expense_list.append({
-            'id': record[0],
-            'source': record[1],
-            'originalAmount': record[2],
-            'districtAmount': record[3],
-            'date': record[4],
-            'status': record[5]
-        })
+    # Served as stored (gzip) when the client accepts it; each encoding gets its own strong ETag
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f'{digest}-gz')
+    else:
+        response = Response(gzip.decompress(body), mimetype='application/json')
+        response.set_etag(digest)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/year-reopen/<int:year>', methods=['POST'])
+def year_reopen(year):
+    try:
+        counts = archive.reopen_year(year)
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except DatabaseError as e:
+        return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
     
-    return jsonify(expense_list)
+    restored = sum(counts.values())
+    print(f'Reopened fiscal year {year}: {restored} rows restored')
+    return jsonify({
+        'success': True,
+        'message': f'Fiscal year {year}/{year + 1} reopened; {restored} records restored',
+        'restored': counts
+    })
+
+@app.route('/api/reports/pl')
+def profit_and_loss_report():
+    try:
+        first, last, label = ledger.period_range(request.args.get('period'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    cursor = get_db_connection().cursor()
+    report = ledger.profit_and_loss(cursor, first, last)
+    return jsonify(dict(report, success=True, label=label, start_period=first, end_period=last))
+
+@app.route('/api/reports/trial-balance')
+def trial_balance_report():
+    # Balances are cumulative up to the end of the requested period
+    last = None
+    if request.args.get('period'):
+        try:
+            _, last, _ = ledger.period_range(request.args['period'])
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+    cursor = get_db_connection().cursor()
+    return jsonify(dict(ledger.trial_balance(cursor, last), success=True, as_of=last))
+
+@app.route('/api/reports/<period>')
+def period_report(period):
+    # NumPy is only loaded once a period report is asked for
+    import period_reports
+    if period not in period_reports.PERIODS:
+        return jsonify({'success': False, 'message': f'Unknown report period: {period}'}), 404
+    try:
+        anchor = date.fromisoformat(request.args['date']) if request.args.get('date') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'date must be YYYY-MM-DD'}), 400
+    cursor = get_db_connection().cursor()
+    return jsonify(dict(period_reports.build(cursor, period, anchor), success=True))
 
 @app.route('/api/reports/dashboard')
 def dashboard_report():
-    conn = sqlite3.connect('church_management.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     
-    today = date.today().isoformat()
-    
-    # Today's income (local amount only)
-    cursor.execute('''
-        SELECT COALESCE(SUM(COALESCE(local_amount, amount)), 0) 
-        FROM income WHERE date = ?
-    ''', (today,))
-    today_income = cursor.fetchone()[0]
-    
-    # Today's expenses
-    cursor.execute('''
-        SELECT COALESCE(SUM(amount), 0) 
-        FROM expenses WHERE date = ?
-    ''', (today,))
-    today_expense = cursor.fetchone()[0]
-    
-    # Monthly totals
-    current_month = datetime.now().strftime('%Y-%m')
-    cursor.execute('''
-        SELECT COALESCE(SUM(COALESCE(local_amount, amount)), 0) 
-        FROM income WHERE date LIKE ?
-    ''', (f"{current_month}%",))
-    monthly_income = cursor.fetchone()[0]
-    
-    cursor.execute('''
-        SELECT COALESCE(SUM(amount), 0) 
-        FROM expenses WHERE date LIKE ?
-    ''', (f"{current_month}%",))
-    monthly_expense = cursor.fetchone()[0]
+    # Totals are read from the period rollups maintained on every write
+    today = date.today()
+    day_totals = rollups.totals(cursor, 'day', today.isoformat())
+    month_totals = rollups.totals(cursor, 'month', today.strftime('%Y-%m'))
     
-    conn.close()
+    today_income = day_totals.get(rollups.INCOME_LOCAL, 0)
+    today_expense = rollups.expense_total(day_totals)
     
     return jsonify({
-        'todayIncome': today_income,
-        'todayExpense': today_expense,
-        'netBalance': today_income - today_expense,
-        'monthlyIncome': monthly_income,
-        'monthlyExpense': monthly_expense
+        'todayIncome': to_cedis(today_income),
+        'todayExpense': to_cedis(today_expense),
+        'todayLocalExpense': to_cedis(day_totals.get(rollups.expense_metric('other'), 0)),
+        'todayDistrictAllocation': to_cedis(day_totals.get(rollups.INCOME_DISTRICT, 0)),
+        'netBalance': to_cedis(today_income - today_expense),
+        'monthlyIncome': to_cedis(month_totals.get(rollups.INCOME_LOCAL, 0)),
+        'monthlyExpense': to_cedis(rollups.expense_total(month_totals))
     })
 
 
@@ -1155,7 +1096,8 @@ if __name__ == '__main__':
     if getattr(sys, 'frozen', False):
         app.static_folder = sys._MEIPASS
 
-    ensure_directories()
+    import bootstrap
+    bootstrap.run()
     
     # Get port from environment variable or use 5000 as default
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,455 @@
+"""Fiscal-year close: move a finished April-March year into its own archive.
+
+Closing a year copies that year's ledger rows into ``<ARCHIVE_DIR>/fy<year>.db``
+(a plain SQLite file), deletes them from the live database and records the
+closing balances, so the live tables only ever hold open years. Archived
+years are read back by ATTACHing their file read-only.
+
+Tithes and offerings carry no transaction date; their grid rows belong to
+the fiscal year their calendar year and month fall in.
+
+A closed year's P&L, monthly breakdown and transactions are also written
+once, at close, to a compressed JSON snapshot beside the archive; history
+is served from it and it only changes if the year is reopened.
+
+    python archive.py close 2024     # close the April 2024 - March 2025 year
+    python archive.py reopen 2024    # move its rows back into the live database
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from urllib.request import pathname2url
+
+import members
+import rollups
+from db import connect
+from migrations import GRID_PERIOD, GRIDS, WEEKS, table_columns
+from money import to_cedis
+from streaming import iter_rows
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archives')
+
+# Ledger -> column that places a row in a fiscal year
+ARCHIVED_TABLES = (
+    ('income', 'date'),
+    ('tithes', GRID_PERIOD),
+    ('offerings', GRID_PERIOD),
+    ('expenses', 'date'),
+    ('district_expenses', 'date'),
+    ('accounting_entries', 'date'),
+)
+COPY_BATCH = 1000
+
+# PRAGMA user_version of archives whose amounts are integer pesewas
+PESEWAS_VERSION = 1
+
+# Money fields of a year_closings row / closing summary
+CLOSING_AMOUNTS = ('income_total', 'local_total', 'district_total', 'expense_total',
+                   'local_expense_total', 'net_balance')
+
+
+def year_bounds(year):
+    """Return the [start, end) date strings of the fiscal year starting in April of year."""
+    return f'{year}-04-01', f'{year + 1}-04-01'
+
+
+def year_filter(column, year):
+    """Return (SQL condition, params) selecting the rows of fiscal year `year` by column."""
+    if column == GRID_PERIOD:
+        # April-December of year, January-March of the next
+        return '((year = ? AND month >= 4) OR (year = ? AND month < 4))', [year, year + 1]
+    return f'{column} >= ? AND {column} < ?', list(year_bounds(year))
+
+
+def archive_path(year):
+    return os.path.join(ARCHIVE_DIR, f'fy{year}.db')
+
+
+def latest_closable_year(today=None):
+    """The most recent fiscal year that has already ended."""
+    today = (today or date.today()).isoformat()
+    return rollups.fiscal_year(today) - 1
+
+
+def _copy_table(cursor, archive, table, column, year):
+    """Copy one ledger's rows for the year into the archive; return the row count."""
+    where, params = year_filter(column, year)
+    cursor.execute(f'SELECT * FROM {table} WHERE {where} ORDER BY id', params)
+    columns = [description[0] for description in cursor.description]
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    archive.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({column_list})')
+    keys = ', '.join(f'"{key}"' for key in column.split(', '))
+    archive.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column.replace(", ", "_")}" ON "{table}" ({keys})')
+    insert = f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join("?" * len(columns))})'
+
+    count = 0
+    batch = []
+    for row in iter_rows(cursor, COPY_BATCH):
+        batch.append(tuple(_sqlite_value(value) for value in row))
+        if len(batch) == COPY_BATCH:
+            _write_batch(archive, table, insert, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        _write_batch(archive, table, insert, batch)
+        count += len(batch)
+    return count
+
+
+def _sqlite_value(value):
+    # PostgreSQL hands back Decimal and date objects that sqlite3 cannot bind
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _write_batch(archive, table, insert, batch):
+    # Re-closing a year replaces rows archived by an earlier, interrupted run
+    archive.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(row[0],) for row in batch])
+    archive.executemany(insert, batch)
+
+
+def _closing_summary(archive):
+    """Totals and per-account balances computed from an archive's contents."""
+    def scalar(sql):
+        try:
+            return archive.execute(sql).fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            # The ledger had no rows to archive, so its table was never created
+            return 0
+
+    summary = {
+        'income_total': scalar('SELECT SUM(amount) FROM income'),
+        'local_total': scalar('SELECT SUM(COALESCE(local_amount, amount)) FROM income'),
+        'district_total': scalar('SELECT SUM(district_amount) FROM income'),
+        'expense_total': scalar('SELECT SUM(amount) FROM expenses'),
+        'local_expense_total': scalar("SELECT SUM(amount) FROM expenses WHERE expense_type != 'district'"),
+    }
+    summary['net_balance'] = summary['local_total'] - summary['local_expense_total']
+    summary['rows_archived'] = sum(scalar(f'SELECT COUNT(*) FROM {table}') for table, _ in ARCHIVED_TABLES)
+    try:
+        balances = archive.execute('''
+            SELECT account_name, COALESCE(SUM(debit_amount), 0), COALESCE(SUM(credit_amount), 0)
+            FROM accounting_entries GROUP BY account_name ORDER BY account_name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        balances = []
+    return summary, balances
+
+
+def close_year(year, verbose=False):
+    """Archive fiscal year `year` and return its closing summary.
+
+    Safe to run again for the same year: rows added since the last close
+    are swept into the existing archive and the balances recomputed.
+    """
+    if year > latest_closable_year():
+        raise ValueError(f'Fiscal year {year}/{year + 1} has not ended yet')
+    bounds = year_bounds(year)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = archive_path(year)
+
+    conn = connect()
+    archive = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        # Hold the write lock throughout so no row lands between copy and delete
+        conn.begin()
+        counts = {}
+        for table, column in ARCHIVED_TABLES:
+            counts[table] = _copy_table(cursor, archive, table, column, year)
+        summary, balances = _closing_summary(archive)
+        archive.execute('''
+            CREATE TABLE IF NOT EXISTS closing_balances (
+                account_name TEXT PRIMARY KEY, debit_total INTEGER, credit_total INTEGER, balance INTEGER
+            )
+        ''')
+        archive.execute(f'PRAGMA user_version = {PESEWAS_VERSION}')
+        archive.execute('DELETE FROM closing_balances')
+        archive.executemany('INSERT INTO closing_balances VALUES (?, ?, ?, ?)',
+                            [(name, debit, credit, debit - credit) for name, debit, credit in balances])
+        # The archive is committed before the live rows go, so a crash can
+        # only leave rows in both places, which the next close reconciles
+        archive.commit()
+
+        closing = dict(summary, fiscal_year=year)
+        snapshot_hash = write_snapshot(year, closing)
+
+        day_filter = 'date >= ? AND date < ?'
+        rollups.remove_income(cursor, day_filter, bounds)
+        rollups.remove_expenses(cursor, day_filter, bounds)
+        for table, column in ARCHIVED_TABLES:
+            where, params = year_filter(column, year)
+            cursor.execute(f'DELETE FROM {table} WHERE {where}', params)
+
+        cursor.execute('DELETE FROM closing_balances WHERE fiscal_year = ?', (year,))
+        cursor.executemany('''
+            INSERT INTO closing_balances (fiscal_year, account_name, debit_total, credit_total, balance)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(year, name, debit, credit, debit - credit) for name, debit, credit in balances])
+        cursor.execute('DELETE FROM year_closings WHERE fiscal_year = ?', (year,))
+        cursor.execute('''
+            INSERT INTO year_closings
+            (fiscal_year, archive_file, income_total, local_total, district_total,
+             expense_total, local_expense_total, net_balance, rows_archived, snapshot_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (year, os.path.basename(path), summary['income_total'], summary['local_total'],
+              summary['district_total'], summary['expense_total'], summary['local_expense_total'],
+              summary['net_balance'], summary['rows_archived'], snapshot_hash))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        archive.close()
+        conn.close()
+
+    if verbose:
+        for table, count in counts.items():
+            print(f'Archived {count} {table} rows')
+    return dict(summary, fiscal_year=year, rows_moved=counts)
+
+
+def in_cedis(closing):
+    """Return a closing summary or year_closings row with its amounts in cedis."""
+    return dict(closing, **{key: to_cedis(closing[key]) for key in CLOSING_AMOUNTS if key in closing})
+
+
+def closed_years(cursor):
+    cursor.execute('SELECT fiscal_year FROM year_closings ORDER BY fiscal_year DESC')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def open_archive(year):
+    """Return a connection with the year's archive attached read-only as ``fy``.
+
+    The main database is in-memory; opening it with URI filenames enabled
+    lets ATTACH honour ``mode=ro``, so the archive cannot be written.
+    """
+    path = archive_path(year)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'No archive for fiscal year {year}')
+    conn = sqlite3.connect(':memory:', uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute('ATTACH DATABASE ? AS fy', (f'file:{pathname2url(os.path.abspath(path))}?mode=ro',))
+    return conn
+
+
+def _has_table(conn, table):
+    return conn.execute("SELECT 1 FROM fy.sqlite_master WHERE type = 'table' AND name = ?",
+                        (table,)).fetchone() is not None
+
+
+def _snapshot_data(year, closing):
+    """Compute the closed year's P&L, monthly breakdown and transactions from its archive."""
+    conn = open_archive(year)
+    try:
+        pl = {'revenue': {}, 'expenses': {}}
+        months = {}
+        transactions = []
+        for table, kind, key in (('income', 'Income', 'revenue'), ('expenses', 'Expense', 'expenses')):
+            if not _has_table(conn, table):
+                continue
+            for row in conn.execute(f'SELECT category, SUM(amount) FROM fy.{table} GROUP BY category'):
+                pl[key][row[0]] = to_cedis(row[1])
+            for row in conn.execute(f'SELECT SUBSTR(date, 1, 7), SUM(amount) FROM fy.{table} GROUP BY 1'):
+                month = months.setdefault(row[0], {'month': row[0], 'revenue': 0, 'expenses': 0})
+                month[key] = row[1] or 0
+            for row in conn.execute(f'SELECT date, category, description, amount FROM fy.{table}'):
+                transactions.append({
+                    'date': row['date'],
+                    'type': kind,
+                    'category': row['category'],
+                    'description': row['description'],
+                    'amount': to_cedis(row['amount'])
+                })
+        transactions.sort(key=lambda item: item['date'] or '')
+        monthly = [{
+            'month': month['month'],
+            'revenue': to_cedis(month['revenue']),
+            'expenses': to_cedis(month['expenses']),
+            'net': to_cedis(month['revenue'] - month['expenses'])
+        } for _, month in sorted(months.items())]
+        balances = []
+        if _has_table(conn, 'closing_balances'):
+            balances = [
+                dict(row, **{key: to_cedis(row[key]) for key in ('debit_total', 'credit_total', 'balance')})
+                for row in conn.execute('SELECT * FROM fy.closing_balances ORDER BY account_name')
+            ]
+    finally:
+        conn.close()
+    start, end = year_bounds(year)
+    return {
+        'year': year,
+        'period': {'start': start, 'end': end},
+        'closing': in_cedis(closing),
+        'pl': pl,
+        'pl_by_account': balances,
+        'monthly': monthly,
+        'transactions': transactions
+    }
+
+
+def snapshot_path(year):
+    return os.path.join(ARCHIVE_DIR, f'fy{year}.snapshot.json.gz')
+
+
+def write_snapshot(year, closing):
+    """Write the year's gzip-compressed JSON snapshot; return its sha256 content hash."""
+    payload = json.dumps(_snapshot_data(year, closing), sort_keys=True, separators=(',', ':'),
+                         default=str).encode()
+    path = snapshot_path(year)
+    partial = f'{path}.{os.getpid()}.part'
+    with open(partial, 'wb') as handle:
+        # mtime=0 keeps the file byte-identical for identical content
+        handle.write(gzip.compress(payload, mtime=0))
+    os.replace(partial, path)
+    return hashlib.sha256(payload).hexdigest()
+
+
+# year -> ((mtime_ns, size), content hash, compressed bytes)
+_snapshots = {}
+
+
+def load_snapshot(year):
+    """Return (content hash, gzip bytes) of a closed year's snapshot.
+
+    Kept in memory per process and re-read only when the file changes, so
+    serving history costs a stat call. Raises FileNotFoundError if the year
+    has no snapshot.
+    """
+    path = snapshot_path(year)
+    info = os.stat(path)
+    key = (info.st_mtime_ns, info.st_size)
+    cached = _snapshots.get(year)
+    if cached and cached[0] == key:
+        return cached[1], cached[2]
+    with open(path, 'rb') as handle:
+        body = handle.read()
+    digest = hashlib.sha256(gzip.decompress(body)).hexdigest()
+    _snapshots[year] = (key, digest, body)
+    return digest, body
+
+
+def _restore_grid(cursor, table, columns, rows, year):
+    """Move archived grid rows back; return (rows restored, {archived id: live id} of merged rows).
+
+    A week entered for the same member and month after the close already
+    has a live row; the archived weeks are added to it, as both were posted.
+    """
+    key = 'member_ref' if table == 'tithes' else 'member_name'
+    live_columns = list(columns) + [name for name in ('year', key) if name not in columns]
+    insert = f'INSERT INTO {table} ({", ".join(live_columns)}) VALUES ({", ".join("?" * len(live_columns))})'
+    count, merged = 0, {}
+    while True:
+        batch = rows.fetchmany(COPY_BATCH)
+        if not batch:
+            break
+        for row in batch:
+            values = dict(zip(live_columns, tuple(row) + (None,) * (len(live_columns) - len(columns))))
+            if values['year'] is None:
+                # Archived before grid rows had a year: the April-March year
+                values['year'] = year if values['month'] >= 4 else year + 1
+            if key == 'member_ref' and values['member_ref'] is None:
+                values['member_ref'] = members.resolve(
+                    cursor, values['member_name'], members.row_code(values['member_name'], values['member_id']))
+            cursor.execute(f'SELECT * FROM {table} WHERE {key} = ? AND year = ? AND month = ?',
+                           (values[key], values['year'], values['month']))
+            live = cursor.fetchone()
+            if live is None:
+                cursor.execute(insert, [values[name] for name in live_columns])
+            else:
+                weeks = [None if live[week] is None and values.get(week) is None
+                         else (live[week] or 0) + (values.get(week) or 0) for week in WEEKS]
+                cursor.execute(f'UPDATE {table} SET {", ".join(f"{week} = ?" for week in WEEKS)}, total = ? '
+                               f'WHERE id = ?', weeks + [sum(week or 0 for week in weeks), live['id']])
+                merged[values['id']] = live['id']
+            count += 1
+    return count, merged
+
+
+def reopen_year(year, verbose=False):
+    """Move an archived year's rows back into the live database.
+
+    The archive, its snapshot and the recorded closing are removed; closing
+    the year again rebuilds them. Grid rows entered for the year after it
+    was closed are merged with the archived rows for the same member and
+    month.
+    """
+    path = archive_path(year)
+    archived = open_archive(year)
+    conn = connect()
+    counts, merged = {}, {}
+    try:
+        cursor = conn.cursor()
+        conn.begin()
+        for table, _ in ARCHIVED_TABLES:
+            if not _has_table(archived, table):
+                continue
+            live = table_columns(cursor, table)
+            columns = [row[1] for row in archived.execute(f'PRAGMA fy.table_info("{table}")') if row[1] in live]
+            column_list = ', '.join(columns)
+            insert = f'INSERT INTO {table} ({column_list}) VALUES ({", ".join("?" * len(columns))})'
+            rows = archived.execute(f'SELECT {column_list} FROM fy."{table}" ORDER BY id')
+            if table in GRIDS:
+                counts[table], merged[table] = _restore_grid(cursor, table, columns, rows, year)
+                continue
+            counts[table] = 0
+            while True:
+                batch = rows.fetchmany(COPY_BATCH)
+                if not batch:
+                    break
+                cursor.executemany(insert, [tuple(row) for row in batch])
+                counts[table] += len(batch)
+        # Income posted from a merged grid row now belongs to the live row
+        for table, ids in merged.items():
+            link = GRIDS[table][1]
+            cursor.executemany(f'UPDATE income SET {link} = ? WHERE {link} = ?',
+                               [(live, old) for old, live in ids.items()])
+        members.link_tithes(cursor)
+        if cursor.dialect == 'postgres':
+            # Explicit ids were inserted, so move each id sequence past them
+            for table, _ in ARCHIVED_TABLES:
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                               f"COALESCE((SELECT MAX(id) FROM {table}), 1))")
+        rollups.rebuild(cursor)
+        cursor.execute('DELETE FROM closing_balances WHERE fiscal_year = ?', (year,))
+        cursor.execute('DELETE FROM year_closings WHERE fiscal_year = ?', (year,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        archived.close()
+        conn.close()
+
+    for stale in (snapshot_path(year), path):
+        if os.path.exists(stale):
+            os.remove(stale)
+    _snapshots.pop(year, None)
+    if verbose:
+        for table, count in counts.items():
+            print(f'Restored {count} {table} rows')
+    return counts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in ('close', 'reopen'):
+        print('Usage: python archive.py close|reopen <fiscal year>')
+        sys.exit(2)
+    started = time.perf_counter()
+    if sys.argv[1] == 'reopen':
+        reopen_year(int(sys.argv[2]), verbose=True)
+        print(f'Reopened fiscal year {sys.argv[2]} in {time.perf_counter() - started:.1f}s')
+        sys.exit(0)
+    result = close_year(int(sys.argv[2]), verbose=True)
+    print(f'Closed fiscal year {result["fiscal_year"]} in {time.perf_counter() - started:.1f}s; '
+          f'net local balance {to_cedis(result["net_balance"]):.2f}')
@@ -0,0 +1,68 @@
+"""Many records in one POST.
+
+The income, expenses, district-expenses and inventory routes also accept a
+JSON array of the objects they take one at a time. Every item is checked
+up front by the route's own parser, then the valid ones are written by the
+route's writer in a single transaction, one executemany per table. With
+``mode=atomic`` (the default) one invalid item rejects the whole batch;
+with ``mode=partial`` the valid items are saved and the others reported by
+index.
+"""
+ATOMIC = 'atomic'
+PARTIAL = 'partial'
+MODES = (ATOMIC, PARTIAL)
+
+# Largest array accepted in one request
+MAX_ITEMS = 5000
+
+
+def validate(items, parse):
+    """Parse every item; return (parsed items, or None where invalid, and the errors by index)."""
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Each item must be an object')
+            parsed.append(parse(item))
+        except ValueError as e:
+            parsed.append(None)
+            errors.append({'index': index, 'message': str(e)})
+    return parsed, errors
+
+
+def run(conn, items, parse, write, mode=ATOMIC):
+    """Validate and save a batch; return (response body, HTTP status).
+
+    write(cursor, parsed items) inserts the items and returns their ids in
+    order; ``ids`` in the response lines up with the request array, with
+    None for items that were not saved.
+    """
+    if mode not in MODES:
+        raise ValueError('mode must be atomic or partial')
+    if not items:
+        raise ValueError('Send at least one item')
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f'Send at most {MAX_ITEMS} items per request')
+
+    parsed, errors = validate(items, parse)
+    valid = [index for index, item in enumerate(parsed) if item is not None]
+    ids = [None] * len(items)
+    if not valid or (errors and mode == ATOMIC):
+        message = f'{len(errors)} of {len(items)} items are invalid; nothing was saved'
+        return {'success': False, 'message': message, 'ids': ids, 'errors': errors}, 400
+
+    cursor = conn.cursor()
+    conn.begin()
+    try:
+        new_ids = write(cursor, [parsed[index] for index in valid])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for index, new_id in zip(valid, new_ids):
+        ids[index] = new_id
+
+    message = f'Saved {len(valid)} of {len(items)} items'
+    if errors:
+        message += f'; {len(errors)} invalid'
+    return {'success': not errors, 'message': message, 'ids': ids, 'errors': errors}, 200
@@ -0,0 +1,79 @@
+"""Measure time and peak memory of the Excel export on a large ledger.
+
+Seeds a scratch SQLite database with N accounting entries (1M by default)
+and, in a fresh process, writes the full workbook with
+excel_export.write_workbook, sampling memory while it runs:
+
+    python bench_export.py            # 1,000,000 rows
+    python bench_export.py 100000 1000000
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_streaming import anonymous_kib, seed
+
+DEFAULT_SIZES = (1000000,)
+
+
+def export_once():
+    """Write the workbook and print bytes, seconds, peak anon and peak RSS in KiB."""
+    import db
+    import excel_export
+
+    peak = [anonymous_kib()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], anonymous_kib())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    conn = db.connect()
+    started = time.perf_counter()
+    try:
+        excel_export.write_workbook(conn, path)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+    finally:
+        done.set()
+        sampler.join()
+        conn.close()
+        os.remove(path)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(size, f'{elapsed:.2f}', max(peak[0], anonymous_kib()), rss)
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or DEFAULT_SIZES
+    workdir = tempfile.mkdtemp(prefix='fms-export-bench-')
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ.pop('DATABASE_URL', None)
+
+    import migrations
+    migrations.migrate(verbose=False)
+
+    print(f'{"rows":>10} {"xlsx MiB":>9} {"seconds":>8} {"peak anon MiB":>14} {"peak RSS MiB":>13}')
+    for count in sorted(sizes):
+        seed(count)
+        output = subprocess.run(
+            [sys.executable, __file__, '--child'], env=os.environ,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        size, elapsed, peak_anon, peak = output[-4:]
+        print(f'{count:>10} {int(size) / 2 ** 20:>9.1f} {elapsed:>8} '
+              f'{int(peak_anon) / 1024:>14.1f} {int(peak) / 1024:>13.1f}')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        export_once()
+    else:
+        main(sys.argv[1:])
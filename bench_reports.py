@@ -0,0 +1,121 @@
+"""Compare the vectorized period reports with a per-row Python loop.
+
+Seeds a scratch SQLite database with N income and N expense rows spread
+over six years, then times period_reports.build(..., 'all') against the
+same totals, category breakdowns and monthly series computed one row at
+a time from the ledgers, and compares the report's JSON size with the
+full income list the browser used to download:
+
+    python bench_reports.py            # 10k .. 1M rows of each
+    python bench_reports.py 100000
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+SEED_BATCH = 50000
+CATEGORIES = ('Donation', 'Harvest', 'Fundraising', 'Welfare', 'Building Fund')
+FIRST_DAY = date(2019, 1, 1)
+SPAN_DAYS = 6 * 365
+
+
+def day(i):
+    # Scatter rows over every day of six years
+    return (FIRST_DAY + timedelta(days=i * 7919 % SPAN_DAYS)).isoformat()
+
+
+def seed(count):
+    """Grow the scratch income and expense ledgers to count rows each."""
+    import db
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM income')
+        have = cursor.fetchone()[0]
+        while have < count:
+            batch = range(have, min(count, have + SEED_BATCH))
+            conn.begin()
+            cursor.executemany('''
+                INSERT INTO income (category, description, amount, date, is_tithe, is_offering,
+                                    local_amount, district_amount)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                CATEGORIES[i % len(CATEGORIES)], f'Income {i}', (i % 500) * 100 + 25, day(i),
+                int(i % 3 == 1), int(i % 3 == 2), (i % 500) * 100 + 25, 0
+            ) for i in batch])
+            cursor.executemany('''
+                INSERT INTO expenses (category, description, amount, date, expense_type)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(
+                CATEGORIES[i % len(CATEGORIES)], f'Expense {i}', (i % 300) * 100 + 50, day(i),
+                'district' if i % 4 == 0 else 'other'
+            ) for i in batch])
+            conn.commit()
+            have = batch[-1] + 1
+    finally:
+        conn.close()
+
+
+def per_row(cursor):
+    """The report's monthly figures computed one row at a time."""
+    totals, by_category, series = {}, {}, {}
+    cursor.execute('SELECT date, amount, local_amount, is_tithe, is_offering, category FROM income')
+    for when, amount, local, is_tithe, is_offering, category in cursor.fetchall():
+        local = local if local is not None else amount
+        totals['local_income'] = totals.get('local_income', 0) + local
+        by_category[category] = by_category.get(category, 0) + local
+        month = series.setdefault(when[:7], {'income': 0, 'expenses': 0, 'tithes': 0, 'offerings': 0})
+        month['income'] += local
+        if is_tithe:
+            month['tithes'] += amount
+        if is_offering:
+            month['offerings'] += amount
+    cursor.execute('SELECT date, amount, expense_type, category FROM expenses')
+    for when, amount, expense_type, category in cursor.fetchall():
+        if expense_type == 'district':
+            continue
+        totals['local_expenses'] = totals.get('local_expenses', 0) + amount
+        month = series.setdefault(when[:7], {'income': 0, 'expenses': 0, 'tithes': 0, 'offerings': 0})
+        month['expenses'] += amount
+    return totals, by_category, series
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or DEFAULT_SIZES
+    workdir = tempfile.mkdtemp(prefix='fms-report-bench-')
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ.pop('DATABASE_URL', None)
+
+    import migrations
+    migrations.migrate(verbose=False)
+    import db
+    import period_reports
+    from money import to_cedis
+
+    print(f'{"rows":>10} {"per-row s":>10} {"numpy s":>8} {"report KiB":>11} {"income list KiB":>16} {"match":>6}')
+    for count in sorted(sizes):
+        seed(count)
+        conn = db.connect()
+        try:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            totals, _, _ = per_row(cursor)
+            looped = time.perf_counter() - started
+            started = time.perf_counter()
+            report = period_reports.build(cursor, 'all')
+            vectorized = time.perf_counter() - started
+            cursor.execute('SELECT * FROM income')
+            listing = sum(len(json.dumps(dict(row))) + 1 for row in cursor.fetchall())
+        finally:
+            conn.close()
+        match = all(report['totals'][key] == to_cedis(totals[key]) for key in totals)
+        print(f'{count:>10} {looped:>10.2f} {vectorized:>8.3f} '
+              f'{len(json.dumps(report)) / 1024:>11.1f} {listing / 1024:>16.1f} {str(match):>6}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
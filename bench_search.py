@@ -0,0 +1,89 @@
+"""Compare /api/search with a LIKE '%term%' scan as the ledgers grow.
+
+Seeds a scratch SQLite database with N expense rows (the search index is
+filled by its triggers as they are inserted), then times a few searches
+through Flask's test client against the equivalent LIKE query:
+
+    python bench_search.py                 # 100k and 1M rows
+    python bench_search.py 10000 3000000
+"""
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = (100000, 1000000)
+SEED_BATCH = 50000
+WORDS = ('generator', 'repair', 'fuel', 'chairs', 'roofing', 'sheets', 'transport', 'pastor', 'visit',
+         'electricity', 'bill', 'water', 'cleaning', 'canopy', 'rental', 'keyboard', 'speaker', 'mission')
+QUERIES = ('generator repair', 'canopy', 'keyboard speaker', 'zzrare')
+RUNS = 5
+
+
+def seed(count):
+    """Grow the scratch expenses ledger to count rows."""
+    import db
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM expenses')
+        have = cursor.fetchone()[0]
+        while have < count:
+            batch = range(have, min(count, have + SEED_BATCH))
+            conn.begin()
+            cursor.executemany('''
+                INSERT INTO expenses (category, description, amount, date, expense_type)
+                VALUES (?, ?, ?, ?, 'other')
+            ''', [(
+                WORDS[i % 7].capitalize(),
+                ' '.join(WORDS[(i * k + k) % len(WORDS)] for k in range(1, 5)) + (' zzrare' if i % 99991 == 0 else ''),
+                (i % 500) * 100 + 25, f'20{19 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d}'
+            ) for i in batch])
+            conn.commit()
+            have = batch[-1] + 1
+    finally:
+        conn.close()
+
+
+def best_of(run):
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+
+def measure(count):
+    import db
+    from app import app
+    client = app.test_client()
+    conn = db.connect()
+    try:
+        for query in QUERIES:
+            search_ms, response = best_of(lambda: client.get(f'/api/search?q={query}&limit=20'))
+            like = ' AND '.join("category || ' ' || description LIKE ?" for _ in query.split())
+            like_ms, matches = best_of(lambda: conn.execute(
+                f'SELECT id FROM expenses WHERE {like} ORDER BY date DESC LIMIT 20',
+                [f'%{word}%' for word in query.split()]).fetchall())
+            print(f'{count:>9} rows  {query!r:<20} search {search_ms:8.1f} ms '
+                  f'({len(response.get_json()["data"])} hits)   LIKE {like_ms:8.1f} ms ({len(matches)} rows)')
+    finally:
+        conn.close()
+
+
+def main(sizes):
+    workdir = tempfile.mkdtemp(prefix='fms-search-')
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ.pop('DATABASE_URL', None)
+    import migrations
+    migrations.migrate(verbose=False)
+    for count in sorted(sizes):
+        started = time.perf_counter()
+        seed(count)
+        print(f'Seeded {count} rows in {time.perf_counter() - started:.1f}s')
+        measure(count)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,116 @@
+"""Measure peak worker memory while streaming the accounting ledger.
+
+Seeds a scratch SQLite database with N accounting entries, then streams
+``/api/accounting-entries?format=...`` through Flask's test client in a
+fresh process per size and reports that process's peak memory. With
+streaming the peak should stay flat as the row count grows.
+
+Total RSS also counts database pages SQLite maps into memory (up to the
+256 MiB ``mmap_size`` in db.py); those are shared, reclaimable page cache,
+so the anonymous (heap) peak is the figure that shows buffering:
+
+    python bench_streaming.py                      # 10k .. 5M rows, ndjson
+    python bench_streaming.py --format csv 10000 1000000
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = (10000, 100000, 1000000, 5000000)
+SEED_BATCH = 50000
+ACCOUNTS = ('Tithe Income', 'Offering Income', 'Other Expenses', 'District Remittance')
+
+
+def seed(count):
+    """Grow the scratch ledger to count rows."""
+    import db
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM accounting_entries')
+        have = cursor.fetchone()[0]
+        while have < count:
+            batch = range(have, min(count, have + SEED_BATCH))
+            conn.begin()
+            cursor.executemany('''
+                INSERT INTO accounting_entries
+                (account_name, debit_amount, credit_amount, description, date, period, reference_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                ACCOUNTS[i % len(ACCOUNTS)], (i % 500) * 100 + 25, 0, f'Entry {i}',
+                f'20{19 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d}',
+                f'20{19 + i % 6}-{1 + i % 12:02d}', 'income'
+            ) for i in batch])
+            conn.commit()
+            have = batch[-1] + 1
+    finally:
+        conn.close()
+
+
+def anonymous_kib():
+    """Return this process's anonymous resident memory in KiB (0 if unknown)."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def stream_once(fmt):
+    """Stream the whole ledger and print bytes, seconds, peak anon and peak RSS in KiB."""
+    from app import app
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.get(f'/api/accounting-entries?format={fmt}', buffered=False)
+    size = 0
+    peak_anon = anonymous_kib()
+    for number, chunk in enumerate(response.response):
+        size += len(chunk)
+        if number % 50 == 0:
+            peak_anon = max(peak_anon, anonymous_kib())
+    response.close()
+    elapsed = time.perf_counter() - started
+    peak_anon = max(peak_anon, anonymous_kib())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(size, f'{elapsed:.2f}', peak_anon, peak)
+
+
+def main(args):
+    fmt = 'ndjson'
+    if args[:1] == ['--format']:
+        fmt, args = args[1], args[2:]
+    sizes = [int(arg) for arg in args] or DEFAULT_SIZES
+
+    workdir = tempfile.mkdtemp(prefix='fms-stream-')
+    env = dict(os.environ, SQLITE_PATH=os.path.join(workdir, 'bench.db'))
+    env.pop('DATABASE_URL', None)
+    os.environ.update(env)
+    os.environ.pop('DATABASE_URL', None)
+
+    import migrations
+    migrations.migrate(verbose=False)
+
+    print(f'{"rows":>10} {"MiB out":>9} {"seconds":>8} {"peak anon MiB":>14} {"peak RSS MiB":>13}')
+    for count in sorted(sizes):
+        seed(count)
+        # A fresh interpreter per size so ru_maxrss reflects only this stream
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', fmt], env=env,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        size, elapsed, peak_anon, peak = output[-4:]
+        print(f'{count:>10} {int(size) / 2 ** 20:>9.1f} {elapsed:>8} '
+              f'{int(peak_anon) / 1024:>14.1f} {int(peak) / 1024:>13.1f}')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        stream_once(sys.argv[2])
+    else:
+        main(sys.argv[1:])
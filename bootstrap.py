@@ -0,0 +1,23 @@
+"""One-time setup before the app serves requests.
+
+Run once per start by whichever process owns it: the gunicorn master
+(gunicorn.conf.py), ``python app.py`` or the desktop build's main.py.
+Workers only check the schema version, never migrate.
+"""
+import os
+
+import migrations
+
+DIRECTORIES = ('data', os.getenv('REPORTS_DIR', 'reports'), os.getenv('EXPORTS_DIR', 'exports'))
+
+
+def ensure_directories():
+    """Ensure all required directories exist."""
+    for directory in DIRECTORIES:
+        os.makedirs(directory, exist_ok=True)
+
+
+def run(verbose=True):
+    """Create the data directories and apply pending schema migrations."""
+    ensure_directories()
+    migrations.migrate(verbose=verbose)
@@ -0,0 +1,77 @@
+"""Fail if importing the app gets slow or loads a heavy optional dependency.
+
+Each gunicorn worker and the desktop build import app before serving the
+first request. This imports it in fresh interpreters with ``-X importtime``
+against a scratch SQLite database, prints the slowest modules it pulls in,
+and exits non-zero when the best run exceeds IMPORT_BUDGET_MS or when any
+of HEAVY_MODULES is loaded; those belong behind the features that use them:
+
+    python check_import_time.py
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+BUDGET_MS = int(os.getenv('IMPORT_BUDGET_MS', 400))
+HEAVY_MODULES = ('reportlab', 'openpyxl', 'numpy', 'psycopg2', 'multiprocessing')
+RUNS = 3
+SHOW_SLOWEST = 10
+
+# "import time: <self us> | <cumulative us> | <indent><module>"
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(env):
+    """Return [(cumulative ms, depth, module)] for one fresh `import app`."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import app failed:\n{result.stderr[-2000:]}')
+    times = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times.append((int(match.group(2)) / 1000, (len(match.group(3)) - 1) // 2, match.group(4)))
+    return times
+
+
+def run_checks():
+    workdir = tempfile.mkdtemp(prefix='fms-import-')
+    env = dict(os.environ, SQLITE_PATH=os.path.join(workdir, 'import.db'))
+    env.pop('DATABASE_URL', None)
+    # Migrate first so the measured import is the ordinary worker start, not an upgrade
+    subprocess.run([sys.executable, 'migrations.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env=env, check=True, capture_output=True)
+
+    runs = [import_times(env) for _ in range(RUNS)]
+    times = min(runs, key=lambda run: next(ms for ms, _, module in run if module == 'app'))
+    position = next(index for index, (_, _, module) in enumerate(times) if module == 'app')
+    total = times[position][0]
+    # Children are listed before their parent, after the previous top-level import
+    start = max((index + 1 for index, (_, depth, _) in enumerate(times[:position]) if depth == 0), default=0)
+    children = [entry for entry in times[start:position] if entry[1] == 1]
+
+    print(f'import app: {total:.0f} ms (best of {RUNS}, budget {BUDGET_MS} ms)')
+    print('Slowest modules imported by app:')
+    for ms, _, module in sorted(children, reverse=True)[:SHOW_SLOWEST]:
+        print(f'  {ms:8.1f} ms  {module}')
+
+    problems = []
+    if total > BUDGET_MS:
+        problems.append(f'import app took {total:.0f} ms, over the {BUDGET_MS} ms budget')
+    loaded = sorted({module.split('.')[0] for _, _, module in times[start:position]} & set(HEAVY_MODULES))
+    problems.extend(f'{module} is imported at startup' for module in loaded)
+    return problems
+
+
+if __name__ == '__main__':
+    problems = run_checks()
+    if problems:
+        print('Import time regressions found:')
+        for problem in problems:
+            print(f'  {problem}')
+        sys.exit(1)
+    print('Heavy dependencies stay behind the features that use them.')
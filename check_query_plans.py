@@ -0,0 +1,137 @@
+"""Fail if any hot route query falls back to a full table scan.
+
+Builds a scratch SQLite database with the current migrations, drives the
+routes below through Flask's test client, captures every statement they
+run and checks its EXPLAIN QUERY PLAN. Exits non-zero on a regression, so
+it can be run from CI or before a release; tests/test_query_plans.py runs
+the same check under pytest:
+
+    python check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+HOT_REQUESTS = [
+    ('GET', '/api/reports/dashboard', None),
+    ('GET', '/api/reports/pl?period=2025', None),
+    ('GET', '/api/reports/pl?period=2025-05', None),
+    ('GET', '/api/reports/trial-balance?period=2025-05', None),
+    ('GET', '/api/reports/weekly?date=2025-05-04', None),
+    ('GET', '/api/reports/yearly?date=2025-05-04', None),
+    ('GET', '/api/income', None),
+    ('GET', '/api/income?start_date=2025-01-01&end_date=2025-12-31', None),
+    ('GET', '/api/income?is_tithe=true', None),
+    ('GET', '/api/tithes', None),
+    ('GET', '/api/tithes?month=5&member_id=M001', None),
+    ('GET', '/api/tithes?member_ref=1', None),
+    ('GET', '/api/tithes?year=2025&month=5', None),
+    ('GET', '/api/income?member_ref=1', None),
+    ('GET', '/api/members/search?q=ama', None),
+    ('GET', '/api/members/search?q=M00', None),
+    ('GET', '/api/search?q=generator%20rep', None),
+    ('GET', '/api/search?q=tithe&source=income&start_date=2025-01-01&limit=5', None),
+    ('GET', '/api/offerings', None),
+    ('GET', '/api/offerings?month=5', None),
+    ('GET', '/api/offerings?year=2025', None),
+    ('GET', '/api/expenses?type=other', None),
+    ('GET', '/api/expenses?type=district', None),
+    ('GET', '/api/district-expenses', None),
+    ('GET', '/api/inventory', None),
+    ('GET', '/api/income?limit=1', None),
+    ('GET', '/api/income?limit=1&cursor=WyIyMDI1LTA1LTA0IiwgMl0', None),
+    ('GET', '/api/income?type=tithe&limit=50', None),
+    ('GET', '/api/tithes?limit=1&cursor=WzIwMjUsIDUsIDJd', None),
+    ('GET', '/api/tithes?year=2025&limit=1&cursor=WzIwMjUsIDUsIDJd', None),
+    ('GET', '/api/offerings?limit=1&cursor=WzIwMjUsIDUsIDJd', None),
+    ('GET', '/api/expenses?limit=1&cursor=WyIyMDI1LTA1LTA2IiwgMl0', None),
+    ('GET', '/api/district-expenses?limit=1&status=pending', None),
+    ('GET', '/api/inventory?limit=1&category=Chairs', None),
+    ('GET', '/api/accounting-entries?limit=1', None),
+    ('GET', '/api/accounting-entries?account=Other%20Expenses&format=ndjson', None),
+    ('GET', '/api/income?start_date=2025-01-01&format=csv', None),
+    ('POST', '/api/tithes', {'memberName': 'Ama Mensah', 'memberId': 'M001', 'month': 5, 'week': 2, 'amount': 40}),
+    ('POST', '/api/tithes', {'memberRef': 1, 'month': 6, 'week': 1, 'amount': 30}),
+    ('POST', '/api/offerings', {'month': 5, 'week': 2, 'amount': 150}),
+    ('DELETE', '/api/income/2', None),
+    ('DELETE', '/api/tithes/1', None),
+    ('DELETE', '/api/expenses/2', None),
+    ('DELETE', '/api/inventory/1', None),
+]
+
+SEED_REQUESTS = [
+    ('POST', '/api/income', {'category': 'Donation', 'description': 'Harvest', 'amount': 500, 'date': '2025-05-04'}),
+    ('POST', '/api/income', {'category': 'Tithe', 'description': 'Tithe', 'amount': 100, 'is_tithe': True, 'date': '2025-05-04'}),
+    ('POST', '/api/tithes', {'memberName': 'Ama Mensah', 'memberId': 'M001', 'month': 5, 'week': 1, 'amount': 50}),
+    ('POST', '/api/offerings', {'month': 5, 'week': 1, 'amount': 120}),
+    ('POST', '/api/expenses', {'category': 'Repairs', 'description': 'Generator repair', 'amount': 80, 'date': '2025-05-06'}),
+    ('POST', '/api/district-expenses', {'source': 'Levy', 'originalAmount': 100, 'districtAmount': 77, 'date': '2025-05-06'}),
+    ('POST', '/api/inventory', {'itemName': 'Chair', 'category': 'Chairs', 'quantity': 40, 'condition': 'Good'}),
+]
+
+# A bare "SCAN <table>" reads every row; "SCAN ... USING INDEX" walks an index
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+CHECKED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+# List totals with no filter aggregate the whole table by design
+UNFILTERED_TOTALS = re.compile(r'^SELECT COUNT\(\*\).* WHERE 1=1$')
+
+
+def full_scans(conn, sql):
+    """Return the tables a statement reads without any index."""
+    rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    return [match.group(1) for match in (FULL_SCAN.match(row[3]) for row in rows) if match]
+
+
+def run_checks():
+    workdir = tempfile.mkdtemp(prefix='fms-plans-')
+    os.environ['SQLITE_PATH'] = os.path.join(workdir, 'plans.db')
+    os.environ.pop('DATABASE_URL', None)
+
+    import migrations
+    migrations.migrate(verbose=False)
+    return check_routes()
+
+
+def check_routes():
+    """Seed the current database through the routes and return every plan regression."""
+    import db
+    from app import app
+
+    client = app.test_client()
+    for method, url, payload in SEED_REQUESTS:
+        client.open(url, method=method, json=payload)
+
+    # The test client runs requests on this thread, so they share its pooled connection
+    conn = db.get_pool().acquire()
+    failures = []
+    for method, url, payload in HOT_REQUESTS:
+        statements = []
+        conn.raw.set_trace_callback(statements.append)
+        try:
+            response = client.open(url, method=method, json=payload)
+            # Drain streamed bodies so their queries finish inside the trace
+            response.get_data()
+            response.close()
+        finally:
+            conn.raw.set_trace_callback(None)
+        if response.status_code >= 400:
+            failures.append(f'{method} {url}: HTTP {response.status_code}')
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(CHECKED_STATEMENTS):
+                continue
+            if UNFILTERED_TOTALS.match(' '.join(sql.split())):
+                continue
+            for table in full_scans(conn.raw, sql):
+                failures.append(f'{method} {url}: full scan of {table}\n    {" ".join(sql.split())}')
+    return failures
+
+
+if __name__ == '__main__':
+    problems = run_checks()
+    if problems:
+        print('Query plan regressions found:')
+        for problem in problems:
+            print(f'  {problem}')
+        sys.exit(1)
+    print(f'All {len(HOT_REQUESTS)} hot route requests use indexed query plans.')
@@ -20,7 +20,10 @@ def clear_database():
         
         # Get list of all tables
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [table[0] for table in cursor.fetchall() if table[0] != 'sqlite_sequence']
+        # schema_version and data_version are bookkeeping, not data; the delete
+        # triggers bump data_version so cached exports are not reused
+        tables = [table[0] for table in cursor.fetchall()
+                  if table[0] not in ('sqlite_sequence', 'schema_version', 'data_version')]
         
         # Disable foreign keys temporarily
         cursor.execute("PRAGMA foreign_keys = OFF;")
@@ -0,0 +1,295 @@
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from dotenv import load_dotenv
+from flask import g, has_app_context
+
+# Before any setting is read: DATABASE_URL usually comes from .env, and
+# everything that imports db (app, bootstrap, the CLI scripts) needs it
+load_dotenv()
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'church_management.db')
+
+# Applied once when a pooled SQLite connection is opened. WAL lets readers
+# run alongside a writer, and the cache/mmap sizes keep hot pages in memory
+# between requests instead of re-reading them on every connect.
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 20000),
+    ('cache_size', -16000),
+    ('mmap_size', 268435456),
+    ('temp_store', 'MEMORY'),
+)
+
+# Upper bound of PostgreSQL connections held by one worker process
+PG_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+
+# psycopg2 is only loaded when PostgreSQL is configured; SQLite installs never pay for it
+DatabaseError = (sqlite3.Error,)
+if os.getenv('DATABASE_URL') is not None:
+    try:
+        import psycopg2
+        DatabaseError = (sqlite3.Error, psycopg2.Error)
+    except ImportError:
+        pass
+
+
+def is_postgres():
+    return os.getenv('DATABASE_URL') is not None
+
+
+# SQLite spellings that have a different PostgreSQL equivalent
+_PG_REWRITES = (
+    (re.compile(r"date\('now'\)", re.IGNORECASE), 'CURRENT_DATE'),
+)
+_STRING_OR_MARK = re.compile(r"'(?:[^']|'')*'|\?|%")
+
+
+@lru_cache(maxsize=512)
+def translate(sql, dialect):
+    """Rewrite SQL written in SQLite style for the target dialect."""
+    if dialect != 'postgres':
+        return sql
+
+    def swap(match):
+        token = match.group(0)
+        if token == '?':
+            return '%s'
+        # psycopg2 treats every % as a format marker, even inside literals
+        return token.replace('%', '%%')
+
+    sql = _STRING_OR_MARK.sub(swap, sql)
+    for pattern, replacement in _PG_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class Cursor:
+    """Cursor wrapper that accepts SQLite-style SQL on either backend."""
+
+    def __init__(self, raw, dialect):
+        self._raw = raw
+        self.dialect = dialect
+
+    def execute(self, sql, params=()):
+        self._raw.execute(translate(sql, self.dialect), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._raw.executemany(translate(sql, self.dialect), [tuple(p) for p in seq_of_params])
+        return self
+
+    def insert(self, sql, params=()):
+        """Run an INSERT and return the id of the new row."""
+        if self.dialect == 'postgres':
+            self.execute(sql.rstrip().rstrip(';') + ' RETURNING id', params)
+            return self._raw.fetchone()[0]
+        self.execute(sql, params)
+        return self._raw.lastrowid
+
+    def insert_many(self, sql, seq_of_params):
+        """Run a single-row INSERT for every parameter tuple; return the new ids in order."""
+        rows = [tuple(p) for p in seq_of_params]
+        if not rows:
+            return []
+        if self.dialect == 'postgres':
+            from psycopg2.extras import execute_values
+            # One multi-row INSERT ... RETURNING, whose ids come back in VALUES order
+            head, _, template = sql.rstrip().rstrip(';').rpartition('VALUES')
+            result = execute_values(self._raw, translate(head, self.dialect) + 'VALUES %s RETURNING id', rows,
+                                    template=translate(template.strip(), self.dialect),
+                                    page_size=len(rows), fetch=True)
+            return [row[0] for row in result]
+        # The write lock is held from the first row to commit, so the rows
+        # of one executemany get consecutive ids ending at last_insert_rowid()
+        self._raw.executemany(sql, rows)
+        last = self._raw.execute('SELECT last_insert_rowid()').fetchone()[0]
+        return list(range(last - len(rows) + 1, last + 1))
+
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    def fetchmany(self, size):
+        return self._raw.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    def close(self):
+        self._raw.close()
+
+
+class Connection:
+    """Gives SQLite and PostgreSQL connections the same interface.
+
+    Rows support both ``row['column']`` and ``row[index]`` access on
+    either backend (sqlite3.Row / psycopg2 DictRow).
+    """
+
+    def __init__(self, raw, dialect):
+        self.raw = raw
+        self.dialect = dialect
+
+    def cursor(self, name=None):
+        """Return a cursor; a name gives a PostgreSQL server-side cursor.
+
+        Server-side cursors keep large result sets in the database and hand
+        rows over as they are fetched, instead of loading them all at once.
+        SQLite cursors already step through results lazily.
+        """
+        if self.dialect == 'postgres':
+            from psycopg2.extras import DictCursor
+            return Cursor(self.raw.cursor(name=name, cursor_factory=DictCursor), self.dialect)
+        return Cursor(self.raw.cursor(), self.dialect)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def begin(self):
+        """Start a write transaction, taking the write lock immediately."""
+        if self.dialect == 'sqlite' and not self.raw.in_transaction:
+            self.raw.execute('BEGIN IMMEDIATE')
+
+    @property
+    def in_transaction(self):
+        if self.dialect == 'postgres':
+            from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+            return self.raw.get_transaction_status() != TRANSACTION_STATUS_IDLE
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+def _connect_sqlite():
+    conn = sqlite3.connect(SQLITE_PATH, timeout=20.0)
+    conn.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return Connection(conn, 'sqlite')
+
+
+def _postgres_kwargs():
+    # Local stand-ins usually run without TLS; set DATABASE_SSLMODE=disable
+    return {'sslmode': os.getenv('DATABASE_SSLMODE', 'require')}
+
+
+def _connect_postgres():
+    # Imported here too, in case DATABASE_URL was set after db was imported
+    import psycopg2
+    return Connection(psycopg2.connect(os.getenv('DATABASE_URL'), **_postgres_kwargs()), 'postgres')
+
+
+class ConnectionPool:
+    """Keeps one long-lived SQLite connection per thread, reopened after a fork."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            # Connections must never be shared across gunicorn workers
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._factory()
+        return conn
+
+    def release(self, conn):
+        # Leave the connection clean for the next request on this thread
+        if conn.in_transaction:
+            conn.rollback()
+
+
+class PostgresPool:
+    """Per-worker psycopg2 ThreadedConnectionPool, recreated after a fork."""
+
+    def __init__(self, maxconn=PG_POOL_SIZE):
+        self._maxconn = maxconn
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    from psycopg2.pool import ThreadedConnectionPool
+                    self._pool = ThreadedConnectionPool(
+                        1, self._maxconn, os.getenv('DATABASE_URL'), **_postgres_kwargs())
+                    self._pid = os.getpid()
+        return self._pool
+
+    def acquire(self):
+        return Connection(self._get().getconn(), 'postgres')
+
+    def release(self, conn):
+        pool = self._get()
+        if conn.raw.closed:
+            pool.putconn(conn.raw, close=True)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        pool.putconn(conn.raw)
+
+
+def connect():
+    """Open a dedicated connection; the caller is responsible for closing it."""
+    return _connect_postgres() if is_postgres() else _connect_sqlite()
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = PostgresPool() if is_postgres() else ConnectionPool(_connect_sqlite)
+    return _pool
+
+
+def get_db_connection():
+    """Return the connection checked out for the current request.
+
+    Inside a Flask app context the connection comes from the pool and is
+    handed back automatically at teardown, so routes must not close it.
+    Outside one (scripts, CLI) a dedicated connection is returned instead.
+    """
+    if not has_app_context():
+        return connect()
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def release_db_connection(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db_connection)
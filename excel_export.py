@@ -0,0 +1,125 @@
+"""Excel export of every ledger, one worksheet each.
+
+The workbook is built with openpyxl's write-only mode: rows are pulled
+from the database cursor in batches and written straight to the sheet's
+XML on disk, so exporting several years keeps memory flat. The finished
+file is written to a path the caller serves and deletes.
+"""
+from datetime import timedelta
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+from migrations import GRID_PERIOD, MONEY_COLUMNS
+from money import to_cedis
+from streaming import iter_rows
+
+# (sheet title, table, date column for the range filter, [(header, column)]);
+# grid rows are filtered on the month they record
+SHEETS = (
+    ('Income', 'income', 'date', (
+        ('ID', 'id'), ('Date', 'date'), ('Category', 'category'),
+        ('Description', 'description'), ('Amount', 'amount'),
+        ('Local Amount', 'local_amount'), ('District Amount', 'district_amount'),
+        ('Tithe', 'is_tithe'), ('Offering', 'is_offering'),
+    )),
+    ('Tithes', 'tithes', GRID_PERIOD, (
+        ('ID', 'id'), ('Member', 'member_name'), ('Member ID', 'member_id'),
+        ('Year', 'year'), ('Month', 'month'), ('Week 1', 'week1'), ('Week 2', 'week2'),
+        ('Week 3', 'week3'), ('Week 4', 'week4'), ('Week 5', 'week5'),
+        ('Total', 'total'), ('Recorded', 'created_at'),
+    )),
+    ('Offerings', 'offerings', GRID_PERIOD, (
+        ('ID', 'id'), ('Member', 'member_name'), ('Member ID', 'member_id'),
+        ('Year', 'year'), ('Month', 'month'), ('Week 1', 'week1'), ('Week 2', 'week2'),
+        ('Week 3', 'week3'), ('Week 4', 'week4'), ('Week 5', 'week5'),
+        ('Total', 'total'), ('Recorded', 'created_at'),
+    )),
+    ('Expenses', 'expenses', 'date', (
+        ('ID', 'id'), ('Date', 'date'), ('Category', 'category'),
+        ('Description', 'description'), ('Amount', 'amount'), ('Type', 'expense_type'),
+    )),
+    ('District', 'district_expenses', 'date', (
+        ('ID', 'id'), ('Date', 'date'), ('Source', 'source'),
+        ('Original Amount', 'original_amount'), ('District Amount', 'district_amount'),
+        ('Status', 'status'), ('Description', 'description'),
+    )),
+    ('Inventory', 'inventory', 'date_added', (
+        ('ID', 'id'), ('Date Added', 'date_added'), ('Item', 'item_name'),
+        ('Category', 'category'), ('Quantity', 'quantity'), ('Condition', 'condition'),
+    )),
+    ('Accounting Entries', 'accounting_entries', 'date', (
+        ('ID', 'id'), ('Date', 'date'), ('Period', 'period'), ('Account', 'account_name'),
+        ('Debit', 'debit_amount'), ('Credit', 'credit_amount'), ('Description', 'description'),
+        ('Reference Type', 'reference_type'), ('Reference ID', 'reference_id'),
+    )),
+)
+
+HEADER_FONT = Font(bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+HEADER_ALIGNMENT = Alignment(horizontal='center')
+COLUMN_WIDTH = 16
+
+
+def date_range_filter(column, start_date=None, end_date=None):
+    """Return (sql, params) limiting column to the inclusive date range.
+
+    The end bound is exclusive on the following day so timestamp columns
+    include the whole of end_date. For GRID_PERIOD, every month the range
+    touches is included.
+    """
+    clauses, params = ['1=1'], []
+    if column == GRID_PERIOD:
+        for bound, operator in ((start_date, '>='), (end_date, '<=')):
+            if bound:
+                clauses.append(f'year * 100 + month {operator} ?')
+                params.append(bound.year * 100 + bound.month)
+        return ' AND '.join(clauses), params
+    if start_date:
+        clauses.append(f'{column} >= ?')
+        params.append(start_date.isoformat())
+    if end_date:
+        clauses.append(f'{column} < ?')
+        params.append((end_date + timedelta(days=1)).isoformat())
+    return ' AND '.join(clauses), params
+
+
+def _header(sheet, headers):
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+def write_workbook(conn, path, start_date=None, end_date=None):
+    """Write every ledger to an .xlsx at path; return {sheet title: row count}."""
+    workbook = Workbook(write_only=True)
+    counts = {}
+    for title, table, date_column, columns in SHEETS:
+        sheet = workbook.create_sheet(title)
+        for index in range(1, len(columns) + 1):
+            sheet.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTH
+        sheet.freeze_panes = 'A2'
+        sheet.append(_header(sheet, [header for header, _ in columns]))
+
+        where, params = date_range_filter(date_column, start_date, end_date)
+        select = ', '.join(column for _, column in columns)
+        cursor = conn.cursor(name=f'export_{table}')
+        cursor.execute(f'SELECT {select} FROM {table} WHERE {where} ORDER BY {date_column}, id', params)
+        amounts = [column in MONEY_COLUMNS.get(table, ()) for _, column in columns]
+        count = 0
+        for row in iter_rows(cursor):
+            # Stored pesewas are written as cedis; empty weeks stay blank
+            sheet.append([to_cedis(value) if amount and value is not None else value
+                          for amount, value in zip(amounts, row)])
+            count += 1
+        cursor.close()
+        counts[title] = count
+    workbook.save(path)
+    return counts
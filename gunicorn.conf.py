@@ -0,0 +1,57 @@
+"""Production gunicorn settings: ``gunicorn -c gunicorn.conf.py app:app``.
+
+The master sets up the data directories and applies pending migrations
+when it reads this file, then preloads the app once and forks workers
+from it, so a worker starts with the app already imported. gunicorn
+preloads before its first hook, so this file is the only place the setup
+can come first. Each worker serves requests on a pool of threads, so one
+slow request (an import, a year close) no longer holds up everyone else.
+A worker is replaced after WEB_MAX_REQUESTS requests, or as soon as it
+finishes a request while using more than WEB_MAX_WORKER_MEMORY_MB.
+
+Settings from the environment:
+
+    PORT                       port to listen on (5000)
+    WEB_CONCURRENCY            worker processes (one per CPU)
+    WEB_THREADS                threads per worker (4)
+    WEB_TIMEOUT                seconds before a silent worker is restarted (60)
+    WEB_MAX_REQUESTS           requests before a worker is recycled (2000)
+    WEB_MAX_WORKER_MEMORY_MB   resident memory before a worker is recycled (512)
+"""
+import os
+
+import bootstrap
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 2000))
+# Spread recycling out so workers do not all restart at once
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+MAX_WORKER_MEMORY_MB = int(os.getenv('WEB_MAX_WORKER_MEMORY_MB', 512))
+
+bootstrap.run(verbose=False)
+
+
+def resident_mb():
+    """Current resident memory of this process in MB, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def post_request(worker, req, environ, resp):
+    memory = resident_mb()
+    if worker.alive and memory is not None and memory > MAX_WORKER_MEMORY_MB:
+        print(f'Worker {worker.pid} is using {memory:.0f} MB, over {MAX_WORKER_MEMORY_MB} MB; recycling it')
+        # Stops accepting requests, finishes the ones in flight and exits; the master starts a new one
+        worker.alive = False
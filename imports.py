@@ -0,0 +1,208 @@
+"""Bulk import of tithes and offerings from a spreadsheet.
+
+An upload is an .xlsx workbook (read with openpyxl's read-only mode, so
+rows stream from the file) or a CSV file. The first row naming a known
+column holds the headers; each following row is either one week's contribution
+(``Week`` and ``Amount`` columns) or a whole month (``Week 1`` .. ``Week 5``
+columns, as in the Excel export). Every row is validated first; the valid
+ones are then posted through posting.py in transactions of IMPORT_CHUNK
+contributions, and the invalid ones are reported by row number.
+
+Tithes need ``Member`` (or ``Member Name``) and ``Month``; ``Member ID``,
+``Year`` and ``Date`` are optional. Offerings need ``Month``.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+
+import posting
+from db import DatabaseError
+from money import to_pesewas
+
+IMPORT_CHUNK = 500
+# Errors listed in the response; the count covers all of them
+MAX_ERRORS = 200
+
+# Normalised header -> field
+HEADERS = {
+    'member': 'member_name',
+    'membername': 'member_name',
+    'name': 'member_name',
+    'memberid': 'member_id',
+    'year': 'year',
+    'month': 'month',
+    'week': 'week',
+    'amount': 'amount',
+    'date': 'date',
+    **{f'week{n}': f'week{n}' for n in range(1, 6)},
+}
+MONTHS = {date(2000, n, 1).strftime(fmt).lower(): n for n in range(1, 13) for fmt in ('%B', '%b')}
+
+
+def _header(value):
+    return ''.join(ch for ch in str(value or '').lower() if ch.isalnum())
+
+
+def _xlsx_rows(stream, sheet_name):
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError('Could not read the workbook; save it as .xlsx and try again')
+    try:
+        # Use the ledger's own sheet when importing an exported workbook
+        sheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _csv_rows(stream):
+    yield from csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+
+def read_rows(stream, filename, sheet_name):
+    """Yield (row number, {field: value}) for each data row of an uploaded file."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        rows = _xlsx_rows(stream, sheet_name)
+    elif filename.lower().endswith('.csv'):
+        rows = _csv_rows(stream)
+    else:
+        raise ValueError('Upload an .xlsx or .csv file')
+    fields = None
+    for number, row in enumerate(rows, start=1):
+        if not any(value not in (None, '') for value in row):
+            continue
+        if fields is None:
+            # Title rows above the table are skipped
+            headers = [HEADERS.get(_header(value)) for value in row]
+            fields = headers if any(headers) else None
+            continue
+        yield number, {field: value for field, value in zip(fields, row) if field}
+    if fields is None:
+        raise ValueError('No header row found; expected columns such as Member, Month, Week and Amount')
+
+
+def _whole(value, name):
+    try:
+        number = Decimal(str(value).strip())
+        if number != number.to_integral_value():
+            raise InvalidOperation
+        return int(number)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Invalid {name}: {value!r}')
+
+
+def _month(value):
+    if value in (None, ''):
+        raise ValueError('Month is required')
+    if isinstance(value, str) and value.strip().lower() in MONTHS:
+        return MONTHS[value.strip().lower()]
+    month = _whole(value, 'month')
+    if month < 1 or month > 12:
+        raise ValueError('Invalid month')
+    return month
+
+
+def _year(value):
+    # Left out, the year follows from the date (see posting.grid_year)
+    return None if value in (None, '') else _whole(value, 'year')
+
+
+def _day(value):
+    if value in (None, ''):
+        return date.today().isoformat()
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f'Invalid date: {value!r} (use YYYY-MM-DD)')
+
+
+def _weeks(fields):
+    """Return [(week, pesewas)] recorded on a row."""
+    if fields.get('week') not in (None, ''):
+        week = _whole(fields['week'], 'week')
+        if week < 1 or week > 5:
+            raise ValueError('Invalid week (must be 1-5)')
+        amount = to_pesewas(fields.get('amount'))
+        if amount <= 0:
+            raise ValueError('Amount must be greater than zero')
+        return [(week, amount)]
+    weeks = []
+    for week in range(1, 6):
+        value = fields.get(f'week{week}')
+        if value in (None, ''):
+            continue
+        amount = to_pesewas(value)
+        if amount < 0:
+            raise ValueError(f'Week {week} amount cannot be negative')
+        if amount:
+            weeks.append((week, amount))
+    if not weeks:
+        raise ValueError('No amount: give Week and Amount, or Week 1 to Week 5')
+    return weeks
+
+
+def parse_tithe(fields):
+    member_name = str(fields.get('member_name') or '').strip()
+    if not member_name:
+        raise ValueError('Member name is required')
+    member_id = str(fields.get('member_id') or '').strip()
+    month, day, year = _month(fields.get('month')), _day(fields.get('date')), _year(fields.get('year'))
+    return [(posting.tithe, (member_name, member_id, month, week, amount, day, year))
+            for week, amount in _weeks(fields)]
+
+
+def parse_offering(fields):
+    month, day, year = _month(fields.get('month')), _day(fields.get('date')), _year(fields.get('year'))
+    return [(posting.offering, (month, week, amount, day, year)) for week, amount in _weeks(fields)]
+
+
+# kind -> (row parser, sheet name in an exported workbook)
+KINDS = {
+    'tithes': (parse_tithe, 'Tithes'),
+    'offerings': (parse_offering, 'Offerings'),
+}
+
+
+def _post(conn, entries):
+    cursor = conn.cursor()
+    conn.begin()
+    try:
+        items = [record(cursor, *args) for record, args in entries]
+        posting.post(cursor, items)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def import_file(conn, kind, stream, filename):
+    """Validate and post an uploaded file; return counts of rows and contributions and the row errors."""
+    parse, sheet_name = KINDS[kind]
+    valid, errors, rows = [], [], 0
+    for number, fields in read_rows(stream, filename, sheet_name):
+        rows += 1
+        try:
+            valid.extend(parse(fields))
+        except ValueError as e:
+            errors.append({'row': number, 'message': str(e)})
+
+    summary = {'rows': rows, 'imported': 0, 'failed': len(errors), 'errors': errors[:MAX_ERRORS]}
+    for start in range(0, len(valid), IMPORT_CHUNK):
+        chunk = valid[start:start + IMPORT_CHUNK]
+        try:
+            _post(conn, chunk)
+        except DatabaseError as e:
+            # Earlier chunks stay committed; say how far the import got
+            summary['error'] = f'Database error after {summary["imported"]} contributions: {e}'
+            break
+        summary['imported'] += len(chunk)
+    return summary
@@ -0,0 +1,276 @@
+"""Background jobs for exports and heavy reports, with an on-disk result cache.
+
+A job's id is a hash of its report type, parameters and the current data
+version (bumped by triggers on every ledger write), so identical requests
+against unchanged data share one result file in ``exports/``. State lives
+in marker files next to the results rather than in memory, so any web
+worker can answer a status poll or serve the download:
+
+    <id>.json      job metadata, written when the job is queued
+    <id>.<ext>     the finished result
+    <id>.error     the failure message, if the job failed
+    <id>.progress  "done total" while a long job runs, if it reports progress
+
+Jobs run on a per-process executor (a process pool by default, threads
+with EXPORT_EXECUTOR=thread) so web workers stay free for data entry.
+Old results are evicted least-recently-used first once the directory
+exceeds EXPORT_CACHE_MAX_MB or EXPORT_CACHE_MAX_FILES.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+from functools import partial
+
+EXPORTS_DIR = os.getenv('EXPORTS_DIR', 'exports')
+EXECUTOR = os.getenv('EXPORT_EXECUTOR', 'process')
+MAX_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_MB', 500)) * 1024 * 1024
+CACHE_MAX_FILES = int(os.getenv('EXPORT_CACHE_MAX_FILES', 200))
+# A queued job with no result after this long is treated as lost
+STALE_AFTER = int(os.getenv('EXPORT_JOB_TIMEOUT', 3600))
+
+# Job type -> (file extension, download content type)
+RESULT_TYPES = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+    'statements': ('zip', 'application/zip'),
+}
+
+
+def _run_excel(conn, path, params, progress):
+    import excel_export
+    excel_export.write_workbook(conn, path, _day(params.get('start_date')), _day(params.get('end_date')))
+
+
+def _run_pdf(conn, path, params, progress):
+    import pdf_report
+    pdf_report.build_report(conn, path, _day(params['start_date']), _day(params['end_date']), params['label'])
+
+
+def _run_statements(conn, path, params, progress):
+    import statements
+    statements.build_statements(conn, path, _day(params['start_date']), _day(params['end_date']), params['label'],
+                                progress)
+
+
+RUNNERS = {
+    'excel': _run_excel,
+    'pdf': _run_pdf,
+    'statements': _run_statements,
+}
+
+
+def _day(value):
+    return date.fromisoformat(value) if value else None
+
+
+def data_version(cursor):
+    cursor.execute('SELECT version FROM data_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def job_id(job_type, params, version):
+    key = json.dumps([job_type, params, version], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _path(job, suffix):
+    return os.path.join(EXPORTS_DIR, f'{job}.{suffix}')
+
+
+def result_path(job, job_type):
+    return _path(job, RESULT_TYPES[job_type][0])
+
+
+def read_meta(job):
+    try:
+        with open(_path(job, 'json')) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _progress_writer(job):
+    def write(done, total):
+        # Replaced atomically so a poll never reads half a line
+        path = _path(job, 'progress')
+        with open(f'{path}.{os.getpid()}', 'w') as handle:
+            handle.write(f'{done} {total}')
+        os.replace(f'{path}.{os.getpid()}', path)
+    return write
+
+
+def read_progress(job):
+    try:
+        with open(_path(job, 'progress')) as handle:
+            done, total = handle.read().split()
+        return {'done': int(done), 'total': int(total)}
+    except (OSError, ValueError):
+        return None
+
+
+def run_job(job, job_type, params):
+    """Build one result file; runs inside the executor."""
+    from db import connect
+    final = result_path(job, job_type)
+    partial = f'{final}.{os.getpid()}.part'
+    conn = connect()
+    try:
+        RUNNERS[job_type](conn, partial, params, _progress_writer(job))
+        # Readers only ever see a complete file
+        os.replace(partial, final)
+    except Exception as e:
+        with open(_path(job, 'error'), 'w') as handle:
+            handle.write(str(e))
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        conn.close()
+        _clear(job, ('progress',))
+    evict()
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Return this process's executor, recreated after a fork."""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        # Loaded with the first job rather than by every web worker at startup
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                if EXECUTOR == 'thread':
+                    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='export')
+                else:
+                    # spawn, not fork: the web worker holds threads and open connections
+                    _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _discard_executor(broken):
+    """Drop a broken executor so the next job starts a new one."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is broken:
+            _executor, _executor_pid = None, None
+    broken.shutdown(wait=False)
+
+
+def _record_failure(job, pool, future):
+    # Covers failures run_job cannot record itself, e.g. a pool worker dying
+    from concurrent.futures import BrokenExecutor
+    error = future.exception()
+    if error is None:
+        return
+    print(f'Export job {job} failed: {error}')
+    if isinstance(error, BrokenExecutor):
+        _discard_executor(pool)
+    if not os.path.exists(_path(job, 'error')):
+        with open(_path(job, 'error'), 'w') as handle:
+            handle.write(str(error))
+
+
+def _clear(job, suffixes=('json', 'error', 'progress')):
+    for suffix in suffixes:
+        try:
+            os.remove(_path(job, suffix))
+        except FileNotFoundError:
+            pass
+
+
+def submit(cursor, job_type, params, filename):
+    """Queue a job unless its result is cached or already queued; return its status."""
+    os.makedirs(EXPORTS_DIR, exist_ok=True)
+    job = job_id(job_type, params, data_version(cursor))
+    current = status(job)
+    if current is not None:
+        if current['status'] == 'done':
+            touch(result_path(job, job_type))
+        if current['status'] != 'failed':
+            return current
+        _clear(job)
+
+    meta = {'id': job, 'type': job_type, 'params': params, 'filename': filename, 'queued_at': time.time()}
+    try:
+        # O_EXCL so only one worker queues a given job
+        fd = os.open(_path(job, 'json'), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        return status(job)
+    with os.fdopen(fd, 'w') as handle:
+        json.dump(meta, handle)
+    pool = executor()
+    try:
+        future = pool.submit(run_job, job, job_type, params)
+    except Exception:
+        # e.g. BrokenProcessPool once a pool worker has died; without this the
+        # marker would report the job as running until it went stale
+        _clear(job)
+        _discard_executor(pool)
+        raise
+    future.add_done_callback(partial(_record_failure, job, pool))
+    return status(job)
+
+
+def status(job):
+    """Return the job's status dict, or None for an unknown id."""
+    meta = read_meta(job)
+    if meta is None:
+        return None
+    result = {'job_id': job, 'type': meta['type'], 'filename': meta['filename']}
+    if os.path.exists(result_path(job, meta['type'])):
+        result['status'] = 'done'
+    elif os.path.exists(_path(job, 'error')):
+        with open(_path(job, 'error')) as handle:
+            result.update(status='failed', message=handle.read())
+    elif time.time() - meta['queued_at'] > STALE_AFTER:
+        result.update(status='failed', message='Job did not finish; submit it again')
+    else:
+        result['status'] = 'running'
+        progress = read_progress(job)
+        if progress:
+            result['progress'] = progress
+    return result
+
+
+def touch(path):
+    """Mark a result as recently used for LRU eviction."""
+    os.utime(path)
+
+
+def evict():
+    """Delete least recently used results until the cache is within its limits."""
+    extensions = {extension for extension, _ in RESULT_TYPES.values()}
+    results = []
+    for name in os.listdir(EXPORTS_DIR):
+        job, _, ext = name.partition('.')
+        path = os.path.join(EXPORTS_DIR, name)
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if ext in extensions:
+            results.append((info.st_mtime, info.st_size, job, path))
+        elif ext == 'error' and time.time() - info.st_mtime > STALE_AFTER:
+            _clear(job)
+    results.sort()
+    total = sum(size for _, size, _, _ in results)
+    while results and (total > CACHE_MAX_BYTES or len(results) > CACHE_MAX_FILES):
+        _, size, job, path = results.pop(0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        _clear(job)
+        total -= size
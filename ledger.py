@@ -0,0 +1,235 @@
+"""Profit & loss and trial balance from per-period account balances.
+
+Triggers on ``accounting_entries`` keep ``account_balances`` holding each
+account's debit and credit totals for every ``YYYY-MM`` period, so a
+year-to-date report sums at most twelve rows per account instead of
+reading every posting. ``python ledger.py rebuild`` recomputes the table
+from the entries and ``python ledger.py verify`` checks it. Amounts are
+summed as integer pesewas and converted to cedis for the reports.
+"""
+import sys
+from datetime import date, timedelta
+from db import connect
+from money import to_cedis
+
+REVENUE = 'revenue'
+EXPENSE = 'expense'
+ASSET = 'asset'
+
+# Credited when an expense is paid
+CASH_ACCOUNT = 'Cash'
+
+def income_account(category):
+    """Return the revenue account that income of a category is credited to."""
+    category = (category or '').strip() or 'Other'
+    return category if category.endswith('Income') else f'{category} Income'
+
+
+def account_type(account_name):
+    """Classify an account by the naming used when entries are posted."""
+    # "Local <type> Income" is debited with the share the assembly keeps
+    if account_name.startswith('Local '):
+        return ASSET
+    if account_name.endswith('Income'):
+        return REVENUE
+    if account_name.endswith(('Expense', 'Expenses')):
+        return EXPENSE
+    return ASSET
+
+
+def period_bounds(period=None, today=None):
+    """Return (start, end, label) for a period string.
+
+    ``YYYY`` is the April-March financial year starting that year and
+    ``YYYY-MM`` a calendar month; no period means the current financial year.
+    """
+    today = today or date.today()
+    if not period:
+        period = str(today.year if today.month >= 4 else today.year - 1)
+    try:
+        if len(period) == 4:
+            year = int(period)
+            return date(year, 4, 1), date(year + 1, 3, 31), f'Financial Year {year}/{year + 1}'
+        start = date.fromisoformat(f'{period}-01')
+    except ValueError:
+        raise ValueError('period must be YYYY (financial year) or YYYY-MM')
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end, start.strftime('%B %Y')
+
+
+def period_range(period=None, today=None):
+    """Return (first, last, label) YYYY-MM periods for a period string, as period_bounds."""
+    start, end, label = period_bounds(period, today)
+    return start.strftime('%Y-%m'), end.strftime('%Y-%m'), label
+
+
+def balances(cursor, first=None, last=None):
+    """Return [(account, debit, credit)] in pesewas summed over the periods first..last."""
+    clauses, params = ['1=1'], []
+    if first:
+        clauses.append('period >= ?')
+        params.append(first)
+    if last:
+        clauses.append('period <= ?')
+        params.append(last)
+    cursor.execute(f'''
+        SELECT account_name, SUM(debit_total), SUM(credit_total) FROM account_balances
+        WHERE {' AND '.join(clauses)}
+        GROUP BY account_name ORDER BY account_name
+    ''', params)
+    return [(row[0], int(row[1] or 0), int(row[2] or 0)) for row in cursor.fetchall() if row[1] or row[2]]
+
+
+def _amount(kind, debit, credit):
+    return credit - debit if kind == REVENUE else debit - credit
+
+
+def profit_and_loss(cursor, first, last):
+    """Return revenue and expense accounts with totals for first..last, plus monthly net."""
+    report = {'revenue': [], 'expenses': []}
+    totals = {REVENUE: 0, EXPENSE: 0}
+    for account, debit, credit in balances(cursor, first, last):
+        kind = account_type(account)
+        if kind == ASSET:
+            continue
+        amount = _amount(kind, debit, credit)
+        totals[kind] += amount
+        section = report['revenue'] if kind == REVENUE else report['expenses']
+        section.append({'account': account, 'amount': to_cedis(amount)})
+    report['total_revenue'] = to_cedis(totals[REVENUE])
+    report['total_expenses'] = to_cedis(totals[EXPENSE])
+    report['net'] = to_cedis(totals[REVENUE] - totals[EXPENSE])
+
+    cursor.execute('''
+        SELECT period, account_name, debit_total, credit_total FROM account_balances
+        WHERE period >= ? AND period <= ? ORDER BY period
+    ''', (first, last))
+    months = {}
+    for row in cursor.fetchall():
+        kind = account_type(row['account_name'])
+        if kind == ASSET:
+            continue
+        month = months.setdefault(row['period'], {'period': row['period'], 'revenue': 0, 'expenses': 0})
+        month['revenue' if kind == REVENUE else 'expenses'] += _amount(kind, int(row['debit_total'] or 0),
+                                                                       int(row['credit_total'] or 0))
+    report['periods'] = [
+        {'period': m['period'], 'revenue': to_cedis(m['revenue']), 'expenses': to_cedis(m['expenses']),
+         'net': to_cedis(m['revenue'] - m['expenses'])}
+        for m in months.values()
+    ]
+    return report
+
+
+def brought_forward(cursor, last=None):
+    """Return {account: (debit, credit)} in pesewas of the closed years ending by period last."""
+    where, params = '1=1', []
+    if last:
+        year, month = int(last[:4]), int(last[5:7])
+        # Fiscal year y ends with period (y + 1)-03
+        where, params = 'fiscal_year <= ?', [year - 1 if month >= 3 else year - 2]
+    cursor.execute(f'''
+        SELECT account_name, SUM(debit_total), SUM(credit_total) FROM closing_balances
+        WHERE {where} GROUP BY account_name
+    ''', params)
+    return {row[0]: (int(row[1] or 0), int(row[2] or 0)) for row in cursor.fetchall()}
+
+
+def trial_balance(cursor, last=None):
+    """Return every account's debits, credits and balance up to and including period last.
+
+    Closing a year moves its entries into the archive, so the balances
+    recorded at each close are brought forward ahead of the live periods.
+    """
+    opening = brought_forward(cursor, last)
+    totals = {account: list(amounts) for account, amounts in opening.items()}
+    for account, debit, credit in balances(cursor, None, last):
+        total = totals.setdefault(account, [0, 0])
+        total[0] += debit
+        total[1] += credit
+
+    accounts = []
+    total_debit = total_credit = 0
+    for account in sorted(totals):
+        debit, credit = totals[account]
+        if not debit and not credit:
+            continue
+        opening_debit, opening_credit = opening.get(account, (0, 0))
+        total_debit += debit
+        total_credit += credit
+        accounts.append({
+            'account': account,
+            'type': account_type(account),
+            'brought_forward': to_cedis(opening_debit - opening_credit),
+            'debit': to_cedis(debit),
+            'credit': to_cedis(credit),
+            'balance': to_cedis(debit - credit),
+        })
+    return {
+        'accounts': accounts,
+        'total_debit': to_cedis(total_debit),
+        'total_credit': to_cedis(total_credit),
+        'balanced': total_debit == total_credit,
+    }
+
+
+def compute(cursor):
+    """Recompute {(period, account): (debit, credit)} from the accounting entries."""
+    cursor.execute('''
+        SELECT COALESCE(period, SUBSTR(date, 1, 7)) AS period, account_name,
+               COALESCE(SUM(debit_amount), 0), COALESCE(SUM(credit_amount), 0)
+        FROM accounting_entries GROUP BY COALESCE(period, SUBSTR(date, 1, 7)), account_name
+    ''')
+    return {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+
+
+def stored(cursor):
+    cursor.execute('SELECT period, account_name, debit_total, credit_total FROM account_balances')
+    return {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+
+
+def mismatches(cursor):
+    """Return [(key, stored, expected)] for balances that disagree with the entries."""
+    expected, actual = compute(cursor), stored(cursor)
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        have, want = actual.get(key, (0, 0)), expected.get(key, (0, 0))
+        if any((a or 0) != (b or 0) for a, b in zip(have, want)):
+            problems.append((key, actual.get(key), expected.get(key)))
+    return problems
+
+
+def rebuild(cursor):
+    """Replace account_balances with totals recomputed from the accounting entries."""
+    cursor.execute('DELETE FROM account_balances')
+    cursor.executemany('''
+        INSERT INTO account_balances (period, account_name, debit_total, credit_total)
+        VALUES (?, ?, ?, ?)
+    ''', [key + totals for key, totals in compute(cursor).items()])
+
+
+def main(command):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        if command == 'rebuild':
+            conn.begin()
+            rebuild(cursor)
+            conn.commit()
+            print('Rebuilt account balances.')
+        problems = mismatches(cursor)
+        for key, actual, expected in problems:
+            print(f'Mismatch {key}: stored {actual}, expected {expected}')
+        if problems:
+            return 1
+        print('Account balances match the accounting entries.')
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    if command not in ('rebuild', 'verify'):
+        print('Usage: python ledger.py [rebuild|verify]')
+        sys.exit(2)
+    sys.exit(main(command))
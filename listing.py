@@ -0,0 +1,161 @@
+"""Keyset pagination and filtering shared by the list endpoints.
+
+Pages are ordered by ``<sort columns> DESC, id DESC``. The opaque
+``cursor`` returned with a page encodes the last row's sort values and id,
+so the next page is an index range seek no matter how deep the client
+pages.
+"""
+import base64
+import json
+
+from money import to_cedis
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_values, row_id):
+    raw = json.dumps(list(sort_values) + [row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, width=1):
+    """Return (sort values, id) from a cursor for a listing sorted on width columns."""
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != width + 1:
+            raise ValueError
+        return values[:-1], int(values[-1])
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _flag(value):
+    return 1 if str(value).lower() in ('1', 'true', 'yes') else 0
+
+
+def equals(column, convert=str):
+    return lambda value: (f'{column} = ?', [convert(value)])
+
+
+def at_least(column):
+    return lambda value: (f'{column} >= ?', [value])
+
+
+def at_most(column):
+    return lambda value: (f'{column} <= ?', [value])
+
+
+def flag(column):
+    return lambda value: (f'{column} = ?', [_flag(value)])
+
+
+def income_type(value):
+    value = value.lower()
+    if value == 'tithe':
+        return 'is_tithe = 1', []
+    if value == 'offering':
+        return 'is_offering = 1', []
+    return 'is_tithe = 0 AND is_offering = 0', []
+
+
+def member(value):
+    return '(member_id = ? OR member_name = ?)', [value, value]
+
+
+class Listing:
+    """Describes one list endpoint: its table, sort column(s) and filters.
+
+    ``sort_column`` is a column name or a tuple of them, most significant
+    first; rows with equal sort values are ordered by id.
+    ``filters`` maps a query-string parameter to a function returning a
+    SQL condition and its parameters. ``aggregates`` maps a totals key to
+    a SQL aggregate expression evaluated over every matching row; with
+    ``money`` they sum pesewa amounts and are returned in cedis.
+    """
+
+    def __init__(self, table, sort_column, filters, aggregates=None, columns='*', money=False):
+        self.table = table
+        self.sort_columns = (sort_column,) if isinstance(sort_column, str) else tuple(sort_column)
+        self.filters = filters
+        self.aggregates = aggregates or {}
+        self.columns = columns
+        self.money = money
+
+    def where(self, args, defaults=None):
+        """Build the WHERE clause for the recognised filters present in args."""
+        values = dict(defaults or {})
+        values.update({key: value for key, value in args.items() if key in self.filters and value != ''})
+        clauses, params = ['1=1'], []
+        for key, value in values.items():
+            if value is None:
+                continue
+            clause, clause_params = self.filters[key](value)
+            clauses.append(clause)
+            params.extend(clause_params)
+        return ' AND '.join(clauses), params
+
+    def order_by(self):
+        return f'ORDER BY {", ".join(f"{column} DESC" for column in self.sort_columns)}, id DESC'
+
+    def _before(self, sort_values, row_id):
+        """Return (condition, params) for rows after the cursor row in page order."""
+        # Expanded row-value comparison so the sort index bounds the seek
+        keys = self.sort_columns[1:] + ('id',)
+        values = list(sort_values[1:]) + [row_id]
+        rest, params = f'{keys[-1]} < ?', [values[-1]]
+        for key, value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+            rest, params = f'({key} < ? OR ({key} = ? AND {rest}))', [value, value] + params
+        first = self.sort_columns[0]
+        return f'{first} <= ? AND ({first} < ? OR {rest})', [sort_values[0], sort_values[0]] + params
+
+    def select(self, where, params, after=None):
+        """Return (sql, params) selecting matching rows in page order."""
+        sql = f'SELECT {self.columns} FROM {self.table} WHERE {where}'
+        params = list(params)
+        if after is not None:
+            condition, condition_params = self._before(*after)
+            sql += f' AND {condition}'
+            params.extend(condition_params)
+        return sql + ' ' + self.order_by(), params
+
+    def fetch(self, cursor, where, params, limit=None, after=None):
+        """Return (rows, next_cursor); next_cursor is None on the last page."""
+        sql, params = self.select(where, params, after)
+        if limit is None:
+            cursor.execute(sql, params)
+            return cursor.fetchall(), None
+        cursor.execute(sql + ' LIMIT ?', params + [limit + 1])
+        rows = cursor.fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor([last[column] for column in self.sort_columns], last['id'])
+
+    def totals(self, cursor, where, params):
+        """Return (row count, {key: total}) over every row matching where."""
+        expressions = ['COUNT(*)'] + [f'COALESCE({expr}, 0)' for expr in self.aggregates.values()]
+        cursor.execute(f'SELECT {", ".join(expressions)} FROM {self.table} WHERE {where}', params)
+        row = cursor.fetchone()
+        convert = to_cedis if self.money else (lambda value: value)
+        return row[0], {key: convert(row[i + 1]) for i, key in enumerate(self.aggregates)}
+
+
+def page_args(args, listing):
+    """Return (paginated, limit, after) for a listing from the request's query string.
+
+    Pagination is opt-in: without ``limit`` or ``cursor`` the endpoint keeps
+    returning its full legacy response.
+    """
+    if 'limit' not in args and 'cursor' not in args:
+        return False, None, None
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    token = args.get('cursor')
+    return True, limit, decode_cursor(token, len(listing.sort_columns)) if token else None
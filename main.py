@@ -1,21 +1,15 @@
-from app import app
-import os
 import sys
-
-def ensure_directories():
-    """Ensure all required directories exist."""
-    os.makedirs('data', exist_ok=True)
-    os.makedirs('reports', exist_ok=True)
-    os.makedirs('exports', exist_ok=True)
+import bootstrap
 
 if __name__ == '__main__':
+    # Directories and the schema are set up before the app is imported
+    bootstrap.run()
+    from app import app
+
     # Set up paths
     if getattr(sys, 'frozen', False):
         # Running as compiled executable
         app.static_folder = sys._MEIPASS
     
-    # Ensure directories exist
-    ensure_directories()
-    
     # Run the Flask app
     app.run(debug=False, host='0.0.0.0', port=5000)
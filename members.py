@@ -0,0 +1,110 @@
+"""Member registry: one row per member, referenced by integer key.
+
+Tithes and the income posted from them carry ``member_ref``. A member is
+identified by their church member number (``code``) when one was given,
+otherwise by their name; ``name_key`` is the name folded to lower case
+with single spaces, which both deduplicates names and backs the prefix
+search behind ``/api/members/search``.
+"""
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+
+def name_key(name):
+    return ' '.join(str(name or '').casefold().split())
+
+
+def get(cursor, member_ref):
+    cursor.execute('SELECT id, name, code FROM members WHERE id = ?', (member_ref,))
+    return cursor.fetchone()
+
+
+def resolve(cursor, name, code=None):
+    """Return the id of the member with this code, or of this name if there is no code, adding them if new.
+
+    A name first recorded without a number and later given one stays one
+    member: the number is added to the existing row.
+    """
+    name = ' '.join(str(name or '').split())
+    code = (code or '').strip() or None
+    if code:
+        cursor.execute('SELECT id FROM members WHERE code = ?', (code,))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        # A member first recorded by name alone takes the number rather than becoming two members
+        cursor.execute('''
+            UPDATE members SET code = ? WHERE name_key = ? AND code IS NULL RETURNING id
+        ''', (code, name_key(name)))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        # The no-op update makes RETURNING hand back an existing member's id
+        cursor.execute('''
+            INSERT INTO members (name, name_key, code) VALUES (?, ?, ?)
+            ON CONFLICT (code) DO UPDATE SET code = excluded.code
+            RETURNING id
+        ''', (name, name_key(name), code))
+    else:
+        cursor.execute('SELECT id, code FROM members WHERE name_key = ?', (name_key(name),))
+        matches = cursor.fetchall()
+        if len(matches) == 1 and matches[0][1] is not None:
+            # The name alone still means the one member who has since been given a number
+            return matches[0][0]
+        cursor.execute('''
+            INSERT INTO members (name, name_key) VALUES (?, ?)
+            ON CONFLICT (name_key) WHERE code IS NULL DO UPDATE SET name_key = excluded.name_key
+            RETURNING id
+        ''', (name, name_key(name)))
+    return cursor.fetchone()[0]
+
+
+def _prefix(column, dialect):
+    if dialect == 'postgres':
+        # Served by a text_pattern_ops index whatever the database collation
+        return f"{column} LIKE ? ESCAPE '\\'"
+    return f'{column} >= ? AND {column} < ?'
+
+
+def _prefix_params(prefix, dialect):
+    if dialect == 'postgres':
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return [escaped + '%']
+    # Every string starting with prefix sorts before prefix with its last character bumped
+    return [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+
+
+def search(cursor, query, limit=SEARCH_LIMIT):
+    """Members whose name or member number starts with query, by name."""
+    key, code = name_key(query), str(query or '').strip()
+    if not key:
+        return []
+    cursor.execute(f'''
+        SELECT id, name, code FROM members
+        WHERE ({_prefix('name_key', cursor.dialect)}) OR ({_prefix('code', cursor.dialect)})
+        ORDER BY name_key, id LIMIT ?
+    ''', _prefix_params(key, cursor.dialect) + _prefix_params(code, cursor.dialect) + [limit])
+    return [{'id': row['id'], 'name': row['name'], 'code': row['code']} for row in cursor.fetchall()]
+
+
+def row_code(member_name, member_id):
+    """Return the member number a tithe row was recorded with, or None."""
+    # Rows recorded without a member number used the name as member_id
+    return member_id if member_id and member_id != member_name else None
+
+
+def link_tithes(cursor):
+    """Point tithe rows without a member_ref, and their income, at the registry."""
+    cursor.execute('SELECT id, member_name, member_id FROM tithes WHERE member_ref IS NULL ORDER BY id DESC')
+    refs, links = {}, []
+    for row in cursor.fetchall():
+        code = row_code(row['member_name'], row['member_id'])
+        identity = (code, None) if code else (None, name_key(row['member_name']))
+        if identity not in refs:
+            refs[identity] = resolve(cursor, row['member_name'], code)
+        links.append((refs[identity], row['id']))
+    cursor.executemany('UPDATE tithes SET member_ref = ? WHERE id = ?', links)
+    cursor.execute('''
+        UPDATE income SET member_ref = (SELECT member_ref FROM tithes WHERE tithes.id = income.tithe_id)
+        WHERE tithe_id IS NOT NULL AND member_ref IS NULL
+    ''')
@@ -0,0 +1,994 @@
+"""Versioned schema migrations for SQLite and PostgreSQL.
+
+Run ``python migrations.py`` once before the web workers start (the
+Procfile release phase does this). Workers themselves only compare the
+recorded ``schema_version`` with the latest migration.
+"""
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime
+from db import DatabaseError, connect
+import members
+import posting
+import rollups
+import search
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration; versions must be applied in ascending order."""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _pk(dialect):
+    return 'SERIAL PRIMARY KEY' if dialect == 'postgres' else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+
+
+def table_columns(cursor, table):
+    """Return the column names of a table (empty if it does not exist)."""
+    if cursor.dialect == 'postgres':
+        cursor.execute('''
+            SELECT column_name FROM information_schema.columns WHERE table_name = ?
+        ''', (table,))
+        return {row[0] for row in cursor.fetchall()}
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_missing_columns(cursor, table, columns):
+    existing = table_columns(cursor, table)
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+TABLES = {
+    'income': '''
+        CREATE TABLE IF NOT EXISTS income (
+            id {pk},
+            category TEXT NOT NULL,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            is_tithe INTEGER DEFAULT 0,
+            is_offering INTEGER DEFAULT 0,
+            district_amount REAL DEFAULT 0,
+            local_amount REAL DEFAULT 0,
+            member_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'tithes': '''
+        CREATE TABLE IF NOT EXISTS tithes (
+            id {pk},
+            member_name TEXT NOT NULL,
+            member_id TEXT,
+            member_phone TEXT,
+            month INTEGER NOT NULL,
+            week1 REAL,
+            week2 REAL,
+            week3 REAL,
+            week4 REAL,
+            week5 REAL,
+            offeringWeek1 REAL,
+            offeringWeek2 REAL,
+            offeringWeek3 REAL,
+            offeringWeek4 REAL,
+            offeringWeek5 REAL,
+            total REAL DEFAULT 0,
+            date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'offerings': '''
+        CREATE TABLE IF NOT EXISTS offerings (
+            id {pk},
+            member_name TEXT NOT NULL,
+            member_id TEXT,
+            month INTEGER NOT NULL,
+            week1 REAL,
+            week2 REAL,
+            week3 REAL,
+            week4 REAL,
+            week5 REAL,
+            total REAL DEFAULT 0,
+            date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'expenses': '''
+        CREATE TABLE IF NOT EXISTS expenses (
+            id {pk},
+            category TEXT NOT NULL,
+            description TEXT,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            expense_type TEXT DEFAULT 'other',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'district_expenses': '''
+        CREATE TABLE IF NOT EXISTS district_expenses (
+            id {pk},
+            source TEXT NOT NULL,
+            original_amount REAL DEFAULT 0,
+            district_amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            status TEXT DEFAULT 'Pending',
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'inventory': '''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id {pk},
+            item_name TEXT NOT NULL,
+            category TEXT,
+            quantity INTEGER DEFAULT 0,
+            condition TEXT,
+            date_added TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    'accounting_entries': '''
+        CREATE TABLE IF NOT EXISTS accounting_entries (
+            id {pk},
+            account_name TEXT NOT NULL,
+            debit_amount REAL DEFAULT 0,
+            credit_amount REAL DEFAULT 0,
+            description TEXT,
+            date TEXT NOT NULL,
+            period TEXT,
+            reference_id INTEGER,
+            reference_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+}
+
+
+@migration(1, 'Create ledger tables')
+def create_tables(cursor):
+    for ddl in TABLES.values():
+        cursor.execute(ddl.format(pk=_pk(cursor.dialect)))
+
+
+@migration(2, 'Add columns missing from databases created by older releases')
+def add_legacy_columns(cursor):
+    _add_missing_columns(cursor, 'income', [
+        ('is_tithe', 'INTEGER DEFAULT 0'),
+        ('is_offering', 'INTEGER DEFAULT 0'),
+        ('district_amount', 'REAL DEFAULT 0'),
+        ('local_amount', 'REAL DEFAULT 0'),
+        ('member_id', 'INTEGER'),
+        ('updated_at', 'TIMESTAMP'),
+    ])
+    _add_missing_columns(cursor, 'tithes', [
+        ('member_id', 'TEXT'),
+        ('member_phone', 'TEXT'),
+        ('date', 'TEXT'),
+        ('updated_at', 'TIMESTAMP'),
+    ])
+    _add_missing_columns(cursor, 'district_expenses', [
+        ('description', 'TEXT'),
+        ('created_at', 'TIMESTAMP'),
+    ])
+    _add_missing_columns(cursor, 'accounting_entries', [
+        ('credit_amount', 'REAL DEFAULT 0'),
+        ('period', 'TEXT'),
+    ])
+
+    # Older rows were written before the split columns existed
+    cursor.execute('''
+        UPDATE income
+        SET district_amount = ROUND(CAST(amount * 0.77 AS NUMERIC), 2),
+            local_amount = amount - ROUND(CAST(amount * 0.77 AS NUMERIC), 2)
+        WHERE (is_tithe = 1 OR is_offering = 1)
+        AND (district_amount IS NULL OR district_amount = 0)
+    ''')
+    cursor.execute('''
+        UPDATE income SET local_amount = amount
+        WHERE is_tithe = 0 AND is_offering = 0
+        AND (local_amount IS NULL OR local_amount = 0)
+    ''')
+    cursor.execute('''
+        UPDATE accounting_entries SET period = SUBSTR(date, 1, 7)
+        WHERE period IS NULL AND date IS NOT NULL
+    ''')
+
+
+# Indexes backing the filters and sort orders used by the routes in app.py.
+# check_query_plans.py fails if one of those queries falls back to a scan.
+INDEXES = (
+    ('idx_income_date', 'income (date)'),
+    ('idx_income_kind_date', 'income (is_tithe, is_offering, date)'),
+    ('idx_tithes_member_month', 'tithes (member_id, month)'),
+    ('idx_tithes_month_member', 'tithes (month, member_name)'),
+    ('idx_tithes_member_name', 'tithes (member_name)'),
+    ('idx_offerings_month_member', 'offerings (month, member_name)'),
+    ('idx_expenses_date', 'expenses (date)'),
+    ('idx_expenses_type_date', 'expenses (expense_type, date)'),
+    ('idx_district_expenses_date_status', 'district_expenses (date, status)'),
+    ('idx_inventory_date_added', 'inventory (date_added)'),
+    ('idx_accounting_entries_reference', 'accounting_entries (reference_id, reference_type)'),
+)
+
+
+@migration(3, 'Add indexes for hot route queries')
+def add_indexes(cursor):
+    for name, target in INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+
+_TITHE_DESCRIPTION = re.compile(r'^Tithe from (.+) - (\w+) Week \d$')
+_WEEK_SUFFIX = re.compile(r'Week (\d)$')
+
+
+def _link_tithe_income(cursor):
+    """Point tithe income rows at the tithes grid row they were posted to."""
+    cursor.execute('SELECT id, member_name, month FROM tithes ORDER BY id')
+    grid = {(row['member_name'], row['month']): row['id'] for row in cursor.fetchall()}
+    cursor.execute('SELECT id, description FROM income WHERE is_tithe = 1 AND tithe_id IS NULL')
+    links = []
+    for row in cursor.fetchall():
+        match = _TITHE_DESCRIPTION.match(row['description'] or '')
+        if not match:
+            continue
+        try:
+            month = datetime.strptime(match.group(2), '%B').month
+        except ValueError:
+            continue
+        tithe_id = grid.get((match.group(1), month))
+        if tithe_id:
+            links.append((tithe_id, row['id']))
+    cursor.executemany('UPDATE income SET tithe_id = ? WHERE id = ?', links)
+
+
+def _link_offering_income(cursor):
+    """Point offering income rows at the General Offering row for their month."""
+    cursor.execute("SELECT id, month FROM offerings WHERE member_name = 'General Offering' ORDER BY id")
+    grid = {row['month']: row['id'] for row in cursor.fetchall()}
+    cursor.execute('SELECT id, date FROM income WHERE is_offering = 1 AND offering_id IS NULL')
+    links = []
+    for row in cursor.fetchall():
+        offering_id = grid.get(int(row['date'][5:7])) if row['date'] else None
+        if offering_id:
+            links.append((offering_id, row['id']))
+    cursor.executemany('UPDATE income SET offering_id = ? WHERE id = ?', links)
+
+
+def _pair_by_key(cursor, table, children, parents, key):
+    """Set income_id on derived rows by matching a shared key, oldest first.
+
+    Both sides were written in the same transaction, so pairing rows with
+    the same key in id order reproduces the original link.
+    """
+    queues = {}
+    for row in parents:
+        queues.setdefault(key(row), []).append(row['id'])
+    links = []
+    for row in children:
+        queue = queues.get(key(row))
+        if queue:
+            links.append((queue.pop(0), row['id']))
+    cursor.executemany(f'UPDATE {table} SET income_id = ? WHERE id = ?', links)
+
+
+def _week_of(row):
+    match = _WEEK_SUFFIX.search(row['description'] or '')
+    return row['date'], match and match.group(1)
+
+
+@migration(4, 'Link derived ledger rows to their originating income by key')
+def add_income_links(cursor):
+    _add_missing_columns(cursor, 'income', [
+        ('tithe_id', 'INTEGER REFERENCES tithes(id)'),
+        ('offering_id', 'INTEGER REFERENCES offerings(id)'),
+    ])
+    _add_missing_columns(cursor, 'district_expenses', [('income_id', 'INTEGER REFERENCES income(id)')])
+    _add_missing_columns(cursor, 'expenses', [('income_id', 'INTEGER REFERENCES income(id)')])
+    for name, target in (
+        ('idx_income_tithe', 'income (tithe_id)'),
+        ('idx_income_offering', 'income (offering_id)'),
+        ('idx_district_expenses_income', 'district_expenses (income_id)'),
+        ('idx_expenses_income', 'expenses (income_id)'),
+    ):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+    # One-time backfill of rows written before the keys existed
+    _link_tithe_income(cursor)
+    _link_offering_income(cursor)
+    cursor.execute('''
+        SELECT id, date, ROUND(CAST(amount AS NUMERIC), 2) AS amount, description FROM income
+        WHERE is_tithe = 1 OR is_offering = 1 ORDER BY id
+    ''')
+    contributions = cursor.fetchall()
+    cursor.execute('''
+        SELECT id, date, ROUND(CAST(original_amount AS NUMERIC), 2) AS amount FROM district_expenses
+        WHERE income_id IS NULL ORDER BY id
+    ''')
+    _pair_by_key(cursor, 'district_expenses', cursor.fetchall(), contributions,
+                 lambda row: (row['date'], row['amount']))
+    cursor.execute('''
+        SELECT id, date, description FROM expenses
+        WHERE income_id IS NULL AND category = 'District Offering Contribution' ORDER BY id
+    ''')
+    _pair_by_key(cursor, 'expenses', cursor.fetchall(),
+                 [row for row in contributions if (row['description'] or '').startswith('Offering - ')],
+                 _week_of)
+
+
+@migration(5, 'Add period_totals rollups for the dashboard')
+def add_period_totals(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS period_totals (
+            period_type TEXT NOT NULL,
+            period_key TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_type, period_key, metric)
+        )
+    ''')
+    rollups.rebuild(cursor)
+
+
+# Keyset pages walk (sort column, id) in descending order; the rest back
+# the new list filters so filtered pages and totals avoid table scans
+PAGE_INDEXES = (
+    ('idx_tithes_month_id', 'tithes (month, id)'),
+    ('idx_offerings_month_id', 'offerings (month, id)'),
+    ('idx_district_expenses_date_id', 'district_expenses (date, id)'),
+    ('idx_district_expenses_status_date', 'district_expenses (status, date)'),
+    ('idx_income_category_date', 'income (category, date)'),
+    ('idx_expenses_category_date', 'expenses (category, date)'),
+    ('idx_inventory_category_date', 'inventory (category, date_added)'),
+)
+
+
+@migration(6, 'Add indexes for keyset pagination and list filters')
+def add_page_indexes(cursor):
+    for name, target in PAGE_INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+
+@migration(7, 'Add accounting entry indexes for the ledger listing')
+def add_accounting_entry_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_accounting_entries_date_id ON accounting_entries (date, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_accounting_entries_account_date '
+                   'ON accounting_entries (account_name, date)')
+
+
+# Ledgers whose writes invalidate cached exports and reports
+VERSIONED_TABLES = ('income', 'tithes', 'offerings', 'expenses', 'district_expenses',
+                    'inventory', 'accounting_entries')
+
+
+@migration(8, 'Track a data version bumped by every ledger write')
+def add_data_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT INTO data_version (id, version) VALUES (1, 0)')
+    if cursor.dialect == 'postgres':
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+            BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        for table in VERSIONED_TABLES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_data_version ON {table}')
+            cursor.execute(f'''
+                CREATE TRIGGER trg_{table}_data_version
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH STATEMENT EXECUTE PROCEDURE bump_data_version()
+            ''')
+        return
+    # SQLite only has row-level triggers
+    for table in VERSIONED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_data_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+
+@migration(9, 'Record fiscal-year closings and their balances')
+def add_year_closings(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS year_closings (
+            fiscal_year INTEGER PRIMARY KEY,
+            archive_file TEXT NOT NULL,
+            income_total REAL DEFAULT 0,
+            local_total REAL DEFAULT 0,
+            district_total REAL DEFAULT 0,
+            expense_total REAL DEFAULT 0,
+            local_expense_total REAL DEFAULT 0,
+            net_balance REAL DEFAULT 0,
+            rows_archived INTEGER DEFAULT 0,
+            closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS closing_balances (
+            fiscal_year INTEGER NOT NULL,
+            account_name TEXT NOT NULL,
+            debit_total REAL DEFAULT 0,
+            credit_total REAL DEFAULT 0,
+            balance REAL DEFAULT 0,
+            PRIMARY KEY (fiscal_year, account_name)
+        )
+    ''')
+    # Year close selected tithes and offerings by when they were recorded
+    # until grid rows had a year; migration 19 drops these
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tithes_created_at ON tithes (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_offerings_created_at ON offerings (created_at)')
+
+
+@migration(10, 'Record the content hash of each closed year snapshot')
+def add_snapshot_hash(cursor):
+    _add_missing_columns(cursor, 'year_closings', [('snapshot_hash', 'TEXT')])
+
+
+def _summary_triggers(cursor, table, name, function, add, subtract):
+    """Keep a summary table in step with table: add runs per new row, subtract per old row."""
+    if cursor.dialect == 'postgres':
+        cursor.execute(f'''
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    {subtract}
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    {add}
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_{name} ON {table}')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_{table}_{name}
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE {function}()
+        ''')
+        return
+    for event, body in (('INSERT', add), ('UPDATE', subtract + add), ('DELETE', subtract)):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_{name}
+            AFTER {event} ON {table}
+            BEGIN
+                {body}
+            END
+        ''')
+
+
+@migration(11, 'Keep per-period account balances for the P&L and trial balance')
+def add_account_balances(cursor):
+    # Expense postings used to be written without a period
+    cursor.execute('UPDATE accounting_entries SET period = SUBSTR(date, 1, 7) WHERE period IS NULL')
+    # Post the entries older releases skipped: plain income had none and
+    # expenses only their debit side (accounts named as in ledger.py)
+    account = '''CASE WHEN category LIKE '%Income' THEN category
+                 ELSE COALESCE(NULLIF(TRIM(category), ''), 'Other') || ' Income' END'''
+    unposted = '''is_tithe = 0 AND is_offering = 0 AND NOT EXISTS (
+        SELECT 1 FROM accounting_entries e WHERE e.reference_type = 'income' AND e.reference_id = income.id)'''
+    cursor.execute(f'''
+        INSERT INTO accounting_entries
+        (account_name, debit_amount, credit_amount, description, date, period, reference_id, reference_type)
+        SELECT 'Local ' || {account}, amount, 0, description, date, SUBSTR(date, 1, 7), id, 'pending'
+        FROM income WHERE {unposted}
+    ''')
+    cursor.execute(f'''
+        INSERT INTO accounting_entries
+        (account_name, debit_amount, credit_amount, description, date, period, reference_id, reference_type)
+        SELECT {account}, 0, amount, description, date, SUBSTR(date, 1, 7), id, 'income'
+        FROM income WHERE {unposted}
+    ''')
+    cursor.execute("UPDATE accounting_entries SET reference_type = 'income' WHERE reference_type = 'pending'")
+    cursor.execute('''
+        INSERT INTO accounting_entries
+        (account_name, debit_amount, credit_amount, description, date, period, reference_id, reference_type)
+        SELECT 'Cash', 0, debit_amount, description, date, period, reference_id, 'expense'
+        FROM accounting_entries e WHERE reference_type = 'expense' AND NOT EXISTS (
+            SELECT 1 FROM accounting_entries c
+            WHERE c.reference_type = 'expense' AND c.reference_id = e.reference_id AND c.account_name = 'Cash')
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_accounting_entries_period_account
+        ON accounting_entries (period, account_name)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS account_balances (
+            period TEXT NOT NULL,
+            account_name TEXT NOT NULL,
+            debit_total REAL DEFAULT 0,
+            credit_total REAL DEFAULT 0,
+            PRIMARY KEY (period, account_name)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO account_balances (period, account_name, debit_total, credit_total)
+        SELECT period, account_name, COALESCE(SUM(debit_amount), 0), COALESCE(SUM(credit_amount), 0)
+        FROM accounting_entries GROUP BY period, account_name
+    ''')
+    add = '''
+        INSERT INTO account_balances (period, account_name, debit_total, credit_total)
+        VALUES (COALESCE(NEW.period, SUBSTR(NEW.date, 1, 7)), NEW.account_name,
+                COALESCE(NEW.debit_amount, 0), COALESCE(NEW.credit_amount, 0))
+        ON CONFLICT (period, account_name) DO UPDATE SET
+            debit_total = account_balances.debit_total + excluded.debit_total,
+            credit_total = account_balances.credit_total + excluded.credit_total;
+    '''
+    subtract = '''
+        UPDATE account_balances SET
+            debit_total = debit_total - COALESCE(OLD.debit_amount, 0),
+            credit_total = credit_total - COALESCE(OLD.credit_amount, 0)
+        WHERE period = COALESCE(OLD.period, SUBSTR(OLD.date, 1, 7)) AND account_name = OLD.account_name;
+    '''
+    _summary_triggers(cursor, 'accounting_entries', 'balances', 'apply_account_balances', add, subtract)
+
+
+# daily_totals.kind for an income row
+INCOME_KIND = "CASE WHEN {row}.is_tithe = 1 THEN 'tithe' WHEN {row}.is_offering = 1 THEN 'offering' ELSE 'other' END"
+
+
+@migration(12, 'Keep per-day, per-category totals for the period reports')
+def add_daily_totals(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            day TEXT NOT NULL,
+            ledger TEXT NOT NULL,
+            category TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            amount REAL DEFAULT 0,
+            local_amount REAL DEFAULT 0,
+            district_amount REAL DEFAULT 0,
+            entries INTEGER DEFAULT 0,
+            PRIMARY KEY (day, ledger, category, kind)
+        )
+    ''')
+    insert = 'INSERT INTO daily_totals (day, ledger, category, kind, amount, local_amount, district_amount, entries)'
+    cursor.execute(f'''
+        {insert}
+        SELECT SUBSTR(date, 1, 10), 'income', COALESCE(category, ''), {INCOME_KIND.format(row='income')},
+               SUM(amount), SUM(COALESCE(local_amount, amount)), SUM(COALESCE(district_amount, 0)), COUNT(*)
+        FROM income GROUP BY 1, 2, 3, 4
+    ''')
+    cursor.execute(f'''
+        {insert}
+        SELECT SUBSTR(date, 1, 10), 'expense', COALESCE(category, ''), COALESCE(expense_type, 'other'),
+               SUM(amount), SUM(amount), 0, COUNT(*)
+        FROM expenses GROUP BY 1, 2, 3, 4
+    ''')
+    upsert = insert + '''
+        {values}
+        ON CONFLICT (day, ledger, category, kind) DO UPDATE SET
+            amount = daily_totals.amount + excluded.amount,
+            local_amount = daily_totals.local_amount + excluded.local_amount,
+            district_amount = daily_totals.district_amount + excluded.district_amount,
+            entries = daily_totals.entries + excluded.entries;
+    '''
+
+    def subtract(ledger, kind, local, district):
+        return f'''
+            UPDATE daily_totals SET
+                amount = amount - OLD.amount,
+                local_amount = local_amount - {local},
+                district_amount = district_amount - {district},
+                entries = entries - 1
+            WHERE day = SUBSTR(OLD.date, 1, 10) AND ledger = '{ledger}'
+            AND category = COALESCE(OLD.category, '') AND kind = {kind};
+        '''
+
+    _summary_triggers(cursor, 'income', 'daily_totals', 'apply_income_daily_totals', upsert.format(values=f'''
+        VALUES (SUBSTR(NEW.date, 1, 10), 'income', COALESCE(NEW.category, ''), {INCOME_KIND.format(row='NEW')},
+                NEW.amount, COALESCE(NEW.local_amount, NEW.amount), COALESCE(NEW.district_amount, 0), 1)
+    '''), subtract('income', INCOME_KIND.format(row='OLD'), 'COALESCE(OLD.local_amount, OLD.amount)',
+                   'COALESCE(OLD.district_amount, 0)'))
+    _summary_triggers(cursor, 'expenses', 'daily_totals', 'apply_expense_daily_totals', upsert.format(values='''
+        VALUES (SUBSTR(NEW.date, 1, 10), 'expense', COALESCE(NEW.category, ''),
+                COALESCE(NEW.expense_type, 'other'), NEW.amount, NEW.amount, 0, 1)
+    '''), subtract('expense', "COALESCE(OLD.expense_type, 'other')", 'OLD.amount', '0'))
+
+
+# Every column holding a cedi amount, stored as integer pesewas from version 13
+MONEY_COLUMNS = {
+    'income': ('amount', 'district_amount', 'local_amount'),
+    'tithes': ('week1', 'week2', 'week3', 'week4', 'week5', 'offeringWeek1', 'offeringWeek2',
+               'offeringWeek3', 'offeringWeek4', 'offeringWeek5', 'total'),
+    'offerings': ('week1', 'week2', 'week3', 'week4', 'week5', 'total'),
+    'expenses': ('amount',),
+    'district_expenses': ('original_amount', 'district_amount'),
+    'accounting_entries': ('debit_amount', 'credit_amount'),
+    'period_totals': ('amount',),
+    'account_balances': ('debit_total', 'credit_total'),
+    'daily_totals': ('amount', 'local_amount', 'district_amount'),
+    'year_closings': ('income_total', 'local_total', 'district_total', 'expense_total',
+                      'local_expense_total', 'net_balance'),
+    'closing_balances': ('debit_total', 'credit_total', 'balance'),
+}
+
+
+def _money_columns(cursor, table):
+    existing = {name.lower(): name for name in table_columns(cursor, table)}
+    return [existing[name.lower()] for name in MONEY_COLUMNS[table] if name.lower() in existing]
+
+
+def _rebuild_sqlite_table(cursor, table, columns):
+    """Recreate a SQLite table with INTEGER money columns, copying rows in pesewas."""
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    sql = cursor.fetchone()[0]
+    for column in columns:
+        sql = re.sub(rf'(\b{column}\b"?\s+)REAL\b', r'\1INTEGER', sql, flags=re.IGNORECASE)
+    sql = re.sub(rf'^(CREATE TABLE(?: IF NOT EXISTS)?\s+)"?{table}"?', rf'\1{table}_pesewas', sql)
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                   (table,))
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f'PRAGMA table_info({table})')
+    names = [row[1] for row in cursor.fetchall()]
+    select = ', '.join(f'CAST(ROUND({name} * 100) AS INTEGER)' if name in columns else name for name in names)
+    # Archived years took their ids with them, so keep the AUTOINCREMENT high-water mark
+    sequence = None
+    if 'AUTOINCREMENT' in sql.upper():
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,))
+        sequence = cursor.fetchone()
+    cursor.execute(sql)
+    cursor.execute(f'INSERT INTO {table}_pesewas ({", ".join(names)}) SELECT {select} FROM {table}')
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_pesewas RENAME TO {table}')
+    if sequence:
+        cursor.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (sequence[0], table))
+        if not cursor.rowcount:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, sequence[0]))
+    for index in indexes:
+        cursor.execute(index)
+
+
+def _convert_archives(cursor):
+    """Convert the amounts in closed years' archive files, once per file."""
+    import archive
+    cursor.execute('SELECT fiscal_year FROM year_closings')
+    for (year,) in cursor.fetchall():
+        path = archive.archive_path(year)
+        if not os.path.exists(path):
+            continue
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= archive.PESEWAS_VERSION:
+                continue
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in tables & set(MONEY_COLUMNS):
+                present = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+                updates = [f'"{c}" = CAST(ROUND("{c}" * 100) AS INTEGER)' for c in MONEY_COLUMNS[table]
+                           if c in present]
+                if updates:
+                    conn.execute(f'UPDATE "{table}" SET {", ".join(updates)}')
+            conn.execute(f'PRAGMA user_version = {archive.PESEWAS_VERSION}')
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@migration(13, 'Store money as integer pesewas')
+def store_pesewas(cursor):
+    if cursor.dialect == 'postgres':
+        for table in MONEY_COLUMNS:
+            for column in _money_columns(cursor, table):
+                cursor.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT '
+                               f'USING ROUND({column} * 100)')
+    else:
+        # Triggers name the tables being rebuilt, so set them aside until the end
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND sql IS NOT NULL")
+        triggers = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        for (name,) in cursor.fetchall():
+            cursor.execute(f'DROP TRIGGER {name}')
+        for table in MONEY_COLUMNS:
+            columns = _money_columns(cursor, table)
+            if columns:
+                _rebuild_sqlite_table(cursor, table, columns)
+        for trigger in triggers:
+            cursor.execute(trigger)
+    _convert_archives(cursor)
+
+
+@migration(14, 'Post accounting entries for offerings recorded without them')
+def post_offering_entries(cursor):
+    # /api/offerings only wrote the income row and the district expense;
+    # post the four legs posting.py now writes (amounts are pesewas)
+    legs = (
+        ("'District Allocation Expense'", 'district_amount', '0', "'Offering Allocation: ' || description"),
+        ("'Offering Income'", '0', 'district_amount', "'District Allocation: ' || description"),
+        ("'Local Offering Income'", 'local_amount', '0', "'Local Offering Income: ' || description"),
+        ("'Offering Income'", '0', 'local_amount', "'Local Offering Income: ' || description"),
+    )
+    for account, debit, credit, description in legs:
+        cursor.execute(f'''
+            INSERT INTO accounting_entries
+            (account_name, debit_amount, credit_amount, description, date, period, reference_id, reference_type)
+            SELECT {account}, {debit}, {credit}, {description}, date, SUBSTR(date, 1, 7), id, 'pending'
+            FROM income WHERE offering_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM accounting_entries e WHERE e.reference_type = 'income' AND e.reference_id = income.id)
+        ''')
+    cursor.execute("UPDATE accounting_entries SET reference_type = 'income' WHERE reference_type = 'pending'")
+
+
+# Grid table -> (contributor key, income column linking to it, unique index)
+GRIDS = {
+    'tithes': ('member_id', 'tithe_id', 'idx_tithes_member_year_month'),
+    'offerings': ('member_name', 'offering_id', 'idx_offerings_member_year_month'),
+}
+WEEKS = ('week1', 'week2', 'week3', 'week4', 'week5')
+# Grid rows are placed in time by their calendar year and month, not a date column
+GRID_PERIOD = 'year, month'
+
+
+def _first_day(*values):
+    """Return the first value that starts with a valid YYYY-MM-DD date, as that date."""
+    for value in values:
+        try:
+            return date.fromisoformat(str(value)[:10]).isoformat()
+        except (TypeError, ValueError):
+            continue
+    return date.today().isoformat()
+
+
+def _grid_year_rows(cursor, table, link):
+    """Yield (grid row, {year: {week: pesewas}}, {year: [income ids]}) from the income posted to each row."""
+    cursor.execute(f'SELECT {link}, id, date, amount, description FROM income '
+                   f'WHERE {link} IS NOT NULL ORDER BY id')
+    posted = {}
+    for row in cursor.fetchall():
+        posted.setdefault(row[0], []).append(row)
+    cursor.execute(f'SELECT * FROM {table} ORDER BY id')
+    for row in cursor.fetchall():
+        weeks, ids = {}, {}
+        for income in posted.get(row['id'], []):
+            # Legacy income can have an empty or malformed date (see fix_income_dates.py)
+            year = posting.grid_year(row['month'], _first_day(income['date'], row['created_at']))
+            ids.setdefault(year, []).append(income['id'])
+            match = _WEEK_SUFFIX.search(income['description'] or '')
+            if match:
+                # A week's amount is replaced by a later entry, so the last one counts
+                weeks.setdefault(year, {})[f'week{match.group(1)}'] = income['amount']
+        yield row, weeks, ids
+
+
+def _split_grid_years(cursor, table, link):
+    """Give every grid row a year, splitting rows whose income spans several years."""
+    columns = [name for name in table_columns(cursor, table) if name not in ('id', 'year')]
+    assign = ', '.join(f'{week} = ?' for week in WEEKS)
+    for row, weeks, ids in _grid_year_rows(cursor, table, link):
+        if len(ids) < 2:
+            # Rows without posted income are placed by when they were recorded
+            year = next(iter(ids), None) or posting.grid_year(row['month'], _first_day(row['created_at']))
+            cursor.execute(f'UPDATE {table} SET year = ? WHERE id = ?', (year, row['id']))
+            continue
+        # The row keeps its latest year; each earlier year gets a row of its own
+        latest = max(ids)
+        for year, income_ids in ids.items():
+            recorded = weeks.get(year, {})
+            values = [recorded.get(week) for week in WEEKS] + [sum(recorded.values())]
+            if year == latest:
+                cursor.execute(f'UPDATE {table} SET year = ?, {assign}, total = ? WHERE id = ?',
+                               [year] + values + [row['id']])
+                continue
+            copy = dict(dict(row), **dict(zip(WEEKS + ('total',), values)))
+            new_id = cursor.insert(f'INSERT INTO {table} (year, {", ".join(columns)}) '
+                                   f'VALUES (?, {", ".join("?" * len(columns))})',
+                                   [year] + [copy[name] for name in columns])
+            cursor.executemany(f'UPDATE income SET {link} = ? WHERE id = ?',
+                               [(new_id, income_id) for income_id in income_ids])
+
+
+def _merge_grid_duplicates(cursor, table, key, link):
+    """Fold rows sharing (key, year, month) into the oldest, later weeks winning."""
+    cursor.execute(f'''
+        SELECT * FROM {table} WHERE ({key}, year, month) IN (
+            SELECT {key}, year, month FROM {table} GROUP BY {key}, year, month HAVING COUNT(*) > 1
+        ) ORDER BY id
+    ''')
+    groups = {}
+    for row in cursor.fetchall():
+        groups.setdefault((row[key], row['year'], row['month']), []).append(row)
+    for rows in groups.values():
+        keep, others = rows[0]['id'], [row['id'] for row in rows[1:]]
+        weeks = {week: None for week in WEEKS}
+        for row in rows:
+            weeks.update({week: row[week] for week in WEEKS if row[week] is not None})
+        total = sum(value for value in weeks.values() if value)
+        cursor.execute(f'UPDATE {table} SET {", ".join(f"{w} = ?" for w in WEEKS)}, total = ? WHERE id = ?',
+                       [weeks[w] for w in WEEKS] + [total, keep])
+        cursor.executemany(f'UPDATE income SET {link} = ? WHERE {link} = ?', [(keep, i) for i in others])
+        cursor.executemany(f'DELETE FROM {table} WHERE id = ?', [(i,) for i in others])
+
+
+@migration(15, 'Key tithe and offering grid rows by year and make their writes upserts')
+def add_grid_years(cursor):
+    # Rows recorded without a member id were keyed by name
+    cursor.execute("UPDATE tithes SET member_id = member_name WHERE member_id IS NULL OR member_id = ''")
+    for table, (key, link, index) in GRIDS.items():
+        _add_missing_columns(cursor, table, [('year', 'INTEGER')])
+        _split_grid_years(cursor, table, link)
+        _merge_grid_duplicates(cursor, table, key, link)
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({key}, year, month)')
+    # The unique index leads with member_id, so it serves these lookups too
+    cursor.execute('DROP INDEX IF EXISTS idx_tithes_member_month')
+
+
+@migration(16, 'Register members and reference them from tithes and income')
+def add_members(cursor):
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS members (
+            id {_pk(cursor.dialect)},
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL,
+            code TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_members_code ON members (code)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_members_uncoded_name ON members (name_key) '
+                   'WHERE code IS NULL')
+    # Prefix search ranges over these (see members.search)
+    ops = ' text_pattern_ops' if cursor.dialect == 'postgres' else ''
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_members_name_key ON members (name_key{ops})')
+    if ops:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_members_code_prefix ON members (code{ops})')
+
+    _add_missing_columns(cursor, 'tithes', [('member_ref', 'INTEGER REFERENCES members(id)')])
+    _add_missing_columns(cursor, 'income', [('member_ref', 'INTEGER REFERENCES members(id)')])
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_member_ref ON income (member_ref)')
+    members.link_tithes(cursor)
+
+    # Spellings of one member's name now share a member, so their grid rows are merged
+    _merge_grid_duplicates(cursor, 'tithes', 'member_ref', 'tithe_id')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tithes_member_ref_year_month '
+                   'ON tithes (member_ref, year, month)')
+    cursor.execute('DROP INDEX IF EXISTS idx_tithes_member_year_month')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tithes_member_id ON tithes (member_id)')
+
+
+@migration(17, 'Index ledger descriptions for full-text search')
+def add_ledger_search(cursor):
+    if cursor.dialect == 'postgres':
+        key = 'rid'
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ledger_search (
+                rid BIGINT PRIMARY KEY,
+                title TEXT,
+                body TEXT,
+                day TEXT,
+                document tsvector GENERATED ALWAYS AS
+                    (to_tsvector('simple', COALESCE(title, '') || ' ' || COALESCE(body, ''))) STORED
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ledger_search_document ON ledger_search USING GIN (document)')
+    else:
+        key = 'rowid'
+        # Stemmed, so "repairs" finds "repair"; day is stored for filtering only
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS ledger_search USING fts5(
+                title, body, day UNINDEXED, tokenize = 'porter unicode61 remove_diacritics 2'
+            )
+        ''')
+    insert = f'INSERT INTO ledger_search ({key}, title, body, day)'
+    for table in search.SOURCES:
+        rowid, title, body, day = search.entry_values(table, table)
+        cursor.execute(f'{insert} SELECT {rowid}, {title}, {body}, {day} FROM {table}')
+        rowid, title, body, day = search.entry_values(table, 'NEW')
+        _summary_triggers(cursor, table, 'search', f'index_{table}_search',
+                          f'{insert} VALUES ({rowid}, {title}, {body}, {day});',
+                          f'DELETE FROM ledger_search WHERE {key} = {search.entry_values(table, "OLD")[0]};')
+
+
+@migration(18, 'Page tithes and offerings by year, month and id')
+def add_grid_page_indexes(cursor):
+    for table in GRIDS:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_year_month_id ON {table} (year, month, id)')
+        # Keyset pages no longer walk (month, id) alone
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_month_id')
+
+
+@migration(19, 'Drop the created_at indexes year close no longer uses')
+def drop_grid_created_at_indexes(cursor):
+    # Year close now selects grid rows by (year, month), served by idx_*_year_month_id
+    for table in GRIDS:
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_created_at')
+
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def current_version(conn):
+    """Return the applied schema version with a single query (0 if none)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        conn.rollback()
+        return 0
+
+
+def schema_status():
+    """Return (applied version, latest known version)."""
+    conn = connect()
+    try:
+        return current_version(conn), latest_version()
+    finally:
+        conn.close()
+
+
+def migrate(verbose=True, target=None):
+    """Apply every pending migration up to target (all by default), each in its own transaction."""
+    conn = connect()
+    applied = []
+    try:
+        cursor = conn.cursor()
+        for version, description, func in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            conn.begin()
+            if conn.dialect == 'postgres':
+                # Serialise concurrent deploys; released at commit
+                cursor.execute('SELECT pg_advisory_xact_lock(?)', (720417,))
+            _ensure_version_table(cursor)
+            cursor.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            try:
+                func(cursor)
+                cursor.execute('''
+                    INSERT INTO schema_version (version, description) VALUES (?, ?)
+                ''', (version, description))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            if verbose:
+                print(f'Applied migration {version}: {description}')
+    finally:
+        conn.close()
+    if verbose and not applied:
+        print(f'Database schema is up to date (version {latest_version()})')
+    return applied
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        current, latest = schema_status()
+        print(f'Schema version {current} (latest {latest})')
+    else:
+        migrate()
@@ -0,0 +1,37 @@
+"""Money amounts as integer pesewas (1/100 cedi).
+
+Every amount column holds whole pesewas, so SQL SUMs, rollups and the
+NumPy reports add integers exactly. Routes parse input with to_pesewas(),
+split tithes and offerings with split(), and turn stored amounts back into
+cedis with to_cedis() only when building a response, export or report.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Share of tithes and offerings remitted to the district; the rest stays local
+DISTRICT_PERCENT = 77
+
+
+def to_pesewas(value):
+    """Parse a cedi amount (number or numeric string) into integer pesewas, rounding half up."""
+    if value is None or value == '':
+        return 0
+    try:
+        return int((Decimal(str(value).strip()) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{value!r} is not an amount')
+
+
+def to_cedis(pesewas):
+    """Return stored pesewas as cedis for JSON, exports and reports."""
+    return int(pesewas or 0) / 100
+
+
+def split(pesewas):
+    """Return (district, local) shares of an amount; they always add back up to it."""
+    district = (pesewas * DISTRICT_PERCENT + 50) // 100
+    return district, pesewas - district
+
+
+def district_sql(column):
+    """SQL for split()'s district share of an integer pesewa column."""
+    return f'(({column}) * {DISTRICT_PERCENT} + 50) / 100'
@@ -0,0 +1,148 @@
+"""PDF financial report: a period summary followed by the transaction ledgers.
+
+Paragraph and table styles are built once per process. Transactions are
+laid out as a run of page-sized tables rather than one Table per ledger,
+because reportlab's layout time grows much faster than linearly with the
+number of rows in a single table; fixed column widths also spare it from
+measuring every cell.
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from money import to_cedis
+from streaming import iter_rows
+
+CHURCH_NAME = 'The Apostolic Church Ghana - Atta Ne Atta'
+CURRENCY = 'GHS'
+
+# Rows per table chunk; roughly one A4 page at the body font size
+ROWS_PER_TABLE = 45
+DESCRIPTION_LENGTH = 48
+
+# (heading, table, [(header, column, width in inches)])
+LEDGERS = (
+    ('Income', 'income', (
+        ('Date', 'date', 0.9), ('Category', 'category', 1.2), ('Description', 'description', 2.6),
+        ('Amount', 'amount', 0.9), ('Local', 'local_amount', 0.9), ('District', 'district_amount', 0.9),
+    )),
+    ('Expenses', 'expenses', (
+        ('Date', 'date', 0.9), ('Category', 'category', 1.4), ('Description', 'description', 3.3),
+        ('Type', 'expense_type', 0.8), ('Amount', 'amount', 1.0),
+    )),
+    ('District Remittances', 'district_expenses', (
+        ('Date', 'date', 0.9), ('Source', 'source', 2.9), ('Original', 'original_amount', 1.2),
+        ('District', 'district_amount', 1.2), ('Status', 'status', 1.2),
+    )),
+)
+AMOUNT_COLUMNS = {'amount', 'local_amount', 'district_amount', 'original_amount'}
+
+
+@lru_cache(maxsize=None)
+def styles():
+    """Build the report's paragraph and table styles once per process."""
+    sheet = getSampleStyleSheet()
+    header_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]
+    return {
+        'title': ParagraphStyle('ReportTitle', parent=sheet['Title'], fontSize=16, spaceAfter=4),
+        'subtitle': ParagraphStyle('ReportSubtitle', parent=sheet['Normal'], alignment=1, spaceAfter=12),
+        'heading': ParagraphStyle('ReportHeading', parent=sheet['Heading2'], spaceBefore=12, spaceAfter=6),
+        'summary': TableStyle(header_style + [('ALIGN', (1, 0), (1, -1), 'RIGHT')]),
+        'ledger': TableStyle(header_style + [
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+        ]),
+    }
+
+
+def money(pesewas):
+    return f'{CURRENCY} {to_cedis(pesewas):,.2f}'
+
+
+def _cell(column, value):
+    if column in AMOUNT_COLUMNS:
+        return f'{to_cedis(value):,.2f}'
+    text = '' if value is None else str(value)
+    if len(text) > DESCRIPTION_LENGTH:
+        text = text[:DESCRIPTION_LENGTH - 3] + '...'
+    return text
+
+
+def _range(start, end):
+    return 'date >= ? AND date <= ?', [start.isoformat(), end.isoformat()]
+
+
+def summary(cursor, start, end):
+    """Return [(label, amount in pesewas)] totals for the period."""
+    where, params = _range(start, end)
+    cursor.execute(f'''
+        SELECT COALESCE(SUM(amount), 0), COALESCE(SUM(COALESCE(local_amount, amount)), 0),
+               COALESCE(SUM(district_amount), 0)
+        FROM income WHERE {where}
+    ''', params)
+    income, local, district = cursor.fetchone()
+    cursor.execute(f'''
+        SELECT COALESCE(SUM(amount), 0) FROM expenses
+        WHERE {where} AND expense_type != 'district'
+    ''', params)
+    local_expenses = cursor.fetchone()[0]
+    return [
+        ('Total Income', income),
+        ('Local Share', local),
+        ('District Share', district),
+        ('Local Expenses', local_expenses),
+        ('Net Local Balance', int(local or 0) - int(local_expenses or 0)),
+    ]
+
+
+def _ledger_tables(cursor, table, columns, start, end):
+    """Yield page-sized Tables of the ledger's rows for the period."""
+    widths = [width * inch for _, _, width in columns]
+    header = [heading for heading, _, _ in columns]
+    where, params = _range(start, end)
+    cursor.execute(f'''
+        SELECT {", ".join(column for _, column, _ in columns)} FROM {table}
+        WHERE {where} ORDER BY date, id
+    ''', params)
+    chunk = []
+    for row in iter_rows(cursor):
+        chunk.append([_cell(column, row[index]) for index, (_, column, _) in enumerate(columns)])
+        if len(chunk) == ROWS_PER_TABLE:
+            yield Table([header] + chunk, colWidths=widths, style=styles()['ledger'])
+            chunk = []
+    if chunk:
+        yield Table([header] + chunk, colWidths=widths, style=styles()['ledger'])
+
+
+def build_report(conn, output, start, end, label):
+    """Render the report for start..end into output (a path or file object)."""
+    style = styles()
+    cursor = conn.cursor()
+    story = [
+        Paragraph(CHURCH_NAME, style['title']),
+        Paragraph(f'Financial Report - {label} ({start.isoformat()} to {end.isoformat()})', style['subtitle']),
+        Paragraph('Summary', style['heading']),
+        Table([['Item', 'Amount']] + [[name, money(value)] for name, value in summary(cursor, start, end)],
+              colWidths=[3 * inch, 2 * inch], style=style['summary']),
+    ]
+    for heading, table, columns in LEDGERS:
+        story.append(Paragraph(heading, style['heading']))
+        tables = list(_ledger_tables(cursor, table, columns, start, end))
+        story.extend(tables or [Paragraph('No transactions in this period.', style['subtitle'])])
+        story.append(Spacer(1, 6))
+    doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=0.5 * inch, rightMargin=0.5 * inch,
+                            topMargin=0.6 * inch, bottomMargin=0.6 * inch,
+                            title=f'Financial Report - {label}')
+    doc.build(story)
@@ -0,0 +1,168 @@
+"""Weekly, monthly, yearly and all-time income/expense reports.
+
+Triggers on income and expenses keep ``daily_totals`` summed per day,
+category and kind, so a report reads a few rows per day however many
+transactions there are. Those rows are loaded as NumPy columns (dates as
+day numbers, amounts as int64 pesewas, categories as codes) and every
+total, category breakdown and zero-filled time series is a bincount over
+them; the browser receives a few kilobytes instead of every transaction.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from money import to_cedis
+from streaming import BATCH_SIZE
+
+# period -> time series bucket
+PERIODS = {
+    'weekly': 'day',
+    'monthly': 'day',
+    'yearly': 'month',
+    'all': 'month',
+}
+
+
+def period_range(period, anchor=None):
+    """Return (start, end) dates for a period containing anchor; (None, None) for all time."""
+    anchor = anchor or date.today()
+    if period == 'weekly':
+        # Sunday to Saturday, as the week is shown in the browser
+        start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        return start, start + timedelta(days=6)
+    if period == 'monthly':
+        start = anchor.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if period == 'yearly':
+        return date(anchor.year, 1, 1), date(anchor.year, 12, 31)
+    return None, None
+
+
+def _load(cursor, sql, params, dtypes):
+    """Read a query into one NumPy array per column, a batch at a time."""
+    cursor.execute(sql, params)
+    chunks = [[] for _ in dtypes]
+    while True:
+        batch = cursor.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+        for chunk, values, dtype in zip(chunks, zip(*batch), dtypes):
+            chunk.append(np.array(values, dtype=dtype))
+    return [np.concatenate(chunk) if chunk else np.array([], dtype=dtype)
+            for chunk, dtype in zip(chunks, dtypes)]
+
+
+def _to_days(values):
+    """Convert YYYY-MM-DD strings to datetime64 days; impossible dates become NaT."""
+    try:
+        return values.astype('datetime64[D]')
+    except ValueError:
+        days = []
+        for value in values:
+            try:
+                days.append(np.datetime64(value, 'D'))
+            except ValueError:
+                days.append(np.datetime64('NaT', 'D'))
+        return np.array(days, dtype='datetime64[D]')
+
+
+def load(cursor, start=None, end=None):
+    """Load the per-day, per-category totals between start and end as NumPy columns."""
+    where, params = '1=1', []
+    if start is not None:
+        where, params = 'day >= ? AND day <= ?', [start.isoformat(), end.isoformat()]
+    # Legacy income rows with an empty or garbled date have no day to report under
+    days, ledger, category, kind, amount, local, district, entries = _load(cursor, f'''
+        SELECT day, ledger, category, kind, amount, local_amount, district_amount, entries
+        FROM daily_totals WHERE {where} AND entries > 0 AND day LIKE '____-__-__'
+    ''', params, (str, object, object, object, np.int64, np.int64, np.int64, np.int64))
+    days = _to_days(days)
+    valid = ~np.isnat(days)
+    return {
+        'days': days[valid], 'is_income': ledger[valid] == 'income', 'category': category[valid],
+        'kind': kind[valid], 'amount': amount[valid], 'local': local[valid], 'district': district[valid],
+        'entries': entries[valid],
+    }
+
+
+def _bucket_index(days, start, bucket):
+    if bucket == 'day':
+        return (days - np.datetime64(start, 'D')).astype(np.int64)
+    return (days.astype('datetime64[M]') - np.datetime64(start, 'M')).astype(np.int64)
+
+
+def _labels(start, end, bucket):
+    unit = 'D' if bucket == 'day' else 'M'
+    first, last = np.datetime64(start, unit), np.datetime64(end, unit)
+    return np.arange(first, last + 1).astype(str).tolist()
+
+
+def _series(index, amounts, size, mask):
+    # float64 weights add whole pesewas exactly (up to 2**53)
+    sums = np.bincount(index, weights=np.where(mask, amounts, 0), minlength=size)[:size]
+    return (sums.astype(np.int64) / 100).tolist()
+
+
+def _by_category(categories, amounts):
+    if not len(categories):
+        return []
+    names, codes = np.unique(categories.astype(str), return_inverse=True)
+    sums = np.bincount(codes, weights=amounts).astype(np.int64)
+    order = np.argsort(-sums, kind='stable')
+    return [{'category': names[i] or 'Uncategorised', 'amount': to_cedis(sums[i])} for i in order]
+
+
+def _total(amounts, mask):
+    return int(amounts[mask].sum())
+
+
+def build(cursor, period, anchor=None):
+    """Return the totals, category breakdowns and time series for a period."""
+    bucket = PERIODS[period]
+    start, end = period_range(period, anchor)
+    rows = load(cursor, start, end)
+    if start is None:
+        if len(rows['days']):
+            start, end = rows['days'].min().item(), rows['days'].max().item()
+        else:
+            start = end = date.today()
+
+    labels = _labels(start, end, bucket)
+    size = len(labels)
+    index = _bucket_index(rows['days'], start, bucket)
+    income = rows['is_income']
+    tithes = income & (rows['kind'] == 'tithe')
+    offerings = income & (rows['kind'] == 'offering')
+    local_expenses = ~income & (rows['kind'] != 'district')
+
+    local_income = _total(rows['local'], income)
+    local_expense_total = _total(rows['amount'], local_expenses)
+    totals = {
+        'income': _total(rows['amount'], income),
+        'local_income': local_income,
+        'district': _total(rows['district'], income),
+        'tithes': _total(rows['amount'], tithes),
+        'offerings': _total(rows['amount'], offerings),
+        'local_retention': _total(rows['local'], tithes | offerings),
+        'expenses': _total(rows['amount'], ~income),
+        'local_expenses': local_expense_total,
+        'balance': local_income - local_expense_total,
+    }
+    return {
+        'period': period,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'bucket': bucket,
+        'totals': dict({key: to_cedis(value) for key, value in totals.items()},
+                       income_count=int(rows['entries'][income].sum()),
+                       expense_count=int(rows['entries'][~income].sum())),
+        'income_by_category': _by_category(rows['category'][income], rows['local'][income]),
+        'expenses_by_category': _by_category(rows['category'][local_expenses], rows['amount'][local_expenses]),
+        'series': {
+            'labels': labels,
+            'income': _series(index, rows['local'], size, income),
+            'expenses': _series(index, rows['amount'], size, local_expenses),
+            'tithes': _series(index, rows['amount'], size, tithes),
+            'offerings': _series(index, rows['amount'], size, offerings),
+        },
+    }
@@ -0,0 +1,205 @@
+"""Double-entry posting of income, tithes and offerings.
+
+Every income-producing route describes what it received as a contribution
+and hands it to post(), which applies the district allocation rule and
+writes all the ledger legs: the income row, the district allocation (a
+pending district_expenses row, or a 'district' expense when the share is
+paid over at once), the accounting entries and the period rollups. Each
+ledger table gets a single executemany for the whole batch, income first
+because its ids key the other legs, inside the caller's transaction.
+"""
+from datetime import date
+
+import ledger
+import members
+import rollups
+from money import split
+
+TITHE = 'tithe'
+OFFERING = 'offering'
+
+# Where a contribution's district share is recorded
+PENDING = 'district_expenses'
+PAID = 'expenses'
+
+
+def contribution(category, description, amount, day, kind=None, label=None, reference_type='income',
+                 remit_to=PENDING, remit_description=None, tithe_id=None, offering_id=None, member_ref=None):
+    """Describe one receipt of amount pesewas on day for post().
+
+    kind is TITHE or OFFERING for receipts shared with the district, or
+    None for income the assembly keeps in full. label names the receipt
+    in the accounting entry descriptions.
+    """
+    if amount <= 0:
+        raise ValueError('Amount must be greater than zero')
+    if kind not in (None, TITHE, OFFERING):
+        raise ValueError(f'Unknown contribution kind: {kind}')
+    label = label or description
+    return {
+        'category': category,
+        'description': description,
+        'amount': amount,
+        'date': day,
+        'kind': kind,
+        'label': label,
+        'reference_type': reference_type,
+        'remit_to': remit_to,
+        'remit_description': remit_description or label,
+        'tithe_id': tithe_id,
+        'offering_id': offering_id,
+        'member_ref': member_ref,
+    }
+
+
+def grid_year(month, day):
+    """Calendar year of the grid month a contribution recorded on day belongs to.
+
+    A month later in the year than day was last year's: December's tithes
+    entered in January go to the previous December.
+    """
+    year, current = int(day[:4]), int(day[5:7])
+    return year if month <= current else year - 1
+
+
+def _week_total(table, week):
+    # SET expressions see the row's old values; the new week's amount is in excluded
+    return ' + '.join(f'excluded.week{n}' if n == week else f'COALESCE({table}.week{n}, 0)'
+                      for n in range(1, 6))
+
+
+def tithe(cursor, member_name, member_id, month, week, amount, day, year=None, member_ref=None):
+    """Set a member's tithe for a week of the month in the tithes grid; return its contribution.
+
+    The member is member_ref from the registry if given, otherwise the one
+    with member number member_id, or named member_name if there is none.
+    """
+    if member_ref:
+        member = members.get(cursor, member_ref)
+        if not member:
+            raise ValueError(f'Unknown member: {member_ref}')
+        member_name, member_id = member['name'], member['code']
+    else:
+        member_ref = members.resolve(cursor, member_name, member_id)
+    member_id = member_id or member_name
+    year = year or grid_year(month, day)
+    # One statement whether or not the member has a row for the month yet;
+    # the week's amount is replaced, not added to
+    cursor.execute(f'''
+        INSERT INTO tithes (
+            member_name, member_id, member_ref, year, month, week{week}, total, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT (member_ref, year, month) DO UPDATE SET
+            week{week} = excluded.week{week},
+            total = {_week_total('tithes', week)},
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING id
+    ''', (member_name, member_id, member_ref, year, month, amount, amount))
+    tithe_id = cursor.fetchone()[0]
+
+    description = f'Tithe from {member_name} - {date(2000, month, 1).strftime("%B")} Week {week}'
+    return contribution(f'Tithe - {member_name}', description, amount, day, kind=TITHE,
+                        label=f'{member_name} - Week {week}', reference_type='tithe',
+                        remit_description=description, tithe_id=tithe_id, member_ref=member_ref)
+
+
+def offering(cursor, month, week, amount, day, year=None):
+    """Set the general offering for a week of the month; return its contribution."""
+    year = year or grid_year(month, day)
+    cursor.execute(f'''
+        INSERT INTO offerings (member_name, member_id, year, month, week{week}, total)
+        VALUES ('General Offering', NULL, ?, ?, ?, ?)
+        ON CONFLICT (member_name, year, month) DO UPDATE SET
+            week{week} = excluded.week{week},
+            total = {_week_total('offerings', week)}
+        RETURNING id
+    ''', (year, month, amount, amount))
+    offering_id = cursor.fetchone()[0]
+
+    # The district's 77% is paid over at once, as an expense
+    return contribution('Offering', f'Offering - Week {week}', amount, day, kind=OFFERING, remit_to=PAID,
+                        remit_description=f'Offering contribution to district - Week {week}',
+                        offering_id=offering_id)
+
+
+def shares(item):
+    """Return (district, local) pesewas of a contribution."""
+    return split(item['amount']) if item['kind'] else (0, item['amount'])
+
+
+def _entries(item, district, local):
+    """Accounting entry rows (account, debit, credit, description) for a contribution."""
+    if not item['kind']:
+        # Income kept in full by the assembly: credit income, debit the local share
+        account = ledger.income_account(item['category'])
+        return [
+            (account, 0, item['amount'], item['description']),
+            (f'Local {account}', item['amount'], 0, item['description']),
+        ]
+    source = item['kind'].capitalize()
+    label = item['label']
+    return [
+        ('District Allocation Expense', district, 0, f'{source} Allocation: {label}'),
+        (f'{source} Income', 0, district, f'District Allocation: {label}'),
+        (f'Local {source} Income', local, 0, f'Local {source} Income: {label}'),
+        (f'{source} Income', 0, local, f'Local {source} Income: {label}'),
+    ]
+
+
+def post(cursor, contributions):
+    """Write every ledger leg of the contributions; return their income ids in order."""
+    contributions = list(contributions)
+    rows = []
+    for item in contributions:
+        district, local = shares(item)
+        rows.append((item['category'], item['description'], item['amount'], item['date'],
+                     int(item['kind'] == TITHE), int(item['kind'] == OFFERING), local, district,
+                     item['tithe_id'], item['offering_id'], item['member_ref']))
+    ids = cursor.insert_many('''
+        INSERT INTO income (
+            category, description, amount, date, is_tithe, is_offering,
+            local_amount, district_amount, tithe_id, offering_id, member_ref, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', rows)
+
+    entries, allocations, expenses, totals = [], [], [], []
+    for item, income_id in zip(contributions, ids):
+        district, local = shares(item)
+        day = item['date']
+        entries.extend(
+            (account, debit, credit, description, day, day[:7], income_id, item['reference_type'])
+            for account, debit, credit, description in _entries(item, district, local)
+        )
+        totals.extend([(day, rollups.INCOME_LOCAL, local), (day, rollups.INCOME_DISTRICT, district)])
+        if not item['kind']:
+            continue
+        source = item['kind'].capitalize()
+        if item['remit_to'] == PAID:
+            expenses.append((f'District {source} Contribution', item['remit_description'], district, day,
+                             income_id))
+            totals.append((day, rollups.expense_metric('district'), district))
+        else:
+            allocations.append((f'{source} Allocation', item['remit_description'], item['amount'], district,
+                                day, income_id))
+
+    if allocations:
+        cursor.executemany('''
+            INSERT INTO district_expenses (
+                source, description, original_amount, district_amount,
+                date, status, income_id, created_at
+            ) VALUES (?, ?, ?, ?, ?, 'Pending', ?, CURRENT_TIMESTAMP)
+        ''', allocations)
+    if expenses:
+        cursor.executemany('''
+            INSERT INTO expenses (category, description, amount, date, expense_type, income_id)
+            VALUES (?, ?, ?, ?, 'district', ?)
+        ''', expenses)
+    if entries:
+        cursor.executemany('''
+            INSERT INTO accounting_entries (
+                account_name, debit_amount, credit_amount,
+                description, date, period, reference_id, reference_type
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', entries)
+    rollups.apply(cursor, totals)
+    return ids
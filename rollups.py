@@ -0,0 +1,163 @@
+"""Incrementally maintained period totals for the dashboard.
+
+Every write to income or expenses also adjusts ``period_totals`` inside the
+same transaction, so reading a day, month or fiscal-year total is a
+primary-key lookup. ``python rollups.py rebuild`` recomputes the table from
+the ledgers and ``python rollups.py verify`` checks it without changing it.
+Amounts are integer pesewas (see money.py), so totals compare exactly.
+"""
+import sys
+from db import connect
+
+INCOME_LOCAL = 'income_local'
+INCOME_DISTRICT = 'income_district'
+EXPENSE_PREFIX = 'expense:'
+
+_UPSERT = '''
+    INSERT INTO period_totals (period_type, period_key, metric, amount)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (period_type, period_key, metric)
+    DO UPDATE SET amount = period_totals.amount + excluded.amount
+'''
+
+
+def expense_metric(expense_type):
+    return f'{EXPENSE_PREFIX}{expense_type or "other"}'
+
+
+def fiscal_year(day):
+    """Return the starting year of the April-March fiscal year containing day."""
+    year, month = int(day[:4]), int(day[5:7])
+    return year if month >= 4 else year - 1
+
+
+def period_keys(day):
+    """Return the (period_type, period_key) pairs a transaction date rolls up into."""
+    return (('day', day[:10]), ('month', day[:7]), ('fy', str(fiscal_year(day))))
+
+
+def _deltas(rows):
+    """Expand (date, metric, amount) rows into per-period upsert parameters."""
+    totals = {}
+    for day, metric, amount in rows:
+        if not day or not amount:
+            continue
+        for period_type, period_key in period_keys(day):
+            key = (period_type, period_key, metric)
+            totals[key] = totals.get(key, 0) + amount
+    return [key + (amount,) for key, amount in totals.items()]
+
+
+def apply(cursor, rows):
+    """Add (date, metric, amount) deltas to the rollups; negative amounts subtract."""
+    params = _deltas(rows)
+    if params:
+        cursor.executemany(_UPSERT, params)
+
+
+def record_income(cursor, day, local_amount, district_amount):
+    apply(cursor, [(day, INCOME_LOCAL, local_amount), (day, INCOME_DISTRICT, district_amount)])
+
+
+def record_expense(cursor, day, expense_type, amount):
+    apply(cursor, [(day, expense_metric(expense_type), amount)])
+
+
+def remove_income(cursor, income_filter, params):
+    """Subtract the income rows matching income_filter; call before deleting them."""
+    cursor.execute(f'''
+        SELECT date, COALESCE(local_amount, amount) AS local_amount, district_amount
+        FROM income WHERE {income_filter}
+    ''', params)
+    rows = []
+    for row in cursor.fetchall():
+        rows.append((row['date'], INCOME_LOCAL, -(row['local_amount'] or 0)))
+        rows.append((row['date'], INCOME_DISTRICT, -(row['district_amount'] or 0)))
+    apply(cursor, rows)
+
+
+def remove_expenses(cursor, expense_filter, params):
+    """Subtract the expense rows matching expense_filter; call before deleting them."""
+    cursor.execute(f'SELECT date, expense_type, amount FROM expenses WHERE {expense_filter}', params)
+    apply(cursor, [
+        (row['date'], expense_metric(row['expense_type']), -(row['amount'] or 0))
+        for row in cursor.fetchall()
+    ])
+
+
+def totals(cursor, period_type, period_key):
+    """Return {metric: amount} for one period."""
+    cursor.execute('''
+        SELECT metric, amount FROM period_totals
+        WHERE period_type = ? AND period_key = ?
+    ''', (period_type, period_key))
+    return {row['metric']: row['amount'] for row in cursor.fetchall()}
+
+
+def expense_total(period_totals):
+    return sum(amount for metric, amount in period_totals.items() if metric.startswith(EXPENSE_PREFIX))
+
+
+def compute(cursor):
+    """Recompute every rollup row from the ledgers, keyed like period_totals."""
+    cursor.execute('''
+        SELECT date, SUM(COALESCE(local_amount, amount)) AS local_amount,
+               SUM(district_amount) AS district_amount
+        FROM income GROUP BY date
+    ''')
+    rows = []
+    for row in cursor.fetchall():
+        rows.append((row['date'], INCOME_LOCAL, row['local_amount']))
+        rows.append((row['date'], INCOME_DISTRICT, row['district_amount']))
+    cursor.execute('SELECT date, expense_type, SUM(amount) AS amount FROM expenses GROUP BY date, expense_type')
+    rows.extend((row['date'], expense_metric(row['expense_type']), row['amount']) for row in cursor.fetchall())
+    return {(p, k, m): amount for p, k, m, amount in _deltas(rows)}
+
+
+def stored(cursor):
+    cursor.execute('SELECT period_type, period_key, metric, amount FROM period_totals')
+    return {(row[0], row[1], row[2]): row[3] for row in cursor.fetchall()}
+
+
+def mismatches(cursor):
+    """Return [(key, stored, expected)] for rollup rows that disagree with the ledgers."""
+    expected, actual = compute(cursor), stored(cursor)
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        if (actual.get(key) or 0) != (expected.get(key) or 0):
+            problems.append((key, actual.get(key), expected.get(key)))
+    return problems
+
+
+def rebuild(cursor):
+    """Replace period_totals with totals recomputed from the ledgers."""
+    cursor.execute('DELETE FROM period_totals')
+    cursor.executemany(_UPSERT, [key + (amount,) for key, amount in compute(cursor).items()])
+
+
+def main(command):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        if command == 'rebuild':
+            conn.begin()
+            rebuild(cursor)
+            conn.commit()
+            print('Rebuilt period totals.')
+        problems = mismatches(cursor)
+        for key, actual, expected in problems:
+            print(f'Mismatch {key}: stored {actual}, expected {expected}')
+        if problems:
+            return 1
+        print('Period totals match the ledgers.')
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    if command not in ('rebuild', 'verify'):
+        print('Usage: python rollups.py [rebuild|verify]')
+        sys.exit(2)
+    sys.exit(main(command))
@@ -742,104 +742,43 @@ function updateTithesOfferingsChart(tithes, offerings, districtAllocation, local
 
 // Helper function to update tithes and offerings summary
 function updateTithesAndOfferingsSummary() {
-    // Fetch data from the backend
-    Promise.all([
-        fetch('/api/income').then(r => r.json()),
-        fetch('/api/tithes').then(r => r.json())
-    ])
-    .then(([incomeResponse, tithesResponse]) => {
-        try {
-            // Safely access response data with fallback to empty arrays
-            const incomeData = (incomeResponse && incomeResponse.data) || [];
-            const tithesData = (tithesResponse && tithesResponse.data) || [];
-            
-            console.log('Tithes and Offerings Data:', { incomeData, tithesData });
-            
-            // Filter and calculate totals for tithes and offerings
-            const tithesFromIncome = Array.isArray(incomeData) ? 
-                incomeData.filter(item => item && item.is_tithe) : [];
-                
-            const offeringsData = Array.isArray(incomeData) ? 
-                incomeData.filter(item => item && item.is_offering) : [];
-            
-            // Calculate totals from income data with null checks
-            const totalTithesFromIncome = tithesFromIncome.reduce((sum, item) => {
-                return sum + (parseFloat(item?.amount) || 0);
-            }, 0);
-            
-            const totalOfferings = offeringsData.reduce((sum, item) => {
-                return sum + (parseFloat(item?.amount) || 0);
-            }, 0);
-            
-            // Calculate tithes from tithes table (weekly tithes)
-            const weeklyTithes = Array.isArray(tithesData) ? tithesData.reduce((sum, tithe) => {
-                if (!tithe) return sum;
-                return sum + 
-                    (parseFloat(tithe.week1) || 0) + 
-                    (parseFloat(tithe.week2) || 0) + 
-                    (parseFloat(tithe.week3) || 0) + 
-                    (parseFloat(tithe.week4) || 0) + 
-                    (parseFloat(tithe.week5) || 0);
-            }, 0) : 0;
-            
-            // Calculate total tithes (from both income and tithes table)
-            const totalTithes = totalTithesFromIncome + weeklyTithes;
-            
-            // Calculate total tithes and offerings
-            const totalTithesAndOfferings = totalTithes + totalOfferings;
-            
-            // Calculate district allocation (77% of tithes and offerings)
-            const districtAllocation = Math.round(totalTithesAndOfferings * 0.77 * 100) / 100;
-            const localRetention = Math.round(totalTithesAndOfferings * 0.23 * 100) / 100;
-            
-            console.log('Tithes and Offerings Summary:', {
-                totalTithes,
-                totalOfferings,
-                totalTithesAndOfferings,
-                districtAllocation,
-                localRetention
-            });
-            
-            // Safely update the summary cards with proper formatting
+    // All-time totals, summed on the server
+    fetch('/api/reports/all')
+        .then(r => r.json())
+        .then(report => {
+            if (!report.success) {
+                throw new Error(report.message || 'Failed to load report');
+            }
+            const totals = report.totals;
             const updateElementText = (id, value) => {
                 const element = document.getElementById(id);
                 if (element) element.textContent = formatCurrency(value);
             };
-            
-            updateElementText('totalTithes', totalTithes);
-            updateElementText('totalOfferings', totalOfferings);
-            updateElementText('totalDistrictAllocation', districtAllocation);
-            updateElementText('localRetention', localRetention);
-            
+
+            updateElementText('totalTithes', totals.tithes);
+            updateElementText('totalOfferings', totals.offerings);
+            updateElementText('totalDistrictAllocation', totals.district);
+            updateElementText('localRetention', totals.local_retention);
+
             // Update the chart if the container exists
             const chartContainer = document.getElementById('tithesOfferingsChartContainer');
             if (chartContainer) {
-                updateTithesOfferingsChart(totalTithes, totalOfferings, districtAllocation, localRetention);
+                updateTithesOfferingsChart(totals.tithes, totals.offerings, totals.district, totals.local_retention);
             }
-            
+
             // Also update the dashboard with the latest values
             updateDashboard();
-        } catch (error) {
-            console.error('Error processing tithes and offerings data:', error);
+        })
+        .catch(error => {
+            console.error('Error updating tithes and offerings summary:', error);
             // Set all values to 0 on error
             const elements = ['totalTithes', 'totalOfferings', 'totalDistrictAllocation', 'localRetention'];
             elements.forEach(id => {
                 const element = document.getElementById(id);
                 if (element) element.textContent = formatCurrency(0);
             });
-            throw error;
-        }
-    })
-    .catch(error => {
-        console.error('Error updating tithes and offerings summary:', error);
-        // Set all values to 0 on error
-        const elements = ['totalTithes', 'totalOfferings', 'totalDistrictAllocation', 'localRetention'];
-        elements.forEach(id => {
-            const element = document.getElementById(id);
-            if (element) element.textContent = formatCurrency(0);
         });
-    });
-};
+}
 
 function updateTithesTable(month) {
     // Show loading state
@@ -1195,70 +1134,18 @@ function getConditionClass(condition) {
 
 // Dashboard updates
 function updateDashboard() {
-    // Fetch fresh data from backend instead of using localStorage
-    Promise.all([
-        fetch('/api/income').then(r => r.json()),
-        fetch('/api/expenses').then(r => r.json()),
-        fetch('/api/district-expenses').then(r => r.json()),
-        fetch('/api/tithes').then(r => r.json())
-    ]).then(([incomeData, expensesData, districtData, tithesData]) => {
-        const today = new Date().toISOString().split('T')[0];
+    // Totals come from the server's period rollups instead of whole tables
+    fetch('/api/reports/dashboard')
+    .then(r => r.json())
+    .then(summary => {
+        // Local income (23% of tithes/offerings + 100% of other income)
+        const totalLocalIncome = parseFloat(summary.todayIncome) || 0;
         
-        // Calculate today's income from backend data (including all income)
-        const todayIncome = incomeData
-            .filter(item => item.date === today)
-            .reduce((sum, item) => {
-                if (item.is_tithe || item.is_offering) {
-                    // For tithes and offerings, only count the local portion (23%)
-                    return sum + (parseFloat(item.local_amount) || 0);
-                } else {
-                    // For other income, count the full amount as local
-                    return sum + (parseFloat(item.amount) || 0);
-                }
-            }, 0);
-        
-        // Include today's tithes and offerings in income calculation
-        const todayTithes = tithesData
-            .filter(tithe => tithe.date === today)
-            .reduce((sum, tithe) => {
-                const totalTithe = (parseFloat(tithe.week1) || 0) + 
-                                 (parseFloat(tithe.week2) || 0) + 
-                                 (parseFloat(tithe.week3) || 0) + 
-                                 (parseFloat(tithe.week4) || 0) + 
-                                 (parseFloat(tithe.week5) || 0);
-                // Only count 23% of tithes as local income
-                return sum + (totalTithe * 0.23);
-            }, 0);
-        
-        // Calculate total local income (23% of tithes/offerings + 100% of other income)
-        const totalLocalIncome = todayIncome + todayTithes;
-        
-        // Calculate district allocation (77% of tithes and offerings)
-        const todayDistrictAllocation = incomeData
-            .filter(item => item.date === today && (item.is_tithe || item.is_offering))
-            .reduce((sum, item) => sum + (parseFloat(item.district_amount) || 0), 0);
-        
-        // Add district allocation from tithes (77% of today's tithes)
-        const todayTithesDistrict = tithesData
-            .filter(tithe => tithe.date === today)
-            .reduce((sum, tithe) => {
-                const totalTithe = (parseFloat(tithe.week1) || 0) + 
-                                 (parseFloat(tithe.week2) || 0) + 
-                                 (parseFloat(tithe.week3) || 0) + 
-                                 (parseFloat(tithe.week4) || 0) + 
-                                 (parseFloat(tithe.week5) || 0);
-                return sum + (totalTithe * 0.77);
-            }, 0);
-        
-        const totalDistrictAllocation = todayDistrictAllocation + todayTithesDistrict;
-        
-        // Calculate total expenses (local only)
-        const todayLocalExpenses = expensesData
-            .filter(item => item.date === today && (item.expense_type === 'other' || !item.expense_type))
-            .reduce((sum, item) => sum + (parseFloat(item.amount) || 0), 0);
+        // District allocation (77% of tithes and offerings)
+        const totalDistrictAllocation = parseFloat(summary.todayDistrictAllocation) || 0;
         
         // Total expenses include both local expenses and district allocation
-        const totalTodayExpenses = todayLocalExpenses + totalDistrictAllocation;
+        const totalTodayExpenses = (parseFloat(summary.todayLocalExpense) || 0) + totalDistrictAllocation;
         
         // Update dashboard
         setTimeout(() => {
@@ -1550,423 +1437,40 @@ function showReport(reportType) {
     updateReports();
 }
 
-async function updateReports() {
-    try {
-        // Fetch data from the backend
-        const [incomeResponse, expensesResponse] = await Promise.all([
-            fetch('/api/income').then(r => r.json()),
-            fetch('/api/expenses?type=other').then(r => r.json())
-        ]);
-
-        // Safely access response data with fallback to empty arrays
-        const incomeData = (incomeResponse && incomeResponse.data) || [];
-        const expensesData = (expensesResponse && expensesResponse.data) || [];
-        
-        // Filter out tithes and offerings from income data
-        const filteredIncomeData = incomeData.filter(item => 
-            item && !item.is_tithe && !item.is_offering
-        );
-
-        console.log('Reports Data:', { 
-            incomeData: filteredIncomeData, 
-            expensesData 
-        });
-
-        const now = new Date();
-        const thisWeek = getWeekRange(now);
-        const thisMonth = now.getMonth();
-        const thisYear = now.getFullYear();
-
-        // Process income data for reports
-        const allIncomeData = [];
-        const allExpensesData = [];
-
-        // Process income items
-        filteredIncomeData.forEach((income, index) => {
-            if (!income) {
-                console.warn(`Skipping null/undefined income at index ${index}`);
-                return;
-            }
-            
-            try {
-                const amount = parseFloat(income.amount || 0);
-                if (isNaN(amount)) {
-                    console.warn(`Invalid amount for income at index ${index}:`, income);
-                    return;
-                }
-                
-                let incomeDate = income.date;
-                if (!incomeDate) {
-                    console.warn(`Missing date for income at index ${index}, using current date`);
-                    incomeDate = new Date().toISOString().split('T')[0];
-                } else if (incomeDate.includes('T')) {
-                    incomeDate = incomeDate.split('T')[0];
-                }
-                
-                const localAmount = amount * 0.23;
-                
-                allIncomeData.push({
-                    date: incomeDate,
-                    category: income.category || 'Income',
-                    description: income.description || 'Income Entry',
-                    amount: parseFloat(localAmount.toFixed(2)),
-                    id: income.id,
-                    isLocal: true,
-                    totalAmount: parseFloat(income.amount),
-                    districtAmount: parseFloat(income.district_amount || (income.amount * 0.77).toFixed(2)),
-                    localAmount: parseFloat(localAmount.toFixed(2))
-                });
-            } catch (error) {
-                console.error(`Error processing income at index ${index}:`, error, income);
-            }
-        });
+// Rows shown in each report's transaction tables
+const REPORT_TABLE_ROWS = 100;
 
-        // Process expenses
-        expensesData.forEach((expense, index) => {
-            if (!expense) {
-                console.warn(`Skipping null/undefined expense at index ${index}`);
-                return;
-            }
-            
-            try {
-                const amount = parseFloat(expense.amount || 0);
-                if (isNaN(amount)) {
-                    console.warn(`Invalid amount for expense at index ${index}:`, expense);
-                    return;
-                }
-                
-                let expenseDate = expense.date;
-                if (!expenseDate) {
-                    console.warn(`Missing date for expense at index ${index}, using current date`);
-                    expenseDate = new Date().toISOString().split('T')[0];
-                } else if (expenseDate.includes('T')) {
-                    expenseDate = expenseDate.split('T')[0];
-                }
-                
-                allExpensesData.push({
-                    date: expenseDate,
-                    category: expense.category || 'Expense',
-                    description: expense.description || 'Expense Entry',
-                    amount: amount,
-                    id: expense.id,
-                    type: expense.type || 'other'
-                });
-            } catch (error) {
-                console.error(`Error processing expense at index ${index}:`, error, expense);
-            }
-        });
-
-        // Calculate totals
-        const calculateTotals = (data, dateFilter) => {
-            return data.reduce((acc, item) => {
-                try {
-                    const itemDate = new Date(item.date);
-                    if (dateFilter(itemDate)) {
-                        acc.total += parseFloat(item.amount) || 0;
-                        acc.count++;
-                    }
-                } catch (error) {
-                    console.error('Error processing date:', item.date, error);
-                }
-                return acc;
-            }, { total: 0, count: 0 });
-        };
-
-        // Filter and calculate data for different time periods
-        const weeklyIncomeData = allIncomeData.filter(i => {
-            try { return new Date(i.date) >= thisWeek.start && new Date(i.date) <= thisWeek.end; } 
-            catch { return false; }
-        });
-        
-        const weeklyExpenseData = allExpensesData.filter(e => {
-            try { return new Date(e.date) >= thisWeek.start && new Date(e.date) <= thisWeek.end; } 
-            catch { return false; }
-        });
-        
-        const monthlyIncomeData = allIncomeData.filter(i => {
-            try { return new Date(i.date).getMonth() === thisMonth && new Date(i.date).getFullYear() === thisYear; } 
-            catch { return false; }
-        });
-        
-        const monthlyExpenseData = allExpensesData.filter(e => {
-            try { return new Date(e.date).getMonth() === thisMonth && new Date(e.date).getFullYear() === thisYear; } 
-            catch { return false; }
-        });
-        
-        const yearlyIncomeData = allIncomeData.filter(i => {
-            try { return new Date(i.date).getFullYear() === thisYear; } 
-            catch { return false; }
-        });
-        
-        const yearlyExpenseData = allExpensesData.filter(e => {
-            try { return new Date(e.date).getFullYear() === thisYear; } 
-            catch { return false; }
-        });
-
-        // Calculate totals for display
-        const weeklyIncome = weeklyIncomeData.reduce((sum, i) => sum + (parseFloat(i.amount) || 0), 0);
-        const weeklyExpense = weeklyExpenseData.reduce((sum, e) => sum + (parseFloat(e.amount) || 0), 0);
-        const monthlyIncome = monthlyIncomeData.reduce((sum, i) => sum + (parseFloat(i.amount) || 0), 0);
-        const monthlyExpense = monthlyExpenseData.reduce((sum, e) => sum + (parseFloat(e.amount) || 0), 0);
-        const yearlyIncome = yearlyIncomeData.reduce((sum, i) => sum + (parseFloat(i.amount) || 0), 0);
-        const yearlyExpense = yearlyExpenseData.reduce((sum, e) => sum + (parseFloat(e.amount) || 0), 0);
-
-        // Update report cards
-        const updateReportCard = (id, value) => {
-            const element = document.getElementById(id);
-            if (element) {
-                element.textContent = formatCurrency(Number(value) || 0);
-                console.log(`Updated ${id} card:`, formatCurrency(Number(value) || 0));
-            }
-        };
-
-        // Update weekly report cards
-        updateReportCard('weeklyIncome', weeklyIncome);
-        updateReportCard('weeklyExpense', weeklyExpense);
-        updateReportCard('weeklyBalance', weeklyIncome - weeklyExpense);
-
-        // Update monthly report cards
-        updateReportCard('monthlyIncome', monthlyIncome);
-        updateReportCard('monthlyExpense', monthlyExpense);
-        updateReportCard('monthlyBalance', monthlyIncome - monthlyExpense);
-
-        // Update yearly report cards
-        updateReportCard('yearlyIncome', yearlyIncome);
-        updateReportCard('yearlyExpense', yearlyExpense);
-        updateReportCard('yearlyBalance', yearlyIncome - yearlyExpense);
-
-        // Update the dashboard
-        updateDashboard();
-        // Update report displays immediately
-        const weeklyIncomeEl = document.getElementById('weeklyIncome');
-        const weeklyExpenseEl = document.getElementById('weeklyExpense');
-        const weeklyBalanceEl = document.getElementById('weeklyBalance');
-        
-        if (weeklyIncomeEl) {
-            weeklyIncomeEl.textContent = formatCurrency(weeklyIncome);
-            console.log('Updated weekly income card:', formatCurrency(weeklyIncome));
-        }
-        if (weeklyExpenseEl) {
-            weeklyExpenseEl.textContent = formatCurrency(weeklyLocalExpense);
-            console.log('Updated weekly expense card:', formatCurrency(weeklyLocalExpense));
-        }
-        if (weeklyBalanceEl) {
-            weeklyBalanceEl.textContent = formatCurrency(weeklyIncome - weeklyLocalExpense);
-            console.log('Updated weekly balance card:', formatCurrency(weeklyIncome - weeklyLocalExpense));
-        }
-
-        const monthlyIncomeEl = document.getElementById('monthlyIncome');
-        const monthlyExpenseEl = document.getElementById('monthlyExpense');
-        const monthlyBalanceEl = document.getElementById('monthlyBalance');
-        
-        if (monthlyIncomeEl) {
-            monthlyIncomeEl.textContent = formatCurrency(monthlyIncome);
-            console.log('Updated monthly income card:', formatCurrency(monthlyIncome));
-        }
-        if (monthlyExpenseEl) {
-            monthlyExpenseEl.textContent = formatCurrency(monthlyExpense);
-            console.log('Updated monthly expense card:', formatCurrency(monthlyExpense));
-        }
-        if (monthlyBalanceEl) {
-            monthlyBalanceEl.textContent = formatCurrency(monthlyIncome - monthlyExpense);
-            console.log('Updated monthly balance card:', formatCurrency(monthlyIncome - monthlyExpense));
-        }
-
-        const yearlyIncomeEl = document.getElementById('yearlyIncome');
-        const yearlyExpenseEl = document.getElementById('yearlyExpense');
-        const yearlyBalanceEl = document.getElementById('yearlyBalance');
-        
-        if (yearlyIncomeEl) {
-            yearlyIncomeEl.textContent = formatCurrency(yearlyIncome);
-            console.log('Updated yearly income card:', formatCurrency(yearlyIncome));
-        }
-        if (yearlyExpenseEl) {
-            yearlyExpenseEl.textContent = formatCurrency(yearlyExpense);
-            console.log('Updated yearly expense card:', formatCurrency(yearlyExpense));
-        }
-        if (yearlyBalanceEl) {
-            yearlyBalanceEl.textContent = formatCurrency(yearlyIncome - yearlyExpense);
-            console.log('Updated yearly balance card:', formatCurrency(yearlyIncome - yearlyExpense));
-        }
-
-        // Update report tables with timeout to ensure DOM is ready
-        setTimeout(() => {
-            try {
-                updateReportTable('weeklyIncomeTable', weeklyIncomeData, 'income');
-                updateReportTable('weeklyExpenseTable', weeklyExpenseData, 'expense');
-                updateReportTable('monthlyIncomeTable', monthlyIncomeData, 'income');
-                updateReportTable('monthlyExpenseTable', monthlyExpenseData, 'expense');
-                updateReportTable('yearlyIncomeTable', yearlyIncomeData, 'income');
-                updateReportTable('yearlyExpenseTable', yearlyExpenseData, 'expense');
-                
-                // Update P&L Statement
-                updatePLStatement();
-            } catch (error) {
-                console.error('Error in report update:', error);
-            }
-        }, 100);
-    } catch (error) {
-        console.error('Error updating reports:', error);
+async function loadPeriodReport(period) {
+    // Totals are computed on the server; only the latest transactions are listed
+    const report = await fetch(`/api/reports/${period}`).then(r => r.json());
+    if (!report.success) {
+        throw new Error(report.message || `Failed to load ${period} report`);
     }
+    const totals = report.totals;
+    document.getElementById(`${period}Income`).textContent = formatCurrency(totals.local_income);
+    document.getElementById(`${period}Expense`).textContent = formatCurrency(totals.local_expenses);
+    document.getElementById(`${period}Balance`).textContent = formatCurrency(totals.balance);
+
+    const range = `start_date=${report.start_date}&end_date=${report.end_date}&limit=${REPORT_TABLE_ROWS}`;
+    const [income, expenses] = await Promise.all([
+        fetch(`/api/income?${range}`).then(r => r.json()),
+        fetch(`/api/expenses?type=all&${range}`).then(r => r.json())
+    ]);
+    updateReportTable(`${period}IncomeTable`, income.data || [], 'income');
+    updateReportTable(`${period}ExpenseTable`, expenses.data || [], 'expense');
+    return report;
 }
 
-function updateReportTable(tableId, data, type) {
-    const tbody = document.getElementById(tableId);
-    
-    console.log(`Updating ${tableId} with ${data.length} items`, data);
-    
-    if (!tbody) {
-        console.error(`Table element ${tableId} not found!`);
-        return;
-    }
-    
-    if (data.length === 0) {
-        const colSpan = type === 'income' ? '4' : '5';
-        tbody.innerHTML = `<tr><td colspan="${colSpan}" style="text-align: center; color: #666;">No ${type} transactions</td></tr>`;
-        console.log(`${tableId} set to empty state`);
-        return;
-    }
-    
-    // Sort by date (newest first) - handle null/undefined dates
-    data.sort((a, b) => {
-        const dateA = a.date ? new Date(a.date) : new Date(0);
-        const dateB = b.date ? new Date(b.date) : new Date(0);
-        return dateB - dateA;
-    });
-    
+async function updateReports() {
     try {
-        if (type === 'income') {
-            const html = data.map(item => {
-                const date = item.date || 'N/A';
-                const category = item.category || 'N/A';
-                const description = item.description || 'N/A';
-                const amount = item.amount || 0;
-                
-                return `
-                    <tr>
-                        <td>${formatDate(date)}</td>
-                        <td>${category}</td>
-                        <td>${description}</td>
-                        <td>${formatCurrency(amount)}</td>
-                    </tr>
-                `;
-            }).join('');
-            
-            tbody.innerHTML = html;
-            console.log(`${tableId} income HTML set:`, html.substring(0, 200) + '...');
-        } else {
-            const html = data.map(item => {
-                const date = item.date || 'N/A';
-                const category = item.category || 'N/A';
-                const description = item.description || 'N/A';
-                const amount = item.amount || 0;
-                const expenseType = item.expense_type || 'Local';
-                
-                return `
-                    <tr>
-                        <td>${formatDate(date)}</td>
-                        <td>${category}</td>
-                        <td>${description}</td>
-                        <td>${formatCurrency(amount)}</td>
-                        <td><span class="badge ${item.expense_type === 'district' ? 'badge-warning' : item.expense_type === 'national' ? 'badge-danger' : 'badge-secondary'}">${expenseType}</span></td>
-                    </tr>
-                `;
-            }).join('');
-            
-            tbody.innerHTML = html;
-            console.log(`${tableId} expense HTML set:`, html.substring(0, 200) + '...');
-        }
-        
-        console.log(`${tableId} updated successfully with ${data.length} rows`);
+        await Promise.all(['weekly', 'monthly', 'yearly'].map(loadPeriodReport));
+        updateDashboard();
+        updatePLStatement();
     } catch (error) {
-        console.error(`Error updating ${tableId}:`, error);
-        tbody.innerHTML = `<tr><td colspan="5" style="text-align: center; color: #ff0000;">Error loading ${type} data</td></tr>`;
+        console.error('Error updating reports:', error);
     }
 }
 
-function updatePLStatement() {
-    // Fetch fresh data from backend instead of using localStorage
-    Promise.all([
-        fetch('/api/income').then(r => r.json()),
-        fetch('/api/expenses').then(r => r.json()),
-        fetch('/api/district-expenses').then(r => r.json()),
-        fetch('/api/tithes').then(r => r.json()),
-        fetch('/api/offerings').then(r => r.json())
-    ]).then(([incomeData, expensesData, districtData, tithesData, offeringsData]) => {
-        console.log('=== P&L STATEMENT UPDATE ===');
-        console.log('P&L Income data:', incomeData);
-        console.log('P&L Tithes data:', tithesData);
-        console.log('P&L Offerings data:', offeringsData);
-        
-        // Calculate total income from all sources
-        let totalIncome = 0;
-        
-        // Add regular income entries (excluding duplicates)
-        incomeData.forEach(income => {
-            if (income.amount && income.amount > 0 && 
-                income.category !== '23% (of tithe and offering)' && 
-                income.category !== 'Tithe' && 
-                income.category !== 'Offering') {
-                totalIncome += parseFloat(income.amount);
-            }
-        });
-        
-        // Add tithes - calculate from weekly amounts if total is missing
-        tithesData.forEach(tithe => {
-            let titheTotal = tithe.total || 0;
-            if (titheTotal === 0) {
-                titheTotal = (tithe.week1 || 0) + (tithe.week2 || 0) + (tithe.week3 || 0) + (tithe.week4 || 0) + (tithe.week5 || 0);
-            }
-            if (titheTotal > 0) {
-                totalIncome += parseFloat(titheTotal);
-            }
-        });
-        
-        // Add offerings - calculate from weekly amounts if total is missing
-        offeringsData.forEach(offering => {
-            let offeringTotal = offering.total || 0;
-            if (offeringTotal === 0) {
-                offeringTotal = (offering.week1 || 0) + (offering.week2 || 0) + (offering.week3 || 0) + (offering.week4 || 0) + (offering.week5 || 0);
-            }
-            if (offeringTotal > 0) {
-                totalIncome += parseFloat(offeringTotal);
-            }
-        });
-        
-        console.log('P&L Total calculated income:', totalIncome);
-        
-        // Calculate expenses by type
-        const localExpenses = expensesData.filter(e => e.expense_type === 'other' || !e.expense_type).reduce((sum, e) => sum + (e.amount || 0), 0);
-        const manualDistrictExpenses = expensesData.filter(e => e.expense_type === 'district').reduce((sum, e) => sum + (e.amount || 0), 0);
-        const nationalExpenses = expensesData.filter(e => e.expense_type === 'national').reduce((sum, e) => sum + (e.amount || 0), 0);
-        const autoDistrictExpenses = districtData.reduce((sum, e) => sum + (e.districtAmount || 0), 0);
-        
-        const totalExpenses = localExpenses + nationalExpenses;
-        const netProfitLoss = totalIncome - totalExpenses;
-
-        // Update P&L display
-        document.getElementById('localIncome').textContent = formatCurrency(totalIncome);
-        document.getElementById('localIncomeBalance').textContent = formatCurrency(totalIncome);
-        document.getElementById('districtExpense').textContent = formatCurrency(0);
-        document.getElementById('districtExpenseBalance').textContent = formatCurrency(0);
-        document.getElementById('otherExpenseTotal').textContent = formatCurrency(localExpenses + nationalExpenses);
-        document.getElementById('otherExpenseBalance').textContent = formatCurrency(-(localExpenses + nationalExpenses));
-        document.getElementById('netProfitLoss').textContent = formatCurrency(netProfitLoss);
-        
-        console.log('P&L Statement updated - Income:', formatCurrency(totalIncome), 'Expenses:', formatCurrency(totalExpenses), 'Net:', formatCurrency(netProfitLoss));
-
-        // Color code the net profit/loss
-        const netElement = document.getElementById('netProfitLoss');
-        if (netProfitLoss >= 0) {
-            netElement.style.color = '#28a745';
-        } else {
-            netElement.style.color = '#dc3545';
-        }
-    }).catch(error => {
-        console.error('Error updating P&L:', error);
-    });
-}
-
 // Utility functions
 function getWeekRange(date) {
     const start = new Date(date);
@@ -2224,59 +1728,52 @@ async function loadData() {
 }
 
 // Export functions
-function exportData() {
-    showNotification('Preparing Excel export...', 'success');
-    
-    // Create a temporary link to trigger the download
-    const link = document.createElement('a');
-    link.href = '/api/export';
-    link.download = ''; // Filename will be set by the server
-    link.style.display = 'none';
-    
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
-    
-    // Show success message after a short delay
-    setTimeout(() => {
-        showNotification('Excel report downloaded successfully!', 'success');
-    }, 1000);
-}
+// Exports are built by a background job; poll its status, then download the file
+const EXPORT_POLL_INTERVAL = 1000;
 
-function exportPDF() {
-    showNotification('Preparing PDF export...', 'success');
+function runExportJob(url, label) {
+    showNotification(`Preparing ${label} export...`, 'success');
     
-    // Use fetch to handle the PDF download properly
-    fetch('/api/export-pdf')
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('PDF generation failed');
-            }
-            return response.blob();
-        })
-        .then(blob => {
-            // Create download link
-            const url = window.URL.createObjectURL(blob);
+    const checkJob = (job) => {
+        if (job.status === 'done') {
             const link = document.createElement('a');
-            link.href = url;
-            link.download = `Church_Report_${new Date().toISOString().split('T')[0]}.pdf`;
+            link.href = job.download_url;
+            link.download = job.filename || '';
             link.style.display = 'none';
             
             document.body.appendChild(link);
             link.click();
             document.body.removeChild(link);
             
-            // Clean up the URL object
-            window.URL.revokeObjectURL(url);
-            
-            showNotification('PDF report downloaded successfully!', 'success');
-        })
+            showNotification(`${label} report downloaded successfully!`, 'success');
+            return;
+        }
+        if (job.status !== 'running') {
+            throw new Error(job.message || `${label} export failed`);
+        }
+        return new Promise(resolve => setTimeout(resolve, EXPORT_POLL_INTERVAL))
+            .then(() => fetch(job.status_url))
+            .then(response => response.json())
+            .then(checkJob);
+    };
+    
+    fetch(url)
+        .then(response => response.json())
+        .then(checkJob)
         .catch(error => {
-            console.error('PDF export error:', error);
-            showNotification('PDF export failed. Please try again.', 'error');
+            console.error(`${label} export error:`, error);
+            showNotification(`${label} export failed. Please try again.`, 'error');
         });
 }
 
+function exportData() {
+    runExportJob('/api/export', 'Excel');
+}
+
+function exportPDF() {
+    runExportJob('/api/export-pdf', 'PDF');
+}
+
 // Report functions
 function showReport(type) {
     // Hide all reports
@@ -2299,109 +1796,13 @@ function showReport(type) {
 }
 
 function updateReportData(type) {
-    const now = new Date();
-    let startDate, endDate;
-    
-    switch(type) {
-        case 'weekly':
-            const startOfWeek = new Date(now);
-            startOfWeek.setDate(now.getDate() - now.getDay());
-            startDate = startOfWeek.toISOString().split('T')[0];
-            endDate = now.toISOString().split('T')[0];
-            updateWeeklyReport(startDate, endDate);
-            break;
-        case 'monthly':
-            startDate = new Date(now.getFullYear(), now.getMonth(), 1).toISOString().split('T')[0];
-            endDate = new Date(now.getFullYear(), now.getMonth() + 1, 0).toISOString().split('T')[0];
-            updateMonthlyReport(startDate, endDate);
-            break;
-        case 'yearly':
-            startDate = new Date(now.getFullYear(), 0, 1).toISOString().split('T')[0];
-            endDate = new Date(now.getFullYear(), 11, 31).toISOString().split('T')[0];
-            updateYearlyReport(startDate, endDate);
-            break;
-        case 'pl':
-            updatePLReport();
-            break;
+    if (type === 'pl') {
+        updatePLStatement();
+        return;
     }
-}
-
-function updateWeeklyReport(startDate, endDate) {
-    const weeklyIncome = currentData.income.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const weeklyExpenses = currentData.expenses.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const weeklyNationalExpenses = (currentData.nationalExpenses || []).filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    
-    const totalIncome = weeklyIncome.reduce((sum, item) => sum + (item.amount || 0), 0);
-    
-    const regularExpenses = weeklyExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const nationalExpenses = weeklyNationalExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const totalExpenses = regularExpenses + nationalExpenses;
-    
-    document.getElementById('weeklyIncome').textContent = formatCurrency(totalIncome);
-    document.getElementById('weeklyExpense').textContent = formatCurrency(totalExpenses);
-    document.getElementById('weeklyBalance').textContent = formatCurrency(totalIncome - totalExpenses);
-    
-    // Update transaction tables
-    updateReportTable('weeklyIncomeTable', weeklyIncome, 'income');
-    updateReportTable('weeklyExpenseTable', [...weeklyExpenses, ...weeklyNationalExpenses], 'expense');
-}
-
-function updateMonthlyReport(startDate, endDate) {
-    const monthlyIncome = currentData.income.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const monthlyExpenses = currentData.expenses.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const monthlyNationalExpenses = (currentData.nationalExpenses || []).filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    
-    const totalIncome = monthlyIncome.reduce((sum, item) => sum + (item.amount || 0), 0);
-    
-    const regularExpenses = monthlyExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const nationalExpenses = monthlyNationalExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const totalExpenses = regularExpenses + nationalExpenses;
-    
-    document.getElementById('monthlyIncome').textContent = formatCurrency(totalIncome);
-    document.getElementById('monthlyExpense').textContent = formatCurrency(totalExpenses);
-    document.getElementById('monthlyBalance').textContent = formatCurrency(totalIncome - totalExpenses);
-    
-    // Update transaction tables
-    updateReportTable('monthlyIncomeTable', monthlyIncome, 'income');
-    updateReportTable('monthlyExpenseTable', [...monthlyExpenses, ...monthlyNationalExpenses], 'expense');
-}
-
-function updateYearlyReport(startDate, endDate) {
-    const yearlyIncome = currentData.income.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const yearlyExpenses = currentData.expenses.filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    const yearlyNationalExpenses = (currentData.nationalExpenses || []).filter(item => 
-        item.date >= startDate && item.date <= endDate
-    );
-    
-    const totalIncome = yearlyIncome.reduce((sum, item) => sum + (item.amount || 0), 0);
-    
-    const regularExpenses = yearlyExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const nationalExpenses = yearlyNationalExpenses.reduce((sum, item) => sum + item.amount, 0);
-    const totalExpenses = regularExpenses + nationalExpenses;
-    
-    document.getElementById('yearlyIncome').textContent = formatCurrency(totalIncome);
-    document.getElementById('yearlyExpense').textContent = formatCurrency(totalExpenses);
-    document.getElementById('yearlyBalance').textContent = formatCurrency(totalIncome - totalExpenses);
-    
-    // Update transaction tables
-    updateReportTable('yearlyIncomeTable', yearlyIncome, 'income');
-    updateReportTable('yearlyExpenseTable', [...yearlyExpenses, ...yearlyNationalExpenses], 'expense');
+    loadPeriodReport(type).catch(error => {
+        console.error(`Error loading ${type} report:`, error);
+    });
 }
 
 function updateReportTable(tableId, data, type) {
@@ -2438,70 +1839,32 @@ function updateReportTable(tableId, data, type) {
 }
 
 function updatePLStatement() {
-    // Calculate revenue by category including tithes
-    const revenueByCategory = {};
-    const expensesByCategory = {};
-    let totalRevenue = 0;
-    
-    // Only show income amounts that are actually posted (23% for tithes, full amount for others)
-    currentData.income.forEach(item => {
-        if (revenueByCategory[item.category]) {
-            revenueByCategory[item.category] += (item.local_amount || item.amount);
-        } else {
-            revenueByCategory[item.category] = (item.local_amount || item.amount);
-        }
-        totalRevenue += (item.local_amount || item.amount);
-    });
-    
-    let totalExpenses = 0;
-    
-    // Regular expenses
-    currentData.expenses.forEach(item => {
-        if (expensesByCategory[item.category]) {
-            expensesByCategory[item.category] += item.amount;
-        } else {
-            expensesByCategory[item.category] = item.amount;
-        }
-        totalExpenses += item.amount;
-    });
-    
-    // District expenses removed from P&L calculations
-    
-    // National expenses
-    const nationalTotal = (currentData.nationalExpenses || []).reduce((sum, item) => sum + item.amount, 0);
-    if (nationalTotal > 0) {
-        expensesByCategory['National Expenses'] = nationalTotal;
-        totalExpenses += nationalTotal;
-    }
-    
-    // Populate revenue table
-    const revenueTable = document.getElementById('revenueTable');
-    revenueTable.innerHTML = Object.entries(revenueByCategory).map(([category, amount]) => `
-        <tr>
-            <td>${category}</td>
-            <td>${formatCurrency(amount)}</td>
-        </tr>
-    `).join('');
-    
-    // Populate expenses table
-    const expensesTable = document.getElementById('expensesTable');
-    expensesTable.innerHTML = Object.entries(expensesByCategory).map(([category, amount]) => `
-        <tr>
-            <td>${category}</td>
-            <td>${formatCurrency(amount)}</td>
-        </tr>
-    `).join('');
-    
-    // Update totals
-    document.getElementById('totalRevenue').textContent = formatCurrency(totalRevenue);
-    document.getElementById('totalExpenses').textContent = formatCurrency(totalExpenses);
-    
-    // Calculate and display net profit/loss
-    const netBalance = totalRevenue - totalExpenses;
-    const netElement = document.getElementById('netProfitLoss');
-    netElement.textContent = formatCurrency(Math.abs(netBalance));
-    netElement.style.color = netBalance >= 0 ? '#28a745' : '#dc3545';
-    
+    // Account totals are summed on the server from per-period balances
+    fetch('/api/reports/pl')
+        .then(r => r.json())
+        .then(report => {
+            if (!report.success) {
+                throw new Error(report.message || 'Failed to load P&L');
+            }
+            const rows = items => items.map(item => `
+                <tr>
+                    <td>${item.account}</td>
+                    <td>${formatCurrency(item.amount)}</td>
+                </tr>
+            `).join('');
+            document.getElementById('revenueTable').innerHTML = rows(report.revenue);
+            document.getElementById('expensesTable').innerHTML = rows(report.expenses);
+            document.getElementById('totalRevenue').textContent = formatCurrency(report.total_revenue);
+            document.getElementById('totalExpenses').textContent = formatCurrency(report.total_expenses);
+
+            const netElement = document.getElementById('netProfitLoss');
+            netElement.textContent = formatCurrency(Math.abs(report.net));
+            netElement.style.color = report.net >= 0 ? '#28a745' : '#dc3545';
+        })
+        .catch(error => {
+            console.error('Error updating P&L:', error);
+        });
+
     // Populate transaction details
     updatePLTransactionTables();
 }
@@ -2564,25 +1927,25 @@ function performYearReset() {
     })
     .then(response => {
         console.log('Response status:', response.status);
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
+        // Error responses carry a JSON message, e.g. when the year has not ended
         return response.json();
     })
     .then(data => {
         console.log('Year reset response:', data);
         if (data.success) {
-            showNotification('Year reset completed successfully!', 'success');
+            showNotification(data.message || 'Year reset completed successfully!', 'success');
             // Refresh data
             loadData();
             updateDashboard();
             updateRecentTransactions();
         } else {
             console.error('Year reset failed:', data.message);
+            showNotification(data.message || 'Year reset failed', 'error');
         }
     })
     .catch(error => {
         console.error('Year reset error:', error);
+        showNotification('Year reset failed. Please try again.', 'error');
     });
 }
 
@@ -0,0 +1,118 @@
+"""Full-text search over the ledgers' descriptions.
+
+Income, expenses, district expenses and inventory are indexed into one
+``ledger_search`` table by triggers (migration 17): an FTS5 virtual table
+on SQLite, a table with a GIN-indexed tsvector on PostgreSQL. Each entry
+has a title (category, source or item name), a body (the description;
+tithe income names the member in both) and the row's date. Its rowid
+encodes the ledger row as ``id * ROWID_STRIDE + source code``, so
+triggers delete it by key.
+
+Searches match every word of the query as a prefix, ranked best first
+(bm25 / ts_rank), and can be limited to a date range or one ledger.
+"""
+import re
+
+from money import to_cedis
+
+# Ledger -> (source code, title, body, date); expressions over the row alias {row}
+SOURCES = {
+    'income': (1, '{row}.category', "COALESCE({row}.description, '')", '{row}.date'),
+    'expenses': (2, '{row}.category', "COALESCE({row}.description, '')", '{row}.date'),
+    'district_expenses': (3, '{row}.source', "COALESCE({row}.description, '')", '{row}.date'),
+    'inventory': (4, '{row}.item_name', "COALESCE({row}.category, '') || ' ' || COALESCE({row}.condition, '')",
+                  '{row}.date_added'),
+}
+ROWID_STRIDE = 8
+BY_CODE = {code: source for source, (code, *_) in SOURCES.items()}
+
+# Amount column shown with each hit (inventory has a quantity instead)
+AMOUNTS = {'income': 'amount', 'expenses': 'amount', 'district_expenses': 'district_amount'}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def entry_values(source, row):
+    """SQL expressions (rowid, title, body, day) indexing one row of source."""
+    code, title, body, day = SOURCES[source]
+    return (f'{row}.id * {ROWID_STRIDE} + {code}', title.format(row=row), body.format(row=row),
+            day.format(row=row))
+
+
+def terms(query):
+    return _WORD.findall(str(query or '').lower())
+
+
+def _match(words, dialect):
+    # Each word is quoted, so nothing the user types is read as query syntax
+    if dialect == 'postgres':
+        return ' & '.join(f"'{word}':*" for word in words)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search(cursor, query, start_date=None, end_date=None, source=None, limit=DEFAULT_LIMIT, offset=0):
+    """Return (hits, whether more follow) for a page of ranked matches."""
+    words = terms(query)
+    if not words:
+        raise ValueError('q must contain a word to search for')
+    if source is not None and source not in SOURCES:
+        raise ValueError(f'source must be one of {", ".join(SOURCES)}')
+
+    filters, params = [], [_match(words, cursor.dialect)]
+    if start_date:
+        filters.append('day >= ?')
+        params.append(start_date)
+    if end_date:
+        filters.append('day <= ?')
+        params.append(end_date)
+    if source:
+        filters.append(f'rid % {ROWID_STRIDE} = ?' if cursor.dialect == 'postgres'
+                       else f'rowid % {ROWID_STRIDE} = ?')
+        params.append(SOURCES[source][0])
+    extra = ''.join(f' AND {condition}' for condition in filters)
+
+    if cursor.dialect == 'postgres':
+        cursor.execute(f'''
+            SELECT rid, title, body, day,
+                   ts_headline('simple', body, query, 'StartSel=[, StopSel=], MaxWords=12, MinWords=4') AS snippet
+            FROM ledger_search, to_tsquery('simple', ?) AS query
+            WHERE document @@ query{extra}
+            ORDER BY ts_rank(document, query) DESC, rid DESC
+            LIMIT ? OFFSET ?
+        ''', params + [limit + 1, offset])
+    else:
+        cursor.execute(f'''
+            SELECT rowid AS rid, title, body, day,
+                   snippet(ledger_search, 1, '[', ']', '...', 12) AS snippet
+            FROM ledger_search
+            WHERE ledger_search MATCH ?{extra}
+            ORDER BY rank, rowid DESC
+            LIMIT ? OFFSET ?
+        ''', params + [limit + 1, offset])
+    rows = cursor.fetchall()
+
+    hits = [{
+        'source': BY_CODE[row['rid'] % ROWID_STRIDE],
+        'id': row['rid'] // ROWID_STRIDE,
+        'date': row['day'],
+        'title': row['title'],
+        'description': row['body'].strip(),
+        'snippet': row['snippet'],
+    } for row in rows[:limit]]
+    _add_amounts(cursor, hits)
+    return hits, len(rows) > limit
+
+
+def _add_amounts(cursor, hits):
+    """Fill in each hit's amount in cedis with one primary-key lookup per ledger."""
+    for source, column in AMOUNTS.items():
+        ids = [hit['id'] for hit in hits if hit['source'] == source]
+        if not ids:
+            continue
+        cursor.execute(f'SELECT id, {column} FROM {source} WHERE id IN ({", ".join("?" * len(ids))})', ids)
+        amounts = {row['id']: to_cedis(row[column]) for row in cursor.fetchall()}
+        for hit in hits:
+            if hit['source'] == source:
+                hit['amount'] = amounts.get(hit['id'])
@@ -0,0 +1,136 @@
+"""Yearly giving statements, one PDF per member, delivered as a ZIP.
+
+Every member's tithes for the period come from one grouped query over the
+income they were posted as (income.member_ref), by member and month. The
+PDFs are rendered in chunks across a process pool, since reportlab layout
+is CPU-bound, and written into the archive in member order as each chunk
+comes back. Offerings are recorded as a congregation total, not per member,
+so they do not appear on a member's statement.
+
+    python statements.py 2025     # financial year 2025/26 -> reports/
+"""
+import io
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import partial
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+import pdf_report
+from money import to_cedis
+
+REPORTS_DIR = os.getenv('REPORTS_DIR', 'reports')
+WORKERS = int(os.getenv('STATEMENT_WORKERS', os.cpu_count() or 1))
+# Statements per pool task; large enough that pickling and scheduling are noise
+CHUNK_SIZE = 50
+
+
+def member_statements(cursor, start, end):
+    """Return each member's tithes for start..end, by month, ordered by name."""
+    cursor.execute('''
+        SELECT members.id, members.name, members.code, SUBSTR(income.date, 1, 7) AS month,
+               COUNT(*) AS entries, SUM(income.amount) AS amount
+        FROM income JOIN members ON members.id = income.member_ref
+        WHERE income.date >= ? AND income.date <= ?
+        GROUP BY members.id, members.name, members.code, members.name_key, SUBSTR(income.date, 1, 7)
+        ORDER BY members.name_key, members.id, month
+    ''', (start.isoformat(), end.isoformat()))
+    statements = []
+    for row in cursor.fetchall():
+        if not statements or statements[-1]['id'] != row['id']:
+            statements.append({'id': row['id'], 'name': row['name'], 'code': row['code'], 'months': [], 'total': 0})
+        statement = statements[-1]
+        statement['months'].append((row['month'], row['entries'], row['amount']))
+        statement['total'] += row['amount']
+    return statements
+
+
+def filename(statement):
+    name = f"{statement['code'] or statement['id']}_{statement['name']}"
+    return re.sub(r'[^\w-]+', '_', name).strip('_') + '.pdf'
+
+
+def render(statement, start, end, label):
+    """Return one member's statement as PDF bytes."""
+    style = pdf_report.styles()
+    rows = [[date.fromisoformat(f'{month}-01').strftime('%B %Y'), str(entries), f'{to_cedis(amount):,.2f}']
+            for month, entries, amount in statement['months']]
+    member = statement['name'] + (f" (Member No. {statement['code']})" if statement['code'] else '')
+    story = [
+        Paragraph(pdf_report.CHURCH_NAME, style['title']),
+        Paragraph(f'Giving Statement - {label} ({start.isoformat()} to {end.isoformat()})', style['subtitle']),
+        Paragraph(member, style['heading']),
+        Table([['Month', 'Payments', f'Tithes ({pdf_report.CURRENCY})']] + rows +
+              [['Total', '', f"{to_cedis(statement['total']):,.2f}"]],
+              colWidths=[2.5 * inch, 1 * inch, 1.8 * inch], style=style['summary']),
+        Spacer(1, 18),
+        Paragraph('Thank you for your faithful giving.', style['subtitle']),
+    ]
+    output = io.BytesIO()
+    SimpleDocTemplate(output, pagesize=A4, title=f"Giving Statement - {statement['name']}").build(story)
+    return output.getvalue()
+
+
+def render_chunk(statements, start, end, label):
+    """Render a run of statements; runs in a pool worker."""
+    return [(filename(statement), render(statement, start, end, label)) for statement in statements]
+
+
+def _rendered(chunks, start, end, label):
+    """Yield each chunk's rendered files in order, across a pool when it helps."""
+    if WORKERS <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield render_chunk(chunk, start, end, label)
+        return
+    # spawn, not fork, as for export jobs: the caller may hold threads and connections
+    with ProcessPoolExecutor(max_workers=min(WORKERS, len(chunks)),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield from pool.map(partial(render_chunk, start=start, end=end, label=label), chunks)
+
+
+def build_statements(conn, output, start, end, label, progress=None):
+    """Write a ZIP of every member's statement for start..end to output; return the member count.
+
+    progress, if given, is called with (statements done, total) as they are written.
+    """
+    statements = member_statements(conn.cursor(), start, end)
+    chunks = [statements[i:i + CHUNK_SIZE] for i in range(0, len(statements), CHUNK_SIZE)]
+    done = 0
+    if progress:
+        progress(done, len(statements))
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for files in _rendered(chunks, start, end, label):
+            for name, pdf in files:
+                archive.writestr(name, pdf)
+            done += len(files)
+            if progress:
+                progress(done, len(statements))
+    return len(statements)
+
+
+if __name__ == '__main__':
+    import ledger
+    from db import connect
+
+    if len(sys.argv) != 2:
+        print('Usage: python statements.py <fiscal year>|<YYYY-MM>')
+        sys.exit(2)
+    start, end, label = ledger.period_bounds(sys.argv[1])
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, f'statements_{start.isoformat()}_{end.isoformat()}.zip')
+    started = time.perf_counter()
+    conn = connect()
+    try:
+        count = build_statements(conn, path, start, end, label,
+                                 lambda done, total: print(f'\r{done}/{total} statements', end='', flush=True))
+    finally:
+        conn.close()
+    print(f'\nWrote {count} statements to {path} in {time.perf_counter() - started:.1f}s')
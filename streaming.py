@@ -0,0 +1,65 @@
+"""Streamed NDJSON and CSV bodies for the ledger list endpoints.
+
+Rows are pulled from the database cursor in fixed-size batches and written
+out as they arrive, so a worker's memory stays flat however many rows a
+request matches.
+"""
+import csv
+import json
+
+BATCH_SIZE = 1000
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def iter_rows(cursor, batch_size=BATCH_SIZE):
+    """Yield the rows of an executed cursor, fetching batch_size at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _batched(lines, batch_size=BATCH_SIZE):
+    # One write per batch keeps the per-row overhead of the WSGI server low
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, default=str) + '\n'
+
+
+class _Line:
+    """File-like target that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Line())
+    fields = None
+    for record in records:
+        if fields is None:
+            fields = list(record)
+            yield writer.writerow(fields)
+        yield writer.writerow([record.get(field) for field in fields])
+
+
+def encode(records, fmt):
+    """Return a generator of body chunks for records in the given format."""
+    lines = ndjson_lines(records) if fmt == 'ndjson' else csv_lines(records)
+    return _batched(lines)
+
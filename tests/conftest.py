@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db reads SQLITE_PATH when it is imported, and importing app opens the
+# database, so point both at a scratch file before any test imports them
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='fms-tests-'), 'session.db')
+os.environ.pop('DATABASE_URL', None)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """An empty SQLite database used by every connection the test opens."""
+    import db
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'test.db'))
+    # Pooled connections still point at the previous test's database
+    monkeypatch.setattr(db, '_pool', None)
+    return tmp_path / 'test.db'
+
+
+@pytest.fixture
+def migrated(database):
+    import migrations
+    migrations.migrate(verbose=False)
+    return database
@@ -0,0 +1,140 @@
+"""Closing and reopening a fiscal year."""
+import sqlite3
+
+import pytest
+
+import archive
+import db
+import posting
+
+
+@pytest.fixture
+def archives(migrated, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archives'))
+    monkeypatch.setattr(archive, '_snapshots', {})
+    return tmp_path / 'archives'
+
+
+def post_grid_weeks():
+    conn = db.connect()
+    cursor = conn.cursor()
+    posting.post(cursor, [
+        # December 2024, entered in January: FY2024 although recorded in the next year
+        posting.tithe(cursor, 'Kofi', 'M1', 12, 4, 500, '2025-01-02'),
+        posting.tithe(cursor, 'Kofi', 'M1', 3, 1, 700, '2025-03-02'),
+        posting.offering(cursor, 12, 4, 900, '2025-01-02'),
+        # April 2025 starts FY2025
+        posting.tithe(cursor, 'Kofi', 'M1', 4, 1, 300, '2025-04-06'),
+        posting.offering(cursor, 4, 1, 400, '2025-04-06'),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def periods(conn, table):
+    return [tuple(row) for row in conn.execute(f'SELECT year, month, total FROM {table} ORDER BY year, month')]
+
+
+def test_grid_rows_are_closed_with_the_year_their_month_falls_in(archives):
+    post_grid_weeks()
+
+    closing = archive.close_year(2024)
+
+    assert closing['rows_moved']['tithes'] == 2
+    assert closing['rows_moved']['offerings'] == 1
+    conn = db.connect()
+    assert periods(conn, 'tithes') == [(2025, 4, 300)]
+    assert periods(conn, 'offerings') == [(2025, 4, 400)]
+    conn.close()
+    closed = sqlite3.connect(archive.archive_path(2024))
+    assert periods(closed, 'tithes') == [(2024, 12, 500), (2025, 3, 700)]
+    assert periods(closed, 'offerings') == [(2024, 12, 900)]
+    closed.close()
+
+
+def test_reopening_restores_grid_rows(archives):
+    post_grid_weeks()
+    archive.close_year(2024)
+
+    archive.reopen_year(2024)
+
+    conn = db.connect()
+    assert periods(conn, 'tithes') == [(2024, 12, 500), (2025, 3, 700), (2025, 4, 300)]
+    assert periods(conn, 'offerings') == [(2024, 12, 900), (2025, 4, 400)]
+    conn.close()
+
+
+@pytest.mark.parametrize('close_again', [False, True])
+def test_reopening_merges_weeks_entered_after_the_close(archives, close_again):
+    post_grid_weeks()
+    archive.close_year(2024)
+    conn = db.connect()
+    cursor = conn.cursor()
+    posting.post(cursor, [
+        # Late entries for December 2024, one of them for a week already archived
+        posting.tithe(cursor, 'Kofi', 'M1', 12, 1, 200, '2025-06-01', 2024),
+        posting.offering(cursor, 12, 4, 100, '2025-06-01', 2024),
+    ])
+    conn.commit()
+    conn.close()
+    if close_again:
+        # Sweeps the late rows into the archive beside the ones already there
+        archive.close_year(2024)
+
+    archive.reopen_year(2024)
+
+    conn = db.connect()
+    tithes = conn.execute('SELECT id, week1, week4, total FROM tithes WHERE year = 2024').fetchall()
+    assert [tuple(row)[1:] for row in tithes] == [(200, 500, 700)]
+    assert periods(conn, 'offerings') == [(2024, 12, 1000), (2025, 4, 400)]
+    # Both weeks' income follows the surviving row
+    assert [row[0] for row in conn.execute('''
+        SELECT DISTINCT tithe_id FROM income WHERE description LIKE '%December%'
+    ''')] == [tithes[0]['id']]
+    conn.close()
+
+
+def test_reopening_an_archive_from_before_grid_years(archives):
+    post_grid_weeks()
+    archive.close_year(2024)
+    closed = sqlite3.connect(archive.archive_path(2024))
+    closed.execute('UPDATE tithes SET year = NULL, member_ref = NULL')
+    closed.execute('UPDATE offerings SET year = NULL')
+    closed.commit()
+    closed.close()
+
+    archive.reopen_year(2024)
+
+    conn = db.connect()
+    assert periods(conn, 'tithes') == [(2024, 12, 500), (2025, 3, 700), (2025, 4, 300)]
+    assert conn.execute('SELECT COUNT(DISTINCT member_ref) FROM tithes').fetchone()[0] == 1
+    conn.close()
+
+
+def trial_balance(last=None):
+    import ledger
+    conn = db.connect()
+    try:
+        report = ledger.trial_balance(conn.cursor(), last)
+    finally:
+        conn.close()
+    return report
+
+
+def test_trial_balance_brings_closed_years_forward(archives):
+    post_grid_weeks()
+    before = trial_balance()
+
+    archive.close_year(2024)
+
+    after = trial_balance()
+    assert after['balanced']
+    assert (after['total_debit'], after['total_credit']) == (before['total_debit'], before['total_credit'])
+    assert [(row['account'], row['debit'], row['credit']) for row in after['accounts']] == [
+        (row['account'], row['debit'], row['credit']) for row in before['accounts']]
+    kept = {row['account']: row for row in after['accounts']}['Local Tithe Income']
+    # 77% of the FY2024 tithes went to the district; the rest is brought forward
+    assert kept['brought_forward'] == 2.76
+    # As of the end of the closed year, only that year counts
+    assert trial_balance('2025-03')['total_debit'] == trial_balance('2025-03')['total_credit'] > 0
+    assert trial_balance('2025-02')['accounts'] == []
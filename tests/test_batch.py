@@ -0,0 +1,110 @@
+"""Posting arrays of records to the income, expense and inventory routes."""
+import sqlite3
+
+import pytest
+
+import batch
+import db
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def count(table):
+    conn = db.connect()
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+EXPENSES = [
+    {'category': 'Power', 'description': 'May bill', 'amount': 120, 'date': '2025-05-02'},
+    {'category': '', 'description': 'No category', 'amount': 10, 'date': '2025-05-02'},
+    {'category': 'Water', 'amount': 35.5, 'date': '2025-05-03'},
+    'not an object',
+]
+
+
+def test_one_invalid_item_rejects_an_atomic_batch(client):
+    response = client.post('/api/expenses', json=EXPENSES)
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['ids'] == [None] * 4
+    assert body['errors'] == [{'index': 1, 'message': 'category is required'},
+                              {'index': 3, 'message': 'Each item must be an object'}]
+    assert count('expenses') == count('accounting_entries') == 0
+
+
+def test_partial_batches_save_the_valid_items(client):
+    response = client.post('/api/expenses?mode=partial', json=EXPENSES)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] is False
+    assert body['message'] == 'Saved 2 of 4 items; 2 invalid'
+    saved = [new_id for new_id in body['ids'] if new_id is not None]
+    assert [index for index, new_id in enumerate(body['ids']) if new_id] == [0, 2]
+    rows = client.get('/api/expenses').get_json()
+    assert sorted((row['id'], row['amount']) for row in rows) == list(zip(saved, [120, 35.5]))
+    # Each expense debits its account and credits cash
+    assert count('accounting_entries') == 4
+
+
+def test_income_batches_post_through_the_ledger(client):
+    response = client.post('/api/income', json=[
+        {'category': 'Tithe', 'description': 'Envelope', 'amount': 100, 'is_tithe': True, 'date': '2025-05-04'},
+        {'category': 'Donation', 'description': 'Harvest', 'amount': 50, 'date': '2025-05-04'},
+    ])
+
+    assert response.get_json()['success'] is True
+    rows = {row['description']: row for row in client.get('/api/income').get_json()['data']}
+    assert (rows['Envelope']['district_amount'], rows['Envelope']['local_amount']) == (77, 23)
+    assert (rows['Harvest']['district_amount'], rows['Harvest']['local_amount']) == (0, 50)
+
+
+def test_inventory_batches_return_ids_in_request_order(client):
+    items = [{'itemName': name, 'category': 'Chairs', 'quantity': quantity, 'condition': 'Good'}
+             for name, quantity in (('Plastic chair', 40), ('Bench', 6))]
+
+    body = client.post('/api/inventory', json=items).get_json()
+
+    rows = {row['id']: row['itemName'] for row in client.get('/api/inventory').get_json()}
+    assert [rows[new_id] for new_id in body['ids']] == ['Plastic chair', 'Bench']
+
+
+@pytest.mark.parametrize('query, items, message', [
+    ('', [], 'Send at least one item'),
+    ('?mode=some', [{}], 'mode must be atomic or partial'),
+])
+def test_malformed_batches_are_rejected(client, query, items, message):
+    response = client.post(f'/api/expenses{query}', json=items)
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == message
+
+
+def test_oversized_batches_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(batch, 'MAX_ITEMS', 2)
+
+    response = client.post('/api/expenses', json=EXPENSES[:3])
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Send at most 2 items per request'
+
+
+def test_a_failed_write_saves_nothing(migrated):
+    conn = db.connect()
+
+    def write(cursor, rows):
+        cursor.execute("INSERT INTO inventory (item_name, category, quantity, condition) VALUES ('x', 'y', 1, 'z')")
+        raise sqlite3.IntegrityError('constraint failed')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        batch.run(conn, [{'n': 1}], lambda item: item, write)
+    conn.close()
+    assert count('inventory') == 0
@@ -0,0 +1,32 @@
+"""Choosing the database backend from the environment."""
+import os
+import subprocess
+import sys
+
+import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_database_url_set_after_import_connects_to_postgres(monkeypatch):
+    import psycopg2
+    opened = []
+    monkeypatch.setattr(psycopg2, 'connect', lambda url, **kwargs: opened.append(url) or object())
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://church@localhost/church')
+
+    conn = db.connect()
+
+    assert conn.dialect == 'postgres'
+    assert opened == ['postgresql://church@localhost/church']
+
+
+def test_database_url_from_dotenv_is_seen_on_import(tmp_path):
+    (tmp_path / '.env').write_text('DATABASE_URL=postgresql://church@localhost/church\n')
+    env = {key: value for key, value in os.environ.items() if key != 'DATABASE_URL'}
+    env['PYTHONPATH'] = ROOT
+    # Run from the .env's directory, as the desktop build and `python -c` look there
+    result = subprocess.run(
+        [sys.executable, '-c', 'import db, psycopg2; print(db.is_postgres(), psycopg2.Error in db.DatabaseError)'],
+        cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.stdout.split() == ['True', 'True'], result.stderr
@@ -0,0 +1,98 @@
+"""Recording a week of the tithes and offerings grids through the API."""
+import json
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def table_count(table):
+    conn = db.connect()
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('body', [
+    {'week': 1, 'amount': 10},
+    {'month': 'May', 'week': 1, 'amount': 10},
+    {'month': 13, 'week': 1, 'amount': 10},
+    {'month': 5, 'week': 6, 'amount': 10},
+    {'month': 5, 'week': 0, 'amount': 10},
+    {'month': 5, 'week': 1, 'amount': -10},
+    {'month': 5, 'week': 1, 'amount': 'ten'},
+    {'month': 5, 'week': 1},
+    {'month': 5, 'week': 1, 'amount': 10, 'year': 'last'},
+    [5, 1, 10],
+])
+def test_invalid_offerings_are_rejected(client, body):
+    response = client.post('/api/offerings', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert table_count('offerings') == table_count('income') == 0
+
+
+def test_offering_is_recorded_in_its_grid_year(client):
+    response = client.post('/api/offerings', json={'month': 5, 'week': 2, 'amount': '12.50', 'year': 2025})
+
+    assert response.get_json()['success'] is True
+    # Without limit or cursor the list is returned bare
+    rows = client.get('/api/offerings?year=2025').get_json()
+    assert [(row['year'], row['month'], row['week2']) for row in rows] == [(2025, 5, 12.5)]
+    assert client.get('/api/offerings?year=2024').get_json() == []
+
+
+@pytest.mark.parametrize('body', [
+    {'memberName': 'Ama', 'month': 0, 'week': 1, 'amount': 10},
+    {'memberName': 'Ama', 'month': 5, 'week': 9, 'amount': 10},
+    {'memberName': 'Ama', 'month': 5, 'week': 1, 'amount': 0},
+])
+def test_invalid_tithes_are_rejected(client, body):
+    response = client.post('/api/tithes', json=body)
+
+    assert response.status_code == 400
+    assert table_count('tithes') == 0
+
+
+@pytest.mark.parametrize('body', [
+    {'memberName': None, 'month': 5, 'week': 1, 'amount': 10},
+    {'memberName': 'Ama', 'memberId': None, 'month': 5, 'week': 1, 'amount': 'ten'},
+    {'memberRef': 'first', 'month': 5, 'week': 1, 'amount': 10},
+    ['Ama', 5, 1, 10],
+    'Ama',
+    None,
+])
+def test_malformed_tithe_bodies_are_rejected(client, body):
+    response = client.post('/api/tithes', data=json.dumps(body), content_type='application/json')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_a_failed_tithe_leg_rolls_back_the_whole_tithe(client, monkeypatch):
+    import sqlite3
+    import posting
+    post, failures = posting.post, [sqlite3.OperationalError('disk I/O error')]
+
+    def post_then_fail_once(cursor, items):
+        post(cursor, items)
+        if failures:
+            raise failures.pop()
+
+    monkeypatch.setattr(posting, 'post', post_then_fail_once)
+    body = {'memberName': 'Ama', 'month': 5, 'week': 1, 'amount': 10}
+    response = client.post('/api/tithes', json=body)
+
+    assert response.status_code == 500
+    assert table_count('tithes') == table_count('income') == table_count('accounting_entries') == 0
+    # The connection is left clean for the next request
+    assert client.post('/api/tithes', json=body).get_json()['success'] is True
+    assert table_count('tithes') == 1
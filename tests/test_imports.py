@@ -0,0 +1,120 @@
+"""Importing tithes and offerings from uploaded spreadsheets."""
+import io
+import sqlite3
+
+import pytest
+
+import db
+import imports
+import posting
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def upload(client, kind, body, filename):
+    data = {'file': (io.BytesIO(body), filename)}
+    response = client.post(f'/api/import/{kind}', data=data, content_type='multipart/form-data')
+    return response.status_code, response.get_json()
+
+
+def grid(table):
+    conn = db.connect()
+    try:
+        return [tuple(row) for row in conn.execute(f'''
+            SELECT member_name, year, month, week1, week2, week3, total FROM {table} ORDER BY member_name, month
+        ''')]
+    finally:
+        conn.close()
+
+
+def test_csv_rows_are_validated_and_reported_by_row_number(client):
+    body = (b'Harvest tithes,,,,\n'
+            b'\n'
+            b'Member,Member ID,Month,Week,Amount,Year\n'
+            b'Ama Mensah,M1,May,1,10.50,2025\n'
+            b',M2,5,1,10,2025\n'
+            b'Kofi,,13,1,10,2025\n'
+            b'Kofi,,5,6,10,2025\n'
+            b'Kofi,,5,2,-1,2025\n'
+            b'Kofi,,5,2,4,2025\n')
+
+    status, summary = upload(client, 'tithes', body, 'tithes.csv')
+
+    assert status == 200
+    assert (summary['success'], summary['rows'], summary['imported'], summary['failed']) == (False, 6, 2, 4)
+    # Numbered as in the file, counting the title and blank rows
+    assert [(error['row'], error['message']) for error in summary['errors']] == [
+        (5, 'Member name is required'),
+        (6, 'Invalid month'),
+        (7, 'Invalid week (must be 1-5)'),
+        (8, 'Amount must be greater than zero'),
+    ]
+    assert grid('tithes') == [('Ama Mensah', 2025, 5, 1050, None, None, 1050), ('Kofi', 2025, 5, None, 400, None, 400)]
+
+
+def test_an_exported_workbook_imports_whole_months():
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.active.title = 'Income'
+    sheet = workbook.create_sheet('Offerings')
+    sheet.append(['ID', 'Member', 'Year', 'Month', 'Week 1', 'Week 2', 'Week 3', 'Week 4', 'Week 5', 'Total'])
+    sheet.append([7, 'General Offering', 2025, 6, 100, None, 50.25, None, None, 150.25])
+    stream = io.BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+
+    rows = list(imports.read_rows(stream, 'export.xlsx', 'Offerings'))
+
+    assert rows == [(2, {'member_name': 'General Offering', 'year': 2025, 'month': 6, 'week1': 100, 'week2': None,
+                         'week3': 50.25, 'week4': None, 'week5': None})]
+    assert imports.parse_offering(rows[0][1]) == [
+        (posting.offering, (6, 1, 10000, imports._day(None), 2025)),
+        (posting.offering, (6, 3, 5025, imports._day(None), 2025)),
+    ]
+
+
+def test_whole_months_import_through_the_route(client):
+    body = b'Month,Year,Week 1,Week 2,Week 3\n6,2025,100,,50.25\n'
+
+    status, summary = upload(client, 'offerings', body, 'offerings.csv')
+
+    assert (status, summary['imported']) == (200, 2)
+    assert grid('offerings') == [('General Offering', 2025, 6, 10000, None, 5025, 15025)]
+
+
+def test_earlier_chunks_stay_committed_when_a_later_one_fails(client, monkeypatch):
+    monkeypatch.setattr(imports, 'IMPORT_CHUNK', 2)
+    post, calls = posting.post, []
+
+    def fail_second_chunk(cursor, items):
+        calls.append(len(items))
+        if len(calls) == 2:
+            raise sqlite3.OperationalError('database is locked')
+        post(cursor, items)
+
+    monkeypatch.setattr(posting, 'post', fail_second_chunk)
+    body = b'Month,Week,Amount,Year\n' + b''.join(b'5,%d,10,2025\n' % week for week in range(1, 5))
+
+    status, summary = upload(client, 'offerings', body, 'offerings.csv')
+
+    assert status == 500
+    assert summary['imported'] == 2
+    assert summary['error'].startswith('Database error after 2 contributions')
+    assert grid('offerings') == [('General Offering', 2025, 5, 1000, 1000, None, 2000)]
+
+
+@pytest.mark.parametrize('body, filename, message', [
+    (b'just,some,words\n1,2,3\n', 'tithes.csv', 'No header row found'),
+    (b'Member,Month\n', 'tithes.txt', 'Upload an .xlsx or .csv file'),
+    (b'not a zip file', 'tithes.xlsx', 'Could not read the workbook'),
+])
+def test_unreadable_uploads_are_rejected(client, body, filename, message):
+    status, summary = upload(client, 'tithes', body, filename)
+
+    assert status == 400
+    assert summary['message'].startswith(message)
+    assert grid('tithes') == []
@@ -0,0 +1,44 @@
+"""Queueing export jobs when the executor cannot take them."""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def client(migrated, tmp_path, monkeypatch):
+    from app import app
+    monkeypatch.setattr(jobs, 'EXPORTS_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(jobs, 'EXECUTOR', 'thread')
+    # A pool that refuses new work, as a process pool does once a worker has died
+    broken = ThreadPoolExecutor(max_workers=1)
+    broken.shutdown()
+    monkeypatch.setattr(jobs, '_executor', broken)
+    monkeypatch.setattr(jobs, '_executor_pid', os.getpid())
+    return app.test_client()
+
+
+def test_a_job_the_executor_refuses_is_not_left_queued(client):
+    response = client.get('/api/export')
+
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
+    assert os.listdir(jobs.EXPORTS_DIR) == []
+    assert jobs._executor is None
+
+
+def test_the_next_job_starts_a_new_executor(client):
+    client.get('/api/export')
+
+    response = client.get('/api/export')
+
+    assert response.status_code in (200, 202)
+    job = response.get_json()['job_id']
+    for _ in range(100):
+        if jobs.status(job)['status'] != 'running':
+            break
+        time.sleep(0.05)
+    assert jobs.status(job)['status'] == 'done'
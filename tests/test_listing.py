@@ -0,0 +1,91 @@
+"""Keyset pages, filters and streaming on the list endpoints."""
+import pytest
+
+import db
+import posting
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def post_offerings(*periods):
+    conn = db.connect()
+    cursor = conn.cursor()
+    posting.post(cursor, [posting.offering(cursor, month, 1, 100, f'{year}-{month:02d}-01', year)
+                          for year, month in periods])
+    conn.commit()
+    conn.close()
+
+
+def post_expenses(client, *rows):
+    for category, amount, day in rows:
+        response = client.post('/api/expenses', json={'category': category, 'description': f'{category} bill',
+                                                      'amount': amount, 'date': day})
+        assert response.get_json()['success'] is True
+
+
+def walk(client, url):
+    """Follow next_cursor from the first page to the last; return every row."""
+    rows, cursor = [], None
+    while True:
+        page = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        rows.extend(page['data'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+def test_pages_cover_every_row_once_newest_first(client):
+    post_expenses(client, ('Power', 10, '2025-05-01'), ('Water', 20, '2025-05-03'), ('Power', 30, '2025-05-03'),
+                  ('Rent', 40, '2025-04-20'), ('Water', 50, '2025-05-10'))
+
+    first = client.get('/api/expenses?limit=2').get_json()
+    rows = walk(client, '/api/expenses?limit=2')
+
+    # Rows on the same day run newest id first
+    assert [(row['date'], row['amount']) for row in rows] == [
+        ('2025-05-10', 50), ('2025-05-03', 30), ('2025-05-03', 20), ('2025-05-01', 10), ('2025-04-20', 40)]
+    # Totals and count cover every matching row, not just the page
+    assert (len(first['data']), first['count'], first['totals']) == (2, 5, {'total_amount': 150})
+
+
+def test_filters_narrow_the_rows_and_their_totals(client):
+    post_expenses(client, ('Power', 10, '2025-05-01'), ('Water', 20, '2025-05-03'), ('Power', 30, '2025-06-03'))
+
+    page = client.get('/api/expenses?limit=10&category=Power&start_date=2025-05-01&end_date=2025-05-31').get_json()
+
+    assert [row['amount'] for row in page['data']] == [10]
+    assert (page['count'], page['totals'], page['next_cursor']) == (1, {'total_amount': 10}, None)
+
+
+def test_without_limit_or_cursor_the_full_list_is_returned(client):
+    post_expenses(client, ('Power', 10, '2025-05-01'), ('Water', 20, '2025-05-03'))
+
+    assert [row['amount'] for row in client.get('/api/expenses').get_json()] == [20, 10]
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1001', 'limit=ten', 'cursor=not-a-cursor'])
+def test_bad_page_arguments_are_rejected(client, query):
+    response = client.get(f'/api/expenses?{query}')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_grid_pages_run_newest_year_and_month_first(client):
+    post_offerings((2024, 12), (2026, 1), (2025, 6), (2025, 1))
+
+    rows = walk(client, '/api/offerings?limit=1')
+
+    assert [(row['year'], row['month']) for row in rows] == [(2026, 1), (2025, 6), (2025, 1), (2024, 12)]
+
+
+def test_a_cursor_from_another_listing_is_rejected(client):
+    # [month, id], as tithe and offering cursors were before they carried the year
+    response = client.get('/api/offerings?limit=1&cursor=WzUsIDJd')
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid cursor'
@@ -0,0 +1,87 @@
+"""The member registry behind tithes."""
+import pytest
+
+import db
+import members
+
+
+@pytest.fixture
+def cursor(migrated):
+    conn = db.connect()
+    yield conn.cursor()
+    conn.rollback()
+    conn.close()
+
+
+def add(cursor, *people):
+    return [members.resolve(cursor, name, code) for name, code in people]
+
+
+def test_resolve_folds_case_and_spacing_of_names(cursor):
+    first, = add(cursor, ('Ama  Mensah', None))
+
+    assert members.resolve(cursor, ' AMA mensah ') == first
+    # The name is stored tidied, as first written
+    assert tuple(members.get(cursor, first)) == (first, 'Ama Mensah', None)
+
+
+def test_a_member_number_identifies_the_member_whatever_the_name(cursor):
+    first, = add(cursor, ('Kofi Boateng', 'M7'))
+
+    assert members.resolve(cursor, 'Kofi B.', ' M7 ') == first
+
+
+def test_search_matches_name_or_number_prefixes_in_name_order(cursor):
+    ama, abena, kofi, yaw = add(cursor, ('Ama Mensah', 'M001'), ('abena Owusu', None), ('Kofi Ama', 'M010'),
+                                ('Yaw', 'A12'))
+
+    assert [row['id'] for row in members.search(cursor, 'A')] == [abena, ama, yaw]
+    assert [row['id'] for row in members.search(cursor, 'ama  m')] == [ama]
+    assert [row['id'] for row in members.search(cursor, 'M0')] == [ama, kofi]
+    assert members.search(cursor, 'M00', limit=1) == [{'id': ama, 'name': 'Ama Mensah', 'code': 'M001'}]
+    assert members.search(cursor, '   ') == []
+
+
+def test_search_route(migrated):
+    from app import app
+    client = app.test_client()
+    conn = db.connect()
+    add(conn.cursor(), *[(f'Member {n:02d}', None) for n in range(60)])
+    conn.commit()
+    conn.close()
+
+    body = client.get('/api/members/search?q=member&limit=500').get_json()
+
+    assert len(body['data']) == members.MAX_SEARCH_LIMIT
+    assert len(client.get('/api/members/search?q=member').get_json()['data']) == members.SEARCH_LIMIT
+    assert client.get('/api/members/search?q=m&limit=some').status_code == 400
+
+
+def test_a_number_given_later_is_added_to_the_member(cursor):
+    first = members.resolve(cursor, 'Ama Mensah')
+
+    assert members.resolve(cursor, 'ama  mensah', 'M9') == first
+    assert tuple(members.get(cursor, first)) == (first, 'Ama Mensah', 'M9')
+    # Later entries by name alone still find them
+    assert members.resolve(cursor, 'Ama Mensah') == first
+
+
+def test_members_sharing_a_name_are_told_apart_by_number(cursor):
+    first = members.resolve(cursor, 'Kofi Boateng', 'M1')
+    second = members.resolve(cursor, 'Kofi Boateng', 'M2')
+
+    assert first != second
+    # Which of them a bare name means is unknown, so it is kept apart
+    assert members.resolve(cursor, 'Kofi Boateng') not in (first, second)
+
+
+def test_tithes_before_and_after_a_member_number_share_a_grid_row(migrated):
+    from app import app
+    client = app.test_client()
+    for week, member_id in ((1, ''), (2, 'M9')):
+        response = client.post('/api/tithes', json={'memberName': 'Ama Mensah', 'memberId': member_id,
+                                                    'month': 5, 'week': week, 'amount': 10, 'year': 2025})
+        assert response.get_json()['success'] is True
+
+    rows = client.get('/api/tithes').get_json()['data']
+    assert [(row['week1'], row['week2'], row['total']) for row in rows] == [(10, 10, 20)]
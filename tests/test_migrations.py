@@ -0,0 +1,184 @@
+"""Migrations that rewrite existing rows, run against databases built at the version before them."""
+from datetime import date
+
+import db
+import migrations
+import posting
+
+
+def at_version(version):
+    migrations.migrate(verbose=False, target=version)
+    return db.connect()
+
+
+def add_grid_row(conn, table, name, member_id, month, weeks, created_at='2026-01-20 10:00:00'):
+    """Insert a pre-migration grid row; weeks maps week number to pesewas."""
+    columns = [f'week{week}' for week in weeks]
+    cursor = conn.cursor()
+    return cursor.insert(f'''
+        INSERT INTO {table} (member_name, member_id, month, {", ".join(columns)}, total, created_at)
+        VALUES (?, ?, ?, {", ".join("?" * len(columns))}, ?, ?)
+    ''', [name, member_id, month] + list(weeks.values()) + [sum(weeks.values()), created_at])
+
+
+def add_income(conn, link, grid_id, name, month, week, amount, day):
+    """Insert the income row a grid week was posted as, described as the routes describe it."""
+    month_name = date(2000, month, 1).strftime('%B')
+    description = f'Tithe from {name} - {month_name} Week {week}' if link == 'tithe_id' else f'Offering - Week {week}'
+    conn.cursor().insert(f'''
+        INSERT INTO income (category, description, amount, date, is_tithe, is_offering, {link})
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', ('Tithe' if link == 'tithe_id' else 'Offering', description, amount, day,
+          int(link == 'tithe_id'), int(link == 'offering_id'), grid_id))
+
+
+def fetch(conn, sql):
+    return [tuple(row) for row in conn.execute(sql).fetchall()]
+
+
+def grid_rows(conn, table):
+    return [dict(row) for row in conn.execute(f'''
+        SELECT id, member_id, year, month, week1, week2, week3, week4, total FROM {table} ORDER BY year, month, id
+    ''').fetchall()]
+
+
+def test_grid_rows_spanning_years_are_split(database):
+    conn = at_version(14)
+    tithe = add_grid_row(conn, 'tithes', 'Ama', 'M1', 1, {1: 2000, 2: 3000})
+    add_income(conn, 'tithe_id', tithe, 'Ama', 1, 1, 1000, '2025-01-05')
+    add_income(conn, 'tithe_id', tithe, 'Ama', 1, 1, 2000, '2026-01-04')
+    add_income(conn, 'tithe_id', tithe, 'Ama', 1, 2, 3000, '2026-01-11')
+    offering = add_grid_row(conn, 'offerings', 'General Offering', None, 5, {1: 8000})
+    add_income(conn, 'offering_id', offering, None, 5, 1, 7000, '2025-05-04')
+    add_income(conn, 'offering_id', offering, None, 5, 1, 8000, '2026-05-03')
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False, target=15)
+
+    conn = db.connect()
+    tithes = grid_rows(conn, 'tithes')
+    assert [(row['year'], row['week1'], row['week2'], row['total']) for row in tithes] == [
+        (2025, 1000, None, 1000),
+        (2026, 2000, 3000, 5000),
+    ]
+    # Each year's income follows its own row
+    assert fetch(conn, 'SELECT date, tithe_id FROM income WHERE tithe_id IS NOT NULL ORDER BY date') == [
+        ('2025-01-05', tithes[0]['id']), ('2026-01-04', tithes[1]['id']), ('2026-01-11', tithes[1]['id']),
+    ]
+    assert [(row['year'], row['week1']) for row in grid_rows(conn, 'offerings')] == [(2025, 7000), (2026, 8000)]
+    conn.close()
+
+
+def test_december_entered_in_january_goes_to_the_previous_year(database):
+    conn = at_version(14)
+    tithe = add_grid_row(conn, 'tithes', 'Kofi', '', 12, {4: 500})
+    add_income(conn, 'tithe_id', tithe, 'Kofi', 12, 4, 500, '2026-01-02')
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False, target=15)
+
+    conn = db.connect()
+    # Rows recorded without a member number are keyed by name
+    assert [(row['member_id'], row['year'], row['month']) for row in grid_rows(conn, 'tithes')] == [
+        ('Kofi', 2025, 12),
+    ]
+    conn.close()
+
+
+def test_malformed_income_dates_fall_back_to_when_the_row_was_recorded(database):
+    conn = at_version(14)
+    # Legacy rows as fix_income_dates.py finds them
+    empty = add_grid_row(conn, 'tithes', 'Ama', 'M1', 1, {1: 1000}, created_at='2025-01-06 08:00:00')
+    add_income(conn, 'tithe_id', empty, 'Ama', 1, 1, 1000, '')
+    garbled = add_grid_row(conn, 'tithes', 'Esi', 'M2', 3, {2: 500}, created_at='2026-03-09 08:00:00')
+    add_income(conn, 'tithe_id', garbled, 'Esi', 3, 2, 500, '09/03/2026')
+    unknown = add_grid_row(conn, 'offerings', 'General Offering', None, 6, {1: 700}, created_at='')
+    add_income(conn, 'offering_id', unknown, None, 6, 1, 700, 'n/a')
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False)
+
+    conn = db.connect()
+    assert [(row['member_id'], row['year'], row['month']) for row in grid_rows(conn, 'tithes')] == [
+        ('M1', 2025, 1), ('M2', 2026, 3),
+    ]
+    # With no usable date at all the row is placed by today
+    assert [row['year'] for row in grid_rows(conn, 'offerings')] == [posting.grid_year(6, date.today().isoformat())]
+    conn.close()
+
+
+def test_duplicate_grid_rows_are_merged(database):
+    conn = at_version(14)
+    first = add_grid_row(conn, 'tithes', 'Ama', 'M1', 1, {1: 2000})
+    add_income(conn, 'tithe_id', first, 'Ama', 1, 1, 2000, '2026-01-04')
+    # Left by two concurrent first entries for the month; never posted
+    add_grid_row(conn, 'tithes', 'Ama', 'M1', 1, {3: 4000}, created_at='2026-01-18 09:00:00')
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False, target=15)
+
+    conn = db.connect()
+    assert [(row['id'], row['year'], row['week1'], row['week3'], row['total'])
+            for row in grid_rows(conn, 'tithes')] == [(first, 2026, 2000, 4000, 6000)]
+    conn.close()
+
+
+def test_name_spellings_share_a_member(database):
+    conn = at_version(15)
+    cursor = conn.cursor()
+    ids = []
+    for name, week, amount, day in (('Ama  Mensah', 1, 1000, '2026-02-01'), ('ama mensah', 2, 1500, '2026-02-08')):
+        ids.append(cursor.insert('''
+            INSERT INTO tithes (member_name, member_id, year, month, week{0}, total) VALUES (?, ?, 2026, 2, ?, ?)
+        '''.format(week), (name, name, amount, amount)))
+        add_income(conn, 'tithe_id', ids[-1], name, 2, week, amount, day)
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False, target=16)
+
+    conn = db.connect()
+    # The most recently recorded spelling names the member
+    assert fetch(conn, 'SELECT name, name_key, code FROM members') == [('ama mensah', 'ama mensah', None)]
+    member_ref = conn.execute('SELECT id FROM members').fetchone()[0]
+    assert fetch(conn, 'SELECT id, member_ref, week1, week2, total FROM tithes') == [
+        (ids[0], member_ref, 1000, 1500, 2500),
+    ]
+    assert fetch(conn, 'SELECT DISTINCT member_ref, tithe_id FROM income') == [(member_ref, ids[0])]
+    conn.close()
+
+
+def test_member_numbers_identify_members(database):
+    conn = at_version(15)
+    cursor = conn.cursor()
+    for name, month in (('Kofi Boateng', 3), ('Kofi B.', 4), ('Kofi Boateng', 5)):
+        cursor.execute('''
+            INSERT INTO tithes (member_name, member_id, year, month, week1, total) VALUES (?, ?, 2026, ?, 100, 100)
+        ''', (name, 'M7' if month < 5 else name, month))
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(verbose=False, target=16)
+
+    conn = db.connect()
+    members = fetch(conn, 'SELECT id, name, code FROM members ORDER BY id')
+    # One member for the number whichever spelling came with it, another for the name recorded without one
+    assert sorted((name, code) for _, name, code in members) == [('Kofi B.', 'M7'), ('Kofi Boateng', None)]
+    refs = dict(fetch(conn, 'SELECT month, member_ref FROM tithes'))
+    assert refs[3] == refs[4] != refs[5]
+    conn.close()
+
+
+def test_year_close_reads_grid_rows_through_the_year_month_index(migrated):
+    import archive
+    conn = db.connect()
+    assert fetch(conn, "SELECT name FROM sqlite_master WHERE name LIKE '%created_at'") == []
+    where, params = archive.year_filter(migrations.GRID_PERIOD, 2024)
+    for table in migrations.GRIDS:
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN DELETE FROM {table} WHERE {where}', params)]
+        assert any(f'idx_{table}_year_month_id' in step for step in plan), plan
+    conn.close()
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from money import DISTRICT_PERCENT, district_sql, split, to_cedis, to_pesewas
+
+
+@pytest.mark.parametrize('value, pesewas', [
+    (None, 0),
+    ('', 0),
+    (12, 1200),
+    ('12.5', 1250),
+    (' 0.1 ', 10),
+    (0.1, 10),
+    ('1.005', 101),
+    ('2.675', 268),
+    ('-0.005', -1),
+])
+def test_to_pesewas_rounds_half_up(value, pesewas):
+    assert to_pesewas(value) == pesewas
+
+
+@pytest.mark.parametrize('value', ['abc', '1,000', object()])
+def test_to_pesewas_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        to_pesewas(value)
+
+
+def test_to_cedis():
+    assert to_cedis(1250) == 12.5
+    assert to_cedis(None) == 0
+
+
+def test_split_shares_add_back_up():
+    for pesewas in range(0, 5000):
+        district, local = split(pesewas)
+        assert district + local == pesewas
+        # Within half a pesewa of the exact share
+        assert abs(district * 100 - pesewas * DISTRICT_PERCENT) <= 50
+
+
+def test_split_rounds_half_up():
+    assert split(10000) == (7700, 2300)
+    assert split(1) == (1, 0)
+    # 50 * 0.77 = 38.5
+    assert split(50) == (39, 11)
+
+
+def test_district_sql_matches_split():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE amounts (amount INTEGER)')
+    conn.executemany('INSERT INTO amounts VALUES (?)', [(pesewas,) for pesewas in range(0, 5000)])
+    rows = conn.execute(f'SELECT amount, {district_sql("amount")} FROM amounts').fetchall()
+    assert all(district == split(amount)[0] for amount, district in rows)
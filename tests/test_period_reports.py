@@ -0,0 +1,44 @@
+"""Period reports over the per-day totals."""
+import pytest
+
+import db
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def add_income(day, amount):
+    conn = db.connect()
+    conn.cursor().insert('''
+        INSERT INTO income (category, description, amount, local_amount, district_amount, date)
+        VALUES ('Donation', 'Gift', ?, ?, 0, ?)
+    ''', (amount, amount, day))
+    conn.commit()
+    conn.close()
+
+
+def test_income_without_a_usable_date_is_left_out(client):
+    add_income('2025-05-04', 5000)
+    # Legacy rows as fix_income_dates.py finds them
+    add_income('', 100)
+    add_income('2025-13-01', 200)
+    add_income('04/05/2025', 300)
+
+    response = client.get('/api/reports/all')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['start_date'], report['end_date']) == ('2025-05-04', '2025-05-04')
+    assert report['totals']['income'] == 50
+    assert report['series'] == {'labels': ['2025-05'], 'income': [50], 'expenses': [0], 'tithes': [0],
+                                'offerings': [0]}
+
+
+def test_an_empty_ledger_reports_zeros(client):
+    report = client.get('/api/reports/weekly?date=2025-05-04').get_json()
+
+    assert report['totals']['income'] == 0
+    assert report['series']['income'] == [0] * 7
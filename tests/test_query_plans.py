@@ -0,0 +1,5 @@
+import check_query_plans
+
+
+def test_hot_routes_use_indexed_query_plans(migrated):
+    assert check_query_plans.check_routes() == []
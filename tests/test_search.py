@@ -0,0 +1,79 @@
+"""Full-text search across the ledgers and the triggers that keep it current."""
+import pytest
+
+import db
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    client = app.test_client()
+    for url, body in [
+        ('/api/income', {'category': 'Donation', 'description': 'Gift towards roof repairs', 'amount': 500,
+                         'date': '2025-05-04'}),
+        ('/api/expenses', {'category': 'Maintenance', 'description': 'Roof repair materials', 'amount': 120,
+                           'date': '2025-06-10'}),
+        ('/api/expenses', {'category': 'Utilities', 'description': 'Water bill', 'amount': 40,
+                           'date': '2025-06-12'}),
+    ]:
+        assert client.post(url, json=body).get_json()['success'] is True
+    return client
+
+
+def found(client, query):
+    response = client.get(f'/api/search?{query}')
+    assert response.status_code == 200, response.get_json()
+    return [(hit['source'], hit['description']) for hit in response.get_json()['data']]
+
+
+def test_words_match_stemmed_prefixes_across_ledgers(client):
+    assert sorted(found(client, 'q=repairs')) == [('expenses', 'Roof repair materials'),
+                                                  ('income', 'Gift towards roof repairs')]
+    # Every word must match, each as a prefix
+    assert found(client, 'q=ro mater') == [('expenses', 'Roof repair materials')]
+    assert found(client, 'q=roof+hall') == []
+
+
+def test_hits_carry_their_ledger_row_and_amount(client):
+    hit, = client.get('/api/search?q=water').get_json()['data']
+
+    assert (hit['source'], hit['title'], hit['date'], hit['amount']) == ('expenses', 'Utilities', '2025-06-12', 40)
+    assert '[Water]' in hit['snippet']
+
+
+def test_source_date_and_page_filters(client):
+    assert found(client, 'q=roof&source=income') == [('income', 'Gift towards roof repairs')]
+    assert found(client, 'q=roof&start_date=2025-06-01') == [('expenses', 'Roof repair materials')]
+    assert found(client, 'q=roof&end_date=2025-05-31') == [('income', 'Gift towards roof repairs')]
+
+    first = client.get('/api/search?q=roof&limit=1').get_json()
+    rest = client.get(f'/api/search?q=roof&limit=1&offset={first["next_offset"]}').get_json()
+    assert (len(first['data']), len(rest['data']), rest['next_offset']) == (1, 1, None)
+    assert first['data'] != rest['data']
+
+
+def test_deleted_and_edited_rows_leave_the_index(client):
+    expense_id = client.get('/api/search?q=water').get_json()['data'][0]['id']
+    client.delete(f'/api/expenses/{expense_id}')
+    conn = db.connect()
+    conn.execute("UPDATE income SET description = 'Gift for the new hymn books'")
+    conn.commit()
+    conn.close()
+
+    assert found(client, 'q=water') == []
+    assert found(client, 'q=roof') == [('expenses', 'Roof repair materials')]
+    assert found(client, 'q=hymn') == [('income', 'Gift for the new hymn books')]
+
+
+@pytest.mark.parametrize('query', ['q=', 'q=%21%21', 'q=roof&source=tithes', 'q=roof&limit=all'])
+def test_bad_searches_are_rejected(client, query):
+    response = client.get(f'/api/search?{query}')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_query_syntax_is_searched_as_words(client):
+    # FTS operators and quotes are not read as query syntax
+    assert found(client, 'q=roof" OR NEAR(water') == []
+    assert found(client, 'q=water*') == [('expenses', 'Water bill')]
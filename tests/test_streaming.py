@@ -0,0 +1,58 @@
+"""NDJSON and CSV downloads from the list endpoints."""
+import csv
+import io
+import json
+
+import pytest
+
+import streaming
+
+
+@pytest.fixture
+def client(migrated):
+    from app import app
+    return app.test_client()
+
+
+def post_income(client, count):
+    rows = [{'category': 'Donation', 'description': f'Gift {n}', 'amount': n, 'date': f'2025-05-{n:02d}'}
+            for n in range(1, count + 1)]
+    assert client.post('/api/income', json=rows).get_json()['success'] is True
+
+
+def test_ndjson_streams_every_matching_row(client):
+    post_income(client, 12)
+
+    response = client.get('/api/income?format=ndjson&start_date=2025-05-03')
+
+    assert response.content_type == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=income.ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # In page order, with no page limit
+    assert [record['amount'] for record in records] == list(range(12, 2, -1))
+
+
+def test_csv_has_a_header_row_then_one_row_per_record(client):
+    post_income(client, 3)
+
+    response = client.get('/api/income?format=csv')
+
+    assert response.content_type == 'text/csv; charset=utf-8'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['description'], row['amount'], row['is_tithe']) for row in rows] == [
+        ('Gift 3', '3.0', 'False'), ('Gift 2', '2.0', 'False'), ('Gift 1', '1.0', 'False')]
+
+
+def test_an_unknown_format_is_rejected(client):
+    response = client.get('/api/income?format=xml')
+
+    assert response.status_code == 400
+
+
+def test_bodies_are_written_in_batches():
+    records = ({'n': n} for n in range(5))
+
+    chunks = list(streaming._batched(streaming.ndjson_lines(records), batch_size=2))
+
+    assert chunks == ['{"n": 0}\n{"n": 1}\n', '{"n": 2}\n{"n": 3}\n', '{"n": 4}\n']
+    assert list(streaming.encode(iter([]), 'csv')) == []
@@ -1,6 +1,7 @@
 import sqlite3
 import os
 from datetime import datetime
+import migrations
 
 def backup_database():
     """Create a backup of the current database."""
@@ -38,12 +39,12 @@ def fix_duplicate_columns():
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     date TEXT NOT NULL,
                     description TEXT,
-                    amount REAL NOT NULL,
+                    amount INTEGER NOT NULL,
                     category TEXT,
                     is_tithe BOOLEAN DEFAULT 0,
                     is_offering BOOLEAN DEFAULT 0,
-                    district_amount REAL DEFAULT 0,
-                    local_amount REAL DEFAULT 0,
+                    district_amount INTEGER DEFAULT 0,
+                    local_amount INTEGER DEFAULT 0,
                     member_id INTEGER,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -83,80 +84,6 @@ def fix_duplicate_columns():
     finally:
         conn.close()
 
-def update_income_table():
-    """Update the income table schema to ensure all required columns exist."""
-    conn = sqlite3.connect('church_management.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Check if the income table exists, create if not
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='income'")
-        if not cursor.fetchone():
-            print("Income table does not exist. Creating it...")
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS income (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    description TEXT,
-                    amount REAL NOT NULL,
-                    category TEXT,
-                    is_tithe BOOLEAN DEFAULT 0,
-                    is_offering BOOLEAN DEFAULT 0,
-                    district_amount REAL DEFAULT 0,
-                    local_amount REAL DEFAULT 0,
-                    member_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            print("Created new income table.")
-            conn.commit()
-            return
-            
-        # Check for missing columns and add them if necessary
-        cursor.execute('PRAGMA table_info(income)')
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'is_tithe' not in columns:
-            print("Adding is_tithe column...")
-            cursor.execute('ALTER TABLE income ADD COLUMN is_tithe BOOLEAN DEFAULT 0')
-            
-        if 'is_offering' not in columns:
-            print("Adding is_offering column...")
-            cursor.execute('ALTER TABLE income ADD COLUMN is_offering BOOLEAN DEFAULT 0')
-            
-        if 'district_amount' not in columns:
-            print("Adding district_amount column...")
-            cursor.execute('ALTER TABLE income ADD COLUMN district_amount REAL DEFAULT 0')
-            
-        if 'local_amount' not in columns:
-            print("Adding local_amount column...")
-            cursor.execute('ALTER TABLE income ADD COLUMN local_amount REAL DEFAULT 0')
-            
-        if 'member_id' not in columns:
-            print("Adding member_id column...")
-            cursor.execute('ALTER TABLE income ADD COLUMN member_id INTEGER')
-            
-        # Update existing records to calculate local and district amounts if needed
-        cursor.execute('''
-            UPDATE income 
-            SET district_amount = amount * 0.77,
-                local_amount = amount * 0.23
-            WHERE (is_tithe = 1 OR is_offering = 1) 
-            AND (district_amount = 0 OR local_amount = 0)
-        ''')
-        
-        conn.commit()
-        print("Successfully updated income table schema.")
-        
-    except Exception as e:
-        print(f"Error updating database schema: {e}")
-        conn.rollback()
-        raise
-    finally:
-        if conn:
-            conn.close()
-
 def update_all_tables():
     """Update all database tables to ensure they have the correct schema."""
     print("Starting database update...")
@@ -167,8 +94,8 @@ def update_all_tables():
         # First fix any duplicate columns
         fix_duplicate_columns()
         
-        # Then update the table schema
-        update_income_table()
+        # Then apply any pending versioned migrations
+        migrations.migrate()
         
         print("Database update completed successfully!")
     except Exception as e: